@@ -0,0 +1,534 @@
+"""Headless batch runner: the app's pipelines without Streamlit.
+
+Reads a JSON config naming the sheets, the date and the report files for
+each tab, parses the reports with the same section functions the app uses
+and writes every tab with one consolidated SheetWritePlan.
+
+    python batch_runner.py store.json
+    python batch_runner.py store.json --date 2025-11-17 --workers 4
+
+Example config (paths are relative to the config file; every tab and every
+file is optional):
+
+    {
+      "credentials_file": "service_account.json",
+      "date": "2025-11-17",
+      "diff_writes": true,
+      "advisor": {
+        "sheet": "Store 12 Report", "worksheet": "Input",
+        "ro_count": "ro_count.xlsx",
+        "menu_sales": ["menus_old.xlsx", "menus_new.xlsx"], "menu_sales_dedupe": true,
+        "alacarte": "alacarte.xlsx",
+        "commodities": {"Tires": "tires.xlsx", "Batteries": "batteries.xlsx"},
+        "alignment_menus": ["alignment_menus.xlsx"], "alignment_alacarte": [], "alignment_dedupe": true,
+        "key_index": true,
+        "recommendations": "recommendations.xlsx",
+        "daily": "daily.xlsx"
+      },
+      "rth": {"sheet": "Store 12 RTH", "worksheet": "Input",
+              "technician_report": "technician.xlsx", "timecard": "timecard.xlsx"},
+      "appointments": {"sheet": "Store 12 Appointments", "worksheet": "Input",
+                       "volkswagen": "vw.xlsx", "toyota": "toyota.xlsx", "alfa": "alfa.xlsx"}
+    }
+
+The credentials file can also come from GOOGLE_CREDENTIALS_FILE; with
+SHEETS_BACKEND=local no credentials are needed.
+
+"diff_writes" (off by default) reads each tab's target cells before writing
+and skips the ones that already hold the new value. The read costs one
+request of read quota per tab, so turn it on for re-runs of a day, when
+most cells are unchanged.
+
+With "key_index" on the advisor tab, Menu Sales and Alignment lines already
+counted for another day of the month are skipped (see key_index.py); the
+index is updated once the tab's cells are written.
+
+Every parsed report is archived as Parquet under the tab's sheet and the
+date (see report_archive.py; REPORT_ARCHIVE_DIR, empty to disable).
+
+A config with a "stores" key is a multi-store manifest (see MULTI-STORE
+below): every store is written concurrently and a per-store status table
+is printed.
+
+    python batch_runner.py group.json --stores 4 --workers 4
+"""
+import argparse
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+import instrumentation
+import report_archive
+import report_processing
+from key_index import KeyIndex, index_path
+from report_processing import run_section_job, run_section_jobs, run_split_section_job, run_split_section_jobs
+from sheet_io import (
+    COMMODITIES, SheetConnectionCache, SheetsRateLimiter, SheetWritePlan,
+    describe_write, plan_advisor_sections, update_appointments_in_sheet,
+    update_rth_technician_data, update_rth_timecard_data,
+)
+
+_MAX_CONCURRENT_STORES = int(os.environ.get("MAX_CONCURRENT_STORES", "4"))
+
+# ── CONFIG ──────────────────────────────────────────────────────────────────
+
+def load_config(path):
+    with open(path) as fh:
+        config = json.load(fh)
+    config["_base_dir"] = os.path.dirname(os.path.abspath(path))
+    return config
+
+def _paths(config, value):
+    """A path or list of paths from the config, resolved against the config
+    file's directory. Missing values give an empty list."""
+    if not value:
+        return []
+    values = value if isinstance(value, list) else [value]
+    return [os.path.join(config["_base_dir"], v) for v in values]
+
+def _target_date(value):
+    """The date to write: YYYY-MM-DD, or a bare day of the current month."""
+    today = datetime.now().date()
+    if value is None:
+        return today
+    text = str(value)
+    if text.isdigit():
+        return today.replace(day=int(text))
+    return datetime.strptime(text, "%Y-%m-%d").date()
+
+def _credentials_loader(config):
+    path = config.get("credentials_file") or os.environ.get("GOOGLE_CREDENTIALS_FILE")
+
+    def load():
+        if not path:
+            raise ValueError("No credentials: set credentials_file in the config or GOOGLE_CREDENTIALS_FILE.")
+        with open(os.path.join(config["_base_dir"], path)) as fh:
+            return json.load(fh)
+    return load
+
+# ── PARSING ─────────────────────────────────────────────────────────────────
+
+def _read_files(paths):
+    files = []
+    for path in paths:
+        with open(path, "rb") as fh:
+            files.append((os.path.basename(path), fh.read()))
+    return files
+
+def parse_jobs(jobs, executor=None, archive=None):
+    """Run {label: (section, paths, options)} jobs, in the pool when there is
+    one, archiving the parses under `archive` (a report_archive.ArchiveScope).
+    Returns {label: (result, error)} in job order."""
+    payloads = [(section, _read_files(paths), options, archive and archive.partition(section))
+                for section, paths, options in jobs.values()]
+    if executor is not None and len(payloads) > 1:
+        outcomes = run_section_jobs(payloads, executor)
+    else:
+        outcomes = [run_section_job(*payload) for payload in payloads]
+
+    for (_, _, options), (_, _, error, stats) in zip(jobs.values(), outcomes):
+        if options.get("key_index") is not None and error is None and "key_index_updates" in stats:
+            options["key_index"].add_updates(stats["key_index_updates"])
+    return {label: _record_outcome(label, outcome) for label, outcome in zip(jobs, outcomes)}
+
+def _record_outcome(label, outcome):
+    """Replay a job's messages, fold its stats into the current action and
+    return (result, error)."""
+    result, messages, error, stats = outcome
+    report_processing.replay_messages(messages, report_processing.ui)
+    action = instrumentation.current_action()
+    if action is not None and stats:
+        action.add_stage(f"read {label}", stats["read_ms"])
+        action.add_stage(f"process {label}", stats["process_ms"])
+        action.count("rows_read", stats["rows_read"])
+    return result, error
+
+# ── TABS ────────────────────────────────────────────────────────────────────
+
+def _layout(connections, tab, first_date_col, block_stride, day=None):
+    layout = connections.get_layout(tab["sheet"], tab["worksheet"], first_date_col, block_stride)
+    if day is not None and day not in layout.day_to_col:
+        layout = connections.get_layout(tab["sheet"], tab["worksheet"], first_date_col, block_stride, refresh=True)
+    if day is not None and day not in layout.day_to_col:
+        raise ValueError(f"Date {day} not found in the sheet.")
+    return layout
+
+def _ok(parsed, label, summary):
+    result, error = parsed[label]
+    if error is not None:
+        summary["errors"].append(f"{label}: {error}")
+        return False
+    summary["sections"].append(label)
+    return True
+
+def advisor_jobs(config, tab, errors):
+    """{label: (section, paths, options)} for the Advisor tab's files."""
+    dedupe_menus = tab.get("menu_sales_dedupe", True)
+    dedupe_alignment = tab.get("alignment_dedupe", True)
+
+    jobs = {}
+    for label, section, key, options in [
+        ("RO Count", "ro_count", "ro_count", {}),
+        ("Menu Sales", "menu_sales", "menu_sales", {"dedupe": dedupe_menus}),
+        ("A-La-Carte", "alacarte", "alacarte", {}),
+        ("Alignment Menus", "alignment", "alignment_menus", {"dedupe": dedupe_alignment, "label": "Alignment Menus"}),
+        ("Alignment A-La-Carte", "alignment", "alignment_alacarte", {"dedupe": dedupe_alignment, "label": "Alignment A-La-Carte"}),
+        ("Recommendations", "recommendations", "recommendations", {}),
+        ("Daily Data", "daily", "daily", {}),
+    ]:
+        paths = _paths(config, tab.get(key))
+        if paths:
+            if section not in ("menu_sales", "alignment"):
+                paths = paths[:1]
+            jobs[label] = (section, paths, options)
+    for commodity, path in (tab.get("commodities") or {}).items():
+        if commodity not in COMMODITIES:
+            errors.append(f"Unknown commodity '{commodity}'")
+            continue
+        section = "tires" if commodity == 'Tires' else "commodity"
+        jobs[commodity] = (section, _paths(config, path)[:1], {})
+    return jobs
+
+def run_advisor_tab(config, tab, connections, date, parse, diff=False):
+    summary = {"sections": [], "errors": []}
+    jobs = advisor_jobs(config, tab, summary["errors"])
+    if not jobs:
+        return summary
+    day = str(date.day)
+    key_index = None
+    if tab.get("key_index"):
+        key_index = KeyIndex(index_path(tab["sheet"], date.strftime("%Y-%m")), date.day)
+        for section, _, options in jobs.values():
+            if section in ("menu_sales", "alignment"):
+                options["key_index"] = key_index
+
+    layout = _layout(connections, tab, first_date_col=3, block_stride=26, day=day)
+    sheet = connections.get_worksheet(tab["sheet"], tab["worksheet"])
+    date_col_index = layout.day_to_col[day]
+    advisor_mapping = layout.name_mapping()
+
+    with instrumentation.stage("parse"):
+        parsed = parse(jobs, report_archive.ArchiveScope(tab["sheet"], date))
+    plan = SheetWritePlan()
+
+    results = {label: parsed[label][0] for label in parsed if _ok(parsed, label, summary)}
+    plan_advisor_sections(plan, results, date_col_index, advisor_mapping)
+
+    _flush(plan, sheet, summary, diff)
+    if key_index is not None:
+        key_index.commit()
+    return summary
+
+def rth_jobs(config, tab, errors):
+    """{label: (section, paths, options)} for the RTH tab's files."""
+    jobs = {}
+    for label, section, key in [("Technician Report", "technician_report", "technician_report"),
+                                ("Employee Timecard", "timecard", "timecard")]:
+        paths = _paths(config, tab.get(key))[:1]
+        if paths:
+            jobs[label] = (section, paths, {})
+    return jobs
+
+def run_rth_tab(config, tab, connections, date, parse, diff=False):
+    summary = {"sections": [], "errors": []}
+    jobs = rth_jobs(config, tab, summary["errors"])
+    if not jobs:
+        return summary
+    day = str(date.day)
+
+    layout = _layout(connections, tab, first_date_col=5, block_stride=4,
+                     day=day if "Technician Report" in jobs else None)
+    sheet = connections.get_worksheet(tab["sheet"], tab["worksheet"])
+    tech_mapping = layout.name_mapping()
+    with instrumentation.stage("parse"):
+        parsed = parse(jobs, report_archive.ArchiveScope(tab["sheet"], date))
+    plan = SheetWritePlan()
+
+    if "Technician Report" in parsed and _ok(parsed, "Technician Report", summary):
+        actual_hours, assigned_billed_hours = parsed["Technician Report"][0]
+        update_rth_technician_data(sheet, actual_hours, assigned_billed_hours, layout.day_to_col[day], tech_mapping, plan=plan)
+    if "Employee Timecard" in parsed and _ok(parsed, "Employee Timecard", summary):
+        date_range, timecard_data = parsed["Employee Timecard"][0]
+        update_rth_timecard_data(sheet, date_range, timecard_data, {**layout.employee_id_mapping(), **tech_mapping},
+                                 day_to_col=layout.day_to_col, plan=plan)
+
+    _flush(plan, sheet, summary, diff)
+    return summary
+
+def appointments_jobs(config, tab, errors):
+    """{label: (section, paths, options)} for the Appointments tab's files."""
+    jobs = {}
+    for brand, is_volkswagen in [("volkswagen", True), ("toyota", False), ("alfa", False)]:
+        paths = _paths(config, tab.get(brand))[:1]
+        if paths:
+            jobs[brand] = ("appointments", paths, {"is_volkswagen": is_volkswagen})
+    return jobs
+
+def run_appointments_tab(config, tab, connections, date, parse, diff=False):
+    summary = {"sections": [], "errors": []}
+    jobs = appointments_jobs(config, tab, summary["errors"])
+    if not jobs:
+        return summary
+
+    layout = _layout(connections, tab, first_date_col=4, block_stride=4)
+    sheet = connections.get_worksheet(tab["sheet"], tab["worksheet"])
+    with instrumentation.stage("parse"):
+        parsed = parse(jobs, report_archive.ArchiveScope(tab["sheet"], date))
+    data = {brand: parsed[brand][0] if brand in parsed and _ok(parsed, brand, summary) else None
+            for brand in ("volkswagen", "toyota", "alfa")}
+    plan = SheetWritePlan()
+    update_appointments_in_sheet(sheet, data["volkswagen"] or {}, data["toyota"] or {}, data["alfa"] or {},
+                                 layout.first_name_mapping(),
+                                 update_vw=data["volkswagen"] is not None,
+                                 update_toyota=data["toyota"] is not None,
+                                 update_alfa=data["alfa"] is not None,
+                                 day_to_col=layout.day_to_col, plan=plan)
+    _flush(plan, sheet, summary, diff)
+    return summary
+
+def _flush(plan, sheet, summary, diff):
+    duplicates = plan.added - len(plan)
+    cells_written, requests_sent, cells_skipped = plan.flush(sheet, diff=diff)
+    summary.update(cells_written=cells_written, requests=requests_sent, cells_skipped=cells_skipped,
+                   duplicates=duplicates, write=describe_write(cells_written, requests_sent, cells_skipped))
+
+TABS = {
+    "advisor": (advisor_jobs, run_advisor_tab),
+    "rth": (rth_jobs, run_rth_tab),
+    "appointments": (appointments_jobs, run_appointments_tab),
+}
+
+# ── RUNNER ──────────────────────────────────────────────────────────────────
+
+@contextlib.contextmanager
+def _parse_pool(workers):
+    if workers <= 1:
+        yield None
+        return
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        yield executor
+    finally:
+        executor.shutdown()
+
+def run_tabs(config, date, connections, parse, diff=False, **context):
+    """Run every tab in `config` with `parse(jobs, archive)` doing the parsing.
+    Returns {tab: summary}; a summary has the sections written, per-section
+    errors, write counts and timings."""
+    summaries = {}
+    for name, (_, run_tab) in TABS.items():
+        tab = config.get(name)
+        if not tab:
+            continue
+        with instrumentation.action(f"batch {name}", sheet=tab.get("sheet"), worksheet=tab.get("worksheet"), **context) as action:
+            try:
+                summary = run_tab(config, tab, connections, date, parse, diff)
+            except Exception as e:
+                summary = {"sections": [], "errors": [str(e)]}
+                action.error = str(e)
+        summary["total_ms"] = round(action.total_ms)
+        summary["http_calls"] = action.counters.get("http_calls", 0)
+        summaries[name] = summary
+    return summaries
+
+def run(config, day=None, workers=None, connections=None):
+    """Run every tab of a single-store config. Returns {tab: summary}."""
+    date = _target_date(day or config.get("date"))
+    diff = bool(config.get("diff_writes", False))
+    connections = connections or SheetConnectionCache(_credentials_loader(config), SheetsRateLimiter())
+    with _parse_pool(workers or config.get("workers") or 1) as executor:
+        return run_tabs(config, date, connections, lambda jobs, archive=None: parse_jobs(jobs, executor, archive), diff)
+
+# ── MULTI-STORE ─────────────────────────────────────────────────────────────
+# A manifest lists the group's stores. Each store has its own sheets and
+# either its own files or rows in a group-wide export ("combined"), which
+# is split by a store column and parsed once for all stores:
+#
+#     {
+#       "credentials_file": "service_account.json",
+#       "date": "2025-11-17",
+#       "max_concurrent_stores": 4,
+#       "defaults": {"advisor": {"worksheet": "Input"}, "rth": {"worksheet": "Input"}},
+#       "combined": {"store_column": "Store", "advisor": {"ro_count": "group_ro_count.xlsx"}},
+#       "stores": {
+#         "12": {"advisor": {"sheet": "Store 12 Report", "daily": "store12/daily.xlsx"}},
+#         "14": {"store_value": "Store 14", "advisor": {"sheet": "Store 14 Report"}},
+#         "15": "store15/config.json"
+#       }
+#     }
+#
+# A store given as a path is a single-store config of its own. Options for
+# the combined files (e.g. menu_sales_dedupe) belong in "combined"; a store's
+# "key_index" applies to its own files only. Stores run
+# concurrently, at most max_concurrent_stores at a time, and share one
+# rate limiter so the whole group stays inside the Sheets quota.
+
+_TAB_SETTINGS = ("sheet", "worksheet")
+_STORE_STATUS_COLUMNS = ("store", "tab", "status", "sections", "cells", "requests", "skipped", "ms", "errors")
+
+def _absolute_paths(base_dir, value):
+    """The file entries of a tab section with paths made absolute, so the
+    section can be merged into a store config from another directory."""
+    if isinstance(value, str):
+        return os.path.join(base_dir, value)
+    if isinstance(value, list):
+        return [_absolute_paths(base_dir, v) for v in value]
+    if isinstance(value, dict):
+        return {k: v if k in _TAB_SETTINGS else _absolute_paths(base_dir, v) for k, v in value.items()}
+    return value
+
+def store_configs(manifest):
+    """{store: single-store config} for every store in the manifest, with
+    the shared settings, the tab defaults and the combined files merged in."""
+    base_dir = manifest["_base_dir"]
+    shared = {k: manifest[k] for k in ("credentials_file", "date", "diff_writes") if k in manifest}
+    combined = manifest.get("combined") or {}
+    configs = {}
+    for store, entry in manifest.get("stores", {}).items():
+        if isinstance(entry, str):
+            entry = load_config(os.path.join(base_dir, entry))
+        config = {"_base_dir": entry.get("_base_dir", base_dir), **shared,
+                  **{k: v for k, v in entry.items() if k not in TABS}}
+        for name in TABS:
+            tab = {**_absolute_paths(base_dir, (manifest.get("defaults") or {}).get(name) or {}),
+                   **_absolute_paths(base_dir, combined.get(name) or {}),
+                   **(entry.get(name) or {})}
+            if tab.get("sheet"):
+                config[name] = tab
+        configs[str(store)] = config
+    return configs
+
+def _job_key(section, paths, options):
+    # A store's key index is its own; the job is the same with or without it
+    options = {k: v for k, v in options.items() if k != "key_index"}
+    return section, tuple(paths), json.dumps(options, sort_keys=True)
+
+def parse_combined(manifest, configs, executor=None):
+    """Parse the group-wide exports once for every store. Returns
+    {job key: {store value: outcome}} for the jobs the combined files make."""
+    combined = manifest.get("combined") or {}
+    if not combined:
+        return {}
+    store_column = combined.get("store_column", "Store")
+    store_values = sorted({_store_value(store, config) for store, config in configs.items()})
+    jobs = {}
+    for name, (build_jobs, _) in TABS.items():
+        if combined.get(name):
+            tab = _absolute_paths(manifest["_base_dir"], combined[name])
+            for job in build_jobs(manifest, tab, []).values():
+                jobs[_job_key(*job)] = job
+    payloads = [(section, _read_files(paths), options, store_column, store_values)
+                for section, paths, options in jobs.values()]
+    if executor is not None and len(payloads) > 1:
+        outcomes = run_split_section_jobs(payloads, executor)
+    else:
+        outcomes = [run_split_section_job(*payload) for payload in payloads]
+    return dict(zip(jobs, outcomes))
+
+def _store_value(store, config):
+    return str(config.get("store_value", store)).strip()
+
+def _store_parser(store_value, split, executor):
+    """parse(jobs, archive) for one store: jobs made from the combined exports take
+    this store's share of the split, the rest are parsed as usual."""
+    def parse(jobs, archive=None):
+        own = {label: job for label, job in jobs.items() if _job_key(*job) not in split}
+        parsed = parse_jobs(own, executor, archive)
+        for label, job in jobs.items():
+            if label not in own:
+                parsed[label] = _record_outcome(label, split[_job_key(*job)][store_value])
+        return {label: parsed[label] for label in jobs}
+    return parse
+
+def run_stores(manifest, day=None, workers=None, max_concurrent_stores=None, connections=None):
+    """Run every store in `manifest`. Returns {store: {tab: summary}}."""
+    date = _target_date(day or manifest.get("date"))
+    diff = bool(manifest.get("diff_writes", False))
+    configs = store_configs(manifest)
+    concurrency = max_concurrent_stores or manifest.get("max_concurrent_stores") or _MAX_CONCURRENT_STORES
+    connections = connections or SheetConnectionCache(_credentials_loader(manifest), SheetsRateLimiter())
+
+    with _parse_pool(workers or manifest.get("workers") or 1) as executor:
+        with instrumentation.action("batch combined", stores=len(configs)):
+            split = parse_combined(manifest, configs, executor)
+
+        def run_store(store):
+            threading.current_thread().name = store
+            config = configs[store]
+            parse = _store_parser(_store_value(store, config), split, executor)
+            return run_tabs(config, date, connections, parse, diff, store=store)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as stores_pool:
+            futures = {store: stores_pool.submit(run_store, store) for store in configs}
+    summaries = {}
+    for store, future in futures.items():
+        try:
+            summaries[store] = future.result()
+        except Exception as e:
+            summaries[store] = {"-": {"sections": [], "errors": [str(e)], "total_ms": 0, "http_calls": 0}}
+    return summaries
+
+def _status(summary):
+    if not summary["errors"]:
+        return "ok" if summary["sections"] else "nothing to do"
+    return "partial" if summary["sections"] else "failed"
+
+def status_rows(summaries):
+    """One row per store and tab for the status table."""
+    rows = []
+    for store, tabs in summaries.items():
+        for tab, summary in tabs.items():
+            rows.append({"store": store, "tab": tab, "status": _status(summary),
+                         "sections": len(summary["sections"]), "cells": summary.get("cells_written", 0),
+                         "requests": summary.get("requests", 0), "skipped": summary.get("cells_skipped", 0),
+                         "ms": summary["total_ms"], "errors": "; ".join(summary["errors"])})
+    return rows
+
+def format_status_table(rows):
+    widths = {c: max([len(c)] + [len(str(row[c])) for row in rows]) for c in _STORE_STATUS_COLUMNS}
+    lines = ["  ".join(c.ljust(widths[c]) for c in _STORE_STATUS_COLUMNS).rstrip()]
+    for row in rows:
+        lines.append("  ".join(str(row[c]).ljust(widths[c]) for c in _STORE_STATUS_COLUMNS).rstrip())
+    return "\n".join(lines)
+
+# ── CLI ─────────────────────────────────────────────────────────────────────
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update the report sheets from DMS exports without the web app.")
+    parser.add_argument("config", help="JSON config file or multi-store manifest (see the module docstring).")
+    parser.add_argument("--date", help="Date to write (YYYY-MM-DD or day of month); defaults to the config's date or today.")
+    parser.add_argument("--workers", type=int, help="Parse reports in this many processes.")
+    parser.add_argument("--stores", type=int, help="With a manifest, run at most this many stores at once.")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    if "stores" in config:
+        logging.basicConfig(level=logging.INFO, format="%(levelname)s [%(threadName)s] %(message)s")
+        summaries = run_stores(config, day=args.date, workers=args.workers, max_concurrent_stores=args.stores)
+        if args.json:
+            print(json.dumps(summaries, indent=2))
+        else:
+            print(format_status_table(status_rows(summaries)))
+        return 1 if any(s["errors"] for tabs in summaries.values() for s in tabs.values()) else 0
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    summaries = run(config, day=args.date, workers=args.workers)
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+    else:
+        for name, summary in summaries.items():
+            print(f"{name}: {', '.join(summary['sections']) or 'nothing written'}; "
+                  f"{summary.get('write', 'no write')} ({summary['total_ms']} ms, {summary['http_calls']} HTTP calls)")
+            for error in summary["errors"]:
+                print(f"  error: {error}")
+    return 1 if any(summary["errors"] for summary in summaries.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,454 @@
+"""Benchmark the report pipeline on synthetic DMS exports.
+
+For every report type and size this times the three stages of an upload:
+reading the Excel file, processing it into per-advisor metrics, and
+building the cell plan the app would write. It records rows per second and
+the peak traced memory of each stage, so regressions show up before
+month-end instead of during it.
+
+    python benchmark.py                                  # every report at 1k/100k/1M rows
+    python benchmark.py --reports menu_sales,timecard --sizes 1k,100k --output bench.jsonl
+
+Generated files are kept in --data-dir and reused by later runs.
+
+Micro-benchmarks time single processors against the implementations they
+replaced, on in-memory inputs, and check that both give the same result:
+
+    python benchmark.py --micro timecard --sizes 10k,100k
+    python benchmark.py --micro alignment --sizes 10k,100k,1m
+    python benchmark.py --micro clean_column_data --sizes 1m
+    python benchmark.py --micro all --check              # equivalence only, small inputs
+
+tests/test_equivalence.py runs the same comparisons under pytest.
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import report_processing
+import sheet_io
+import synthetic_reports
+
+_SIZE_SUFFIXES = {"k": 1000, "m": 1000000}
+
+def parse_size(text):
+    text = text.strip().lower()
+    if text[-1:] in _SIZE_SUFFIXES:
+        return int(float(text[:-1]) * _SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+# ── CELL PLANS ──────────────────────────────────────────────────────────────
+# The same cell layout the app writes, built against a synthetic sheet: one
+# 26-row block per advisor on the Advisor tab, 4-row blocks elsewhere, one
+# column per day.
+
+def _advisor_mapping(names, first_row=4, stride=26):
+    return {name: first_row + i * stride for i, name in enumerate(sorted(names))}
+
+def build_cell_plan(report, result):
+    """Add the cells for a processed `report` to a new SheetWritePlan."""
+    plan = sheet_io.SheetWritePlan()
+    offsets = sheet_io.ADVISOR_DATA_ROW_OFFSETS
+    day_to_col = {str(day): day + 3 for day in range(1, 32)}
+    section = synthetic_reports.REPORTS[report][1]
+
+    if section in ("ro_count", "menu_sales", "alacarte", "recommendations", "daily"):
+        series = result if isinstance(result, tuple) else (result,)
+        first_row = {"ro_count": 'RO Count', "menu_sales": 'Menu Sales', "alacarte": 'A-la-carte Count',
+                     "recommendations": 'Rec Count', "daily": 'Daily Labor Gross'}[section]
+        sheet_io.update_google_sheet(None, *series, date_col_index=5, start_row_offset=offsets[first_row] - 1,
+                                advisor_mapping=_advisor_mapping(series[0]), plan=plan)
+    elif section in ("commodity", "tires", "alignment"):
+        if section == "tires":
+            data = {'Tires': {'actual_quantity_sums': result[0], 'gross_sums': result[1]}}
+            names = result[0]
+        elif section == "commodity":
+            data = {'Air Filters': {'name_counts': result[0], 'parts_gross_sums': result[1]}}
+            names = result[0]
+        else:
+            data = {'Alignments': {'name_counts': result, 'parts_gross_sums': {}, 'labor_gross_sums': {}}}
+            names = result
+        sheet_io.update_commodities_in_sheet(None, 5, data, sheet_io.COMMODITIES + ['Alignments'],
+                                        _advisor_mapping(names), offsets, plan=plan)
+    elif section == "technician_report":
+        sheet_io.update_rth_technician_data(None, result[0], result[1], 5, _advisor_mapping(result[0], 4, 4), plan=plan)
+    elif section == "timecard":
+        date_range, timecard_data = result
+        sheet_io.update_rth_timecard_data(None, date_range, timecard_data, _advisor_mapping(timecard_data, 4, 4),
+                                     day_to_col=day_to_col, plan=plan)
+    elif section == "appointments":
+        names = {name for day in result.values() for name in day}
+        sheet_io.update_appointments_in_sheet(None, result, {}, {}, _advisor_mapping(names, 4, 4),
+                                         update_toyota=False, update_alfa=False, day_to_col=day_to_col, plan=plan)
+    plan.requests()
+    return plan
+
+# ── RUNNER ──────────────────────────────────────────────────────────────────
+
+class _TimedReader:
+    """Wraps read_excel_projected to time the reads a section makes."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.peak = 0
+        self.rows = 0
+
+    def __call__(self, *args, **kwargs):
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        df = report_processing.read_excel_projected(*args, **kwargs)
+        self.seconds += time.perf_counter() - start
+        if tracemalloc.is_tracing():
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            # What follows counts towards the processing peak
+            tracemalloc.reset_peak()
+        self.rows += len(df)
+        return df
+
+    def chunks(self, *args, **kwargs):
+        """Streamed reads (multi-file sections), timed chunk by chunk."""
+        iterator = report_processing.iter_excel_projected(*args, **kwargs)
+        while True:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            start = time.perf_counter()
+            df = next(iterator, None)
+            self.seconds += time.perf_counter() - start
+            if tracemalloc.is_tracing():
+                self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.reset_peak()
+            if df is None:
+                return
+            self.rows += len(df)
+            yield df
+
+def _run_stages(report, path):
+    _, section, options = synthetic_reports.REPORTS[report]
+    reader = _TimedReader()
+    start = time.perf_counter()
+    result = report_processing.SECTIONS[section]([path], reader=reader, **options)
+    compute_seconds = time.perf_counter() - start
+    process_peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    plan = build_cell_plan(report, result)
+    plan_seconds = time.perf_counter() - start
+    plan_peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+    return {
+        "rows": reader.rows,
+        "read_s": reader.seconds,
+        "process_s": compute_seconds - reader.seconds,
+        "plan_s": plan_seconds,
+        "cells": len(plan),
+        "read_peak": reader.peak,
+        "process_peak": process_peak,
+        "plan_peak": plan_peak,
+    }
+
+def run_benchmark(report, rows, data_dir, advisors=25, measure_memory=True):
+    """Generate (or reuse) a synthetic file and benchmark it. Returns a
+    dict of timings, rows/s per stage and peak memory in bytes."""
+    path = os.path.join(data_dir, f"{report}-{rows}-{advisors}.xlsx")
+    if not os.path.exists(path):
+        synthetic_reports.generate(report, path, rows, advisors)
+
+    recorder = report_processing.MessageRecorder()
+    previous = report_processing.set_ui(recorder)
+    try:
+        timings = _run_stages(report, path)
+        if measure_memory:
+            # A second pass under tracemalloc, which would skew the timings
+            tracemalloc.start()
+            try:
+                memory = _run_stages(report, path)
+            finally:
+                tracemalloc.stop()
+        else:
+            memory = {}
+    finally:
+        report_processing.set_ui(previous)
+
+    record = {"report": report, "rows": timings["rows"], "advisors": advisors,
+              "file_bytes": os.path.getsize(path), "cells": timings["cells"]}
+    for stage in ("read", "process", "plan"):
+        seconds = timings[f"{stage}_s"]
+        record[f"{stage}_s"] = round(seconds, 4)
+        record[f"{stage}_rows_per_s"] = round(timings["rows"] / seconds) if seconds > 0 else None
+        record[f"{stage}_peak_bytes"] = memory.get(f"{stage}_peak")
+    return record
+
+# ── REFERENCE IMPLEMENTATIONS ───────────────────────────────────────────────
+# The processors as they were before being rewritten, kept verbatim (bar the
+# message sink) so the rewrites can be checked and timed against them.
+
+def _old_process_employee_timecard_data(df):
+    timecard_data = {}
+    date_range = None
+    
+    # Extract date range from row 1 (index 0), columns H-L (indexes 7-11)
+    try:
+        row_1 = df.iloc[0]
+        # Look for date range string in columns H-L
+        for col_idx in range(7, 12):  # Columns H, I, J, K, L
+            if col_idx < len(row_1):
+                cell_value = str(row_1.iloc[col_idx]).strip()
+                if "-" in cell_value and "/" in cell_value:
+                    # Found date range like "11/16/2025 - 11/30/2025"
+                    parts = cell_value.split("-")
+                    if len(parts) == 2:
+                        start_date = pd.to_datetime(parts[0].strip(), errors='coerce')
+                        end_date = pd.to_datetime(parts[1].strip(), errors='coerce')
+                        if pd.notna(start_date) and pd.notna(end_date):
+                            date_range = (start_date, end_date)
+                            break
+    except Exception as e:
+        report_processing.ui.warning(f"Could not extract date range from row 1: {e}")
+    
+    # Iterate through rows to find tech sections
+    current_tech_id = None
+    current_tech_name = None
+    current_tech_data = {}
+    
+    for idx, row in df.iterrows():
+        # Check if this row starts a new tech section
+        # Tech section starts when Column C (index 2) has a name and Column A (index 0) has employee number
+        col_c_value = str(row.iloc[2]).strip() if pd.notna(row.iloc[2]) else ""
+        col_a_value = str(row.iloc[0]).strip() if pd.notna(row.iloc[0]) else ""
+        
+        # Detect new tech section: Column C has "Lastname, Firstname" format
+        if col_c_value and "," in col_c_value and len(col_c_value) > 3:
+            # Save previous tech's data if exists
+            if current_tech_id and current_tech_data:
+                timecard_data[current_tech_id] = current_tech_data
+            
+            # Start new tech
+            current_tech_id = col_a_value  # Employee number
+            current_tech_name = col_c_value  # "Lastname, Firstname"
+            
+            # Convert "Lastname, Firstname" to "FIRSTNAME LASTNAME" for matching
+            if "," in current_tech_name:
+                parts = current_tech_name.split(",")
+                if len(parts) == 2:
+                    lastname = parts[0].strip()
+                    firstname = parts[1].strip()
+                    current_tech_name = f"{firstname} {lastname}".upper()
+            
+            current_tech_data = {}
+            continue
+        
+        # If we're in a tech section, look for date rows
+        if current_tech_id:
+            # Check if Column A has a date (try to parse as date)
+            try:
+                date_value = pd.to_datetime(row.iloc[0], errors='coerce')
+                if pd.notna(date_value):
+                    # This is a date row! Extract day number
+                    day_number = str(date_value.day)
+                    
+                    # Get Paid amount from Column K (index 10)
+                    paid_value = pd.to_numeric(row.iloc[10], errors='coerce') if len(row) > 10 else 0
+                    paid_value = paid_value if pd.notna(paid_value) else 0
+                    
+                    # Calculate daily objective: 8 if paid > 0, else 0
+                    daily_objective = 8 if paid_value > 0 else 0
+                    
+                    # Store the data
+                    current_tech_data[day_number] = {
+                        "attendance": float(paid_value),
+                        "objective": daily_objective
+                    }
+            except:
+                pass
+    
+    # Save last tech's data
+    if current_tech_id and current_tech_data:
+        timecard_data[current_tech_id] = current_tech_data
+
+    return date_range, timecard_data
+
+def _old_process_alignment_new_format(df, advisor_col='Advisor Name', story_col='Operation Tech Story'):
+   
+    df[advisor_col] = df[advisor_col].astype(str).str.strip().str.upper()
+    alignment_counts = {}
+    for _, row in df.iterrows():
+        advisor = row[advisor_col]
+        story_text = str(row.get(story_col, "")).lower()
+        if "wheel alignment" in story_text:
+            alignment_counts[advisor] = alignment_counts.get(advisor, 0) + 1
+
+    # Return just name_counts; no parts/labor
+    return alignment_counts
+
+def _old_clean_column_data(column):
+    return column.replace(r'[\$,]', '', regex=True).replace(',', '', regex=True).astype(float)
+
+# ── MICRO-BENCHMARKS ────────────────────────────────────────────────────────
+# Each entry builds its inputs for a row count (one or more named cases) and
+# names the old and new implementation; both run on a copy of every input.
+
+def _timecard_frame(rows, rng):
+    """An Employee Timecard sheet as read positionally (columns A-L), with
+    the cases the old parser handled: string and datetime dates, 'n/a' Paid
+    cells, repeated and blank employee numbers and a day listed twice."""
+    start = dt.datetime(2025, 11, 16)
+    days = 15
+    sheet = [[None] * 7 + [f"{start:%m/%d/%Y} - {start + dt.timedelta(days=days - 1):%m/%d/%Y}"], [], [], [], []]
+    techs = max(rows // (3 + 3 * (days + 1)), 1)
+    for t in range(techs):
+        if t % 7 == 3:
+            employee = None          # blank employee number: section skipped
+        elif t % 5 == 4:
+            employee = f"{1000 + t - 1}"  # same number as the previous section
+        else:
+            employee = 1000 + t if t % 2 else f"{1000 + t}"
+        sheet.append([employee, None, f"Tech{t}, Name{t}"])
+        sheet.append(["Date", "In", "Out", None, None, None, None, None, None, None, "Paid"])
+        for d in list(range(days)) + [5]:  # day 6 is listed again at the end
+            date = start + dt.timedelta(days=d)
+            paid = rng.choice(["n/a", 0, round(float(rng.uniform(6, 10)), 2), round(float(rng.uniform(6, 10)), 2)])
+            sheet.append([date if t % 2 else f"{date:%m/%d/%Y}", "8:00 AM", "4:30 PM"] + [None] * 7 + [paid])
+            sheet.append([None, "Lunch", None])
+            sheet.append([])
+    return pd.DataFrame([row + [None] * (12 - len(row)) for row in sheet], dtype=object)
+
+def _alignment_frame(rows, rng):
+    """Advisor and tech-story columns with blank advisors, blank and
+    numeric stories and mixed-case "wheel alignment" text."""
+    advisors = synthetic_reports.advisor_names(25) + [np.nan]
+    stories = synthetic_reports._TECH_STORIES + ["WHEEL ALIGNMENT CHECK", np.nan, 42]
+    return pd.DataFrame({
+        "Advisor Name": [advisors[i] if i == 25 else f" {advisors[i].title()} " if i % 3 == 0 else advisors[i]
+                         for i in rng.integers(0, len(advisors), rows)],
+        "Operation Tech Story": [stories[i] for i in rng.integers(0, len(stories), rows)],
+    })
+
+def _money_columns(rows, rng):
+    """clean_column_data inputs: numbers Excel delivered as numbers, a few
+    hundred money texts repeated, all-distinct money text, and floats with
+    5% text cells."""
+    values = rng.uniform(0, 5000, rows).round(2)
+    repeated = rng.uniform(0, 5000, 300).round(2)[rng.integers(0, 300, rows)]
+    mixed = pd.Series(values, dtype=object)
+    as_text = rng.random(rows) < 0.05
+    mixed[as_text] = [f"${v:,.2f}" for v in values[as_text]]
+    return [("float", pd.Series(values)),
+            ("repeated money text", pd.Series([f"${v:,.2f}" for v in repeated], dtype=object)),
+            ("distinct money text", pd.Series([f"${v:,.2f}" for v in values + np.arange(rows) * 5000], dtype=object)),
+            ("mixed 5% text", mixed)]
+
+MICRO = {
+    "timecard": (lambda rows, rng: [("timecard", _timecard_frame(rows, rng))],
+                 _old_process_employee_timecard_data, report_processing.process_employee_timecard_data),
+    "alignment": (lambda rows, rng: [("alignment", _alignment_frame(rows, rng))],
+                  _old_process_alignment_new_format, report_processing.process_alignment_new_format),
+    "clean_column_data": (_money_columns, _old_clean_column_data, report_processing.clean_column_data),
+}
+
+def _copy(value):
+    return value.copy() if hasattr(value, "copy") else value
+
+def _same(old, new):
+    if isinstance(old, pd.Series):
+        return np.array_equal(old.to_numpy(dtype=float), new.to_numpy(dtype=float), equal_nan=True)
+    return old == new
+
+def run_micro(name, rows, seed=0):
+    """Time the old and new implementation of `name` on inputs of about
+    `rows` rows. Returns one record per case."""
+    make_inputs, old, new = MICRO[name]
+    records = []
+    recorder = report_processing.MessageRecorder()
+    previous = report_processing.set_ui(recorder)
+    try:
+        for case, value in make_inputs(rows, np.random.default_rng(seed)):
+            timings = {}
+            results = {}
+            for label, function in (("old", old), ("new", new)):
+                argument = _copy(value)
+                start = time.perf_counter()
+                results[label] = function(argument)
+                timings[label] = time.perf_counter() - start
+            records.append({"micro": name, "case": case, "rows": len(value), "old_s": round(timings["old"], 4),
+                            "new_s": round(timings["new"], 4),
+                            "speedup": round(timings["old"] / timings["new"], 1) if timings["new"] > 0 else None,
+                            "same": bool(_same(results["old"], results["new"]))})
+    finally:
+        report_processing.set_ui(previous)
+    return records
+
+def _format_bytes(value):
+    return "-" if value is None else f"{value / (1024 * 1024):.1f}MB"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark report reading, processing and cell planning.")
+    parser.add_argument("--reports", default=",".join(synthetic_reports.REPORTS),
+                        help="Comma-separated report types (default: all).")
+    parser.add_argument("--sizes", default="1k,100k,1m", help="Comma-separated row counts, e.g. 1k,100k,1m.")
+    parser.add_argument("--advisors", type=int, default=25)
+    parser.add_argument("--data-dir", default=".benchmark_data")
+    parser.add_argument("--output", help="Append one JSON line per run to this file.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass.")
+    parser.add_argument("--micro", help=f"Comma-separated micro-benchmarks instead of the reports "
+                                        f"({', '.join(MICRO)}, or all).")
+    parser.add_argument("--check", action="store_true",
+                        help="With --micro: only compare old and new results on 1k-row inputs; exit 1 on a mismatch.")
+    args = parser.parse_args(argv)
+
+    if args.micro:
+        return run_micro_cli(parser, args)
+
+    reports = [r.strip() for r in args.reports.split(",") if r.strip()]
+    unknown = [r for r in reports if r not in synthetic_reports.REPORTS]
+    if unknown:
+        parser.error(f"unknown report(s): {', '.join(unknown)}")
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    print(f"{'report':<18}{'rows':>9}{'read s':>9}{'proc s':>9}{'plan s':>9}{'read rows/s':>13}"
+          f"{'read peak':>11}{'proc peak':>11}{'cells':>8}")
+    for report in reports:
+        for rows in sizes:
+            record = run_benchmark(report, rows, args.data_dir, args.advisors, not args.no_memory)
+            print(f"{report:<18}{record['rows']:>9}{record['read_s']:>9.3f}{record['process_s']:>9.3f}"
+                  f"{record['plan_s']:>9.3f}{record['read_rows_per_s'] or 0:>13}"
+                  f"{_format_bytes(record['read_peak_bytes']):>11}{_format_bytes(record['process_peak_bytes']):>11}"
+                  f"{record['cells']:>8}")
+            sys.stdout.flush()
+            if args.output:
+                with open(args.output, "a") as fh:
+                    fh.write(json.dumps(record) + "\n")
+
+def run_micro_cli(parser, args):
+    names = list(MICRO) if args.micro.strip() == "all" else [n.strip() for n in args.micro.split(",") if n.strip()]
+    unknown = [n for n in names if n not in MICRO]
+    if unknown:
+        parser.error(f"unknown micro-benchmark(s): {', '.join(unknown)}")
+    sizes = [1000] if args.check else [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+
+    print(f"{'micro':<20}{'case':<22}{'rows':>9}{'old s':>10}{'new s':>10}{'speedup':>9}  same")
+    mismatches = 0
+    for name in names:
+        for rows in sizes:
+            for record in run_micro(name, rows):
+                mismatches += not record["same"]
+                print(f"{name:<20}{record['case']:<22}{record['rows']:>9}{record['old_s']:>10.3f}{record['new_s']:>10.3f}"
+                      f"{record['speedup'] or 0:>8.1f}x  {'yes' if record['same'] else 'NO'}")
+                sys.stdout.flush()
+                if args.output:
+                    with open(args.output, "a") as fh:
+                        fh.write(json.dumps(record) + "\n")
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
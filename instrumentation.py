@@ -0,0 +1,111 @@
+"""Per-action timing and counters.
+
+An action is one user-triggered run (a button press, a CLI batch). While it
+is active, `stage(name)` times a block of work and `count(key, n)` bumps a
+counter; both are no-ops outside an action, so library code can call them
+unconditionally. The current action lives in a context variable, so
+concurrent Streamlit sessions don't mix their numbers.
+
+Finished actions are appended to a JSON-lines log (ACTION_LOG_PATH,
+default action_log.jsonl; set it empty to disable) for aggregation across
+sessions.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+_ACTION_LOG_PATH = os.environ.get("ACTION_LOG_PATH", "action_log.jsonl")
+_log_lock = threading.Lock()
+_current = contextvars.ContextVar("instrumentation_action", default=None)
+
+class Action:
+    def __init__(self, name, **context):
+        self.name = name
+        self.context = context
+        self.started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self.total_ms = None
+        self.stages = {}    # name -> {"ms": float, "calls": int}
+        self.counters = {}  # name -> number
+        self.error = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, (time.perf_counter() - start) * 1000)
+
+    def add_stage(self, name, ms, calls=1):
+        entry = self.stages.setdefault(name, {"ms": 0.0, "calls": 0})
+        entry["ms"] += ms
+        entry["calls"] += calls
+
+    def count(self, key, n=1):
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def finish(self):
+        if self.total_ms is None:
+            self.total_ms = (time.perf_counter() - self._start) * 1000
+        return self
+
+    def record(self):
+        return {
+            "action": self.name,
+            "started_at": self.started_at.isoformat(),
+            "total_ms": round(self.total_ms or 0, 1),
+            "stages": {name: {"ms": round(s["ms"], 1), "calls": s["calls"]} for name, s in self.stages.items()},
+            "counters": {k: round(v, 1) if isinstance(v, float) else v for k, v in self.counters.items()},
+            "error": self.error,
+            **self.context,
+        }
+
+def current_action():
+    return _current.get()
+
+@contextlib.contextmanager
+def stage(name):
+    action_ = _current.get()
+    if action_ is None:
+        yield
+    else:
+        with action_.stage(name):
+            yield
+
+def count(key, n=1):
+    action_ = _current.get()
+    if action_ is not None:
+        action_.count(key, n)
+
+def append_log(record, path=None):
+    path = _ACTION_LOG_PATH if path is None else path
+    if not path:
+        return
+    line = json.dumps(record, default=str)
+    with _log_lock:
+        with open(path, "a") as fh:
+            fh.write(line + "\n")
+
+@contextlib.contextmanager
+def action(name, log_path=None, **context):
+    """Run a block as an instrumented action. Yields the Action; on exit it
+    is finished and appended to the log (errors are recorded and re-raised)."""
+    action_ = Action(name, **context)
+    token = _current.set(action_)
+    try:
+        yield action_
+    except Exception as e:
+        action_.error = str(e)
+        raise
+    finally:
+        _current.reset(token)
+        action_.finish()
+        try:
+            append_log(action_.record(), log_path)
+        except OSError:
+            pass
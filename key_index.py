@@ -0,0 +1,222 @@
+"""Persistent record of the RO lines already counted, per store and month.
+
+Overlapping DMS exports repeat yesterday's RO lines, so without a memory of
+what was counted they are counted again for today. A key index keeps, for
+one store and month, a 64-bit hash of every dedupe key that was counted
+with the day it was counted for, and the SHA-256 of every file read. Rows
+and files already counted for another day are skipped. The same day can
+always be re-run, so re-uploading a corrected export never zeroes a day.
+
+Keys and files are recorded per report (Menu Sales, each Alignment
+section), so one report's lines never hide another's. A day recorded by
+mistake (a run under the wrong date) can be forgotten:
+
+    python key_index.py "Store 12 Report" 2025-11                  # days recorded
+    python key_index.py "Store 12 Report" 2025-11 --forget-day 17
+
+Indexes are .npz files under KEY_INDEX_DIR (default .key_index), one per
+store and month: <store>/<YYYY-MM>.npz, with a <YYYY-MM>.npz.lock beside it
+that commits from any process take in turn.
+"""
+import argparse
+import contextlib
+import hashlib
+import os
+import re
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: only this process's threads are serialized
+    fcntl = None
+
+_KEY_INDEX_DIR = os.environ.get("KEY_INDEX_DIR", ".key_index")
+_commit_lock = threading.Lock()
+
+def index_path(store, month, directory=None):
+    """Path of the index for `store` (e.g. the sheet name) and `month`
+    ("YYYY-MM")."""
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", str(store)).strip("_") or "default"
+    return os.path.join(directory or _KEY_INDEX_DIR, slug, f"{month}.npz")
+
+def file_digest(uploaded_file):
+    """SHA-256 of an upload's bytes or of a file on disk (archived uploads
+    carry theirs)."""
+    if isinstance(getattr(uploaded_file, "digest", None), str):
+        return uploaded_file.digest
+    if hasattr(uploaded_file, "getvalue"):
+        return hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    with open(uploaded_file, "rb") as fh:
+        return hashlib.sha256(fh.read()).hexdigest()
+
+def _load(path):
+    """{"keys": {keyset: (sorted hashes, days)}, "files": {digest: day}}."""
+    index = {"keys": {}, "files": {}}
+    if not os.path.exists(path):
+        return index
+    with np.load(path) as data:
+        for i, keyset in enumerate(data["keysets"]):
+            index["keys"][str(keyset)] = (data[f"hashes_{i}"], data[f"days_{i}"])
+        index["files"] = {str(d): int(day) for d, day in zip(data["file_digests"], data["file_days"])}
+    return index
+
+def _save(path, index):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    keysets = list(index["keys"])
+    arrays = {"keysets": np.array(keysets, dtype=str),
+              "file_digests": np.array(list(index["files"]), dtype=str),
+              "file_days": np.array(list(index["files"].values()), dtype=np.uint8)}
+    for i, keyset in enumerate(keysets):
+        arrays[f"hashes_{i}"], arrays[f"days_{i}"] = index["keys"][keyset]
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as fh:
+        np.savez(fh, **arrays)
+    os.replace(tmp, path)
+
+@contextlib.contextmanager
+def _locked(path):
+    """Hold the index at `path` for a load-merge-save. The app's threads,
+    the batch runner's stores and the parse workers can all commit the same
+    month, so besides the thread lock an exclusive flock on <path>.lock
+    keeps other processes out until the save is done."""
+    with _commit_lock:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(f"{path}.lock", "a") as fh:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            yield
+
+class KeyIndex:
+    """The key index of one store and month, as seen when parsing `day`.
+
+    Parsing asks `file_counted_on` and `uncounted` what to skip and hands
+    what it counted (once a file parsed whole) to `add_updates`; those are
+    held as pending updates until `commit` writes them. Pickled copies (for
+    worker processes) carry the path and day only and hand their updates
+    back through take_updates / add_updates.
+    """
+
+    def __init__(self, path, day):
+        self.path = path
+        self.day = int(day)
+        self._index = None
+        self._pending_keys = {}   # keyset -> [hash arrays]
+        self._pending_files = set()
+
+    def __repr__(self):
+        # Part of the app's parse-cache key: a commit from another day
+        # changes the mtime and with it what a parse would skip
+        mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else 0
+        return f"KeyIndex({self.path!r}, day={self.day}, mtime={mtime})"
+
+    def __getstate__(self):
+        return {"path": self.path, "day": self.day}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["day"])
+
+    def _loaded(self):
+        if self._index is None:
+            self._index = _load(self.path)
+        return self._index
+
+    def file_counted_on(self, digest):
+        """The other day a file with this digest was counted for, or None
+        (never counted, or counted for this day)."""
+        day = self._loaded()["files"].get(digest)
+        if day is not None and day != self.day:
+            return day
+        return None
+
+    def uncounted(self, keyset, hashes):
+        """Mask of the rows (by key hash) not counted for another day."""
+        known, days = self._loaded()["keys"].get(keyset, (np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.uint8)))
+        positions = np.searchsorted(known, hashes)
+        found = positions < len(known)
+        found[found] = known[positions[found]] == hashes[found]
+        elsewhere = np.zeros(len(hashes), dtype=bool)
+        elsewhere[found] = days[positions[found]] != self.day
+        return ~elsewhere
+
+    def take_updates(self):
+        updates = {"keys": {k: np.unique(np.concatenate(v)) for k, v in self._pending_keys.items()},
+                   "files": sorted(self._pending_files)}
+        self._pending_keys, self._pending_files = {}, set()
+        return updates
+
+    def add_updates(self, updates):
+        """Hold {"keys": {keyset: hashes}, "files": [digests]} for commit."""
+        for keyset, hashes in updates["keys"].items():
+            self._pending_keys.setdefault(keyset, []).append(hashes)
+        self._pending_files.update(updates["files"])
+
+    def forget(self):
+        """Drop every key and file recorded for this day. Returns
+        (keys_dropped, files_dropped)."""
+        self.take_updates()
+        with _locked(self.path):
+            index = _load(self.path)
+            keys_dropped = 0
+            for keyset, (hashes, days) in list(index["keys"].items()):
+                keep = days != self.day
+                keys_dropped += int((~keep).sum())
+                index["keys"][keyset] = (hashes[keep], days[keep])
+            files = {digest: day for digest, day in index["files"].items() if day != self.day}
+            files_dropped = len(index["files"]) - len(files)
+            index["files"] = files
+            if keys_dropped or files_dropped:
+                _save(self.path, index)
+        self._index = None
+        return keys_dropped, files_dropped
+
+    def commit(self):
+        """Record the pending keys and files for this day. Entries already
+        on disk keep the day they were first counted for."""
+        updates = self.take_updates()
+        if not updates["files"] and not any(len(h) for h in updates["keys"].values()):
+            return
+        with _locked(self.path):
+            index = _load(self.path)
+            for keyset, hashes in updates["keys"].items():
+                known, days = index["keys"].get(keyset, (np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.uint8)))
+                new = np.setdiff1d(hashes, known, assume_unique=True)
+                merged = np.concatenate([known, new])
+                merged_days = np.concatenate([days, np.full(len(new), self.day, dtype=np.uint8)])
+                order = np.argsort(merged, kind="stable")
+                index["keys"][keyset] = (merged[order], merged_days[order])
+            for digest in updates["files"]:
+                index["files"].setdefault(digest, self.day)
+            _save(self.path, index)
+        self._index = None
+
+def day_counts(path):
+    """{day: (keys, files)} recorded in the index at `path`."""
+    index = _load(path)
+    counts = {}
+    for _, days in index["keys"].values():
+        for day, n in zip(*np.unique(days, return_counts=True)):
+            keys, files = counts.get(int(day), (0, 0))
+            counts[int(day)] = (keys + int(n), files)
+    for day in index["files"].values():
+        keys, files = counts.get(day, (0, 0))
+        counts[day] = (keys, files + 1)
+    return dict(sorted(counts.items()))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show or correct the RO lines counted per day of a month.")
+    parser.add_argument("store", help="Store, as the sheet name the app and batch runner use.")
+    parser.add_argument("month", help="Month as YYYY-MM.")
+    parser.add_argument("--forget-day", type=int, help="Drop the lines and files recorded for this day.")
+    args = parser.parse_args(argv)
+    path = index_path(args.store, args.month)
+    if args.forget_day is not None:
+        keys, files = KeyIndex(path, args.forget_day).forget()
+        print(f"Dropped {keys} line(s) and {files} file(s) counted for day {args.forget_day}.")
+        return
+    for day, (keys, files) in day_counts(path).items():
+        print(f"day {day:>2}: {keys} line(s), {files} file(s)")
+
+if __name__ == "__main__":
+    main()
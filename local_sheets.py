@@ -0,0 +1,234 @@
+"""Local stand-in for the Google Sheets backend.
+
+LocalClient / LocalSpreadsheet / LocalWorksheet implement the part of the
+gspread API the app uses (open, worksheet, row_values, col_values,
+update_cells, batch_get, batch_update) on top of a grid kept in memory or
+in one JSON file per spreadsheet. Every call can sleep for a simulated
+latency and fail with a simulated 429 quota error, so the write path can be
+timed and exercised without network access or credentials.
+
+The app picks this backend when SHEETS_BACKEND=local (see from_environment).
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from gspread.exceptions import APIError
+from gspread.utils import ValueRenderOption, a1_to_rowcol, column_letter_to_index
+
+# ── CONFIGURATION ───────────────────────────────────────────────────────────
+
+def from_environment(request_hook=None):
+    """Build a LocalClient from the LOCAL_SHEETS_* environment variables:
+
+    LOCAL_SHEETS_DIR          directory of <spreadsheet>.json files; in memory if unset
+    LOCAL_SHEETS_LATENCY      seconds slept per call (default 0)
+    LOCAL_SHEETS_ERROR_RATE   probability of a simulated 429 per call (default 0)
+    """
+    return LocalClient(
+        directory=os.environ.get("LOCAL_SHEETS_DIR") or None,
+        latency=float(os.environ.get("LOCAL_SHEETS_LATENCY", "0")),
+        error_rate=float(os.environ.get("LOCAL_SHEETS_ERROR_RATE", "0")),
+        request_hook=request_hook,
+    )
+
+# ── SIMULATED API ERRORS ────────────────────────────────────────────────────
+
+class _SimulatedResponse:
+    """Just enough of a requests.Response for gspread's APIError."""
+
+    def __init__(self, status_code, message):
+        self.status_code = status_code
+        self.text = message
+        self._payload = {"error": {"code": status_code, "message": message, "status": "RESOURCE_EXHAUSTED"}}
+
+    def json(self):
+        return self._payload
+
+def quota_error():
+    return APIError(_SimulatedResponse(429, "Quota exceeded (simulated by the local sheets backend)."))
+
+# ── A1 RANGES ───────────────────────────────────────────────────────────────
+
+_A1_PART = re.compile(r"^([A-Za-z]*)(\d*)$")
+
+def _parse_a1_part(part):
+    match = _A1_PART.match(part.replace("$", ""))
+    if not match or not (match.group(1) or match.group(2)):
+        raise ValueError(f"Invalid A1 reference: {part!r}")
+    letters, digits = match.groups()
+    row = int(digits) if digits else None
+    col = column_letter_to_index(letters.upper()) if letters else None
+    return row, col
+
+def parse_a1_range(a1, max_row, max_col):
+    """(top, left, bottom, right) of an A1 range such as "C5:D9", "2:2",
+    "A:B" or "C5". Open ends are clamped to the grid's current extent."""
+    a1 = a1.split("!")[-1]
+    first, _, last = a1.partition(":")
+    top, left = _parse_a1_part(first)
+    bottom, right = _parse_a1_part(last) if last else (top, left)
+    return (top or 1, left or 1, bottom or max(max_row, top or 1), right or max(max_col, left or 1))
+
+# ── BACKEND ─────────────────────────────────────────────────────────────────
+
+def _formatted(value):
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+class LocalWorksheet:
+    def __init__(self, spreadsheet, title, cells):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self._cells = cells  # {(row, col): value}
+
+    def _call(self, kind, action):
+        return self.spreadsheet.client.call(kind, action)
+
+    def _extent(self):
+        if not self._cells:
+            return 0, 0
+        return max(r for r, _ in self._cells), max(c for _, c in self._cells)
+
+    def _read(self, top, left, bottom, right, render):
+        """Values of a rectangle with trailing blanks trimmed, like the API."""
+        rows = []
+        for row in range(top, bottom + 1):
+            values = [self._cells.get((row, col), "") for col in range(left, right + 1)]
+            while values and values[-1] == "":
+                values.pop()
+            # Nothing here is a formula, so FORMULA reads return the raw values too
+            if render == ValueRenderOption.formatted:
+                values = [_formatted(v) for v in values]
+            rows.append(values)
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def _set(self, row, col, value):
+        if value is None or value == "":
+            self._cells.pop((row, col), None)
+        else:
+            self._cells[(row, col)] = value
+
+    def row_values(self, row, value_render_option=ValueRenderOption.formatted, **kwargs):
+        def action():
+            _, max_col = self._extent()
+            values = self._read(row, 1, row, max_col, value_render_option)
+            return values[0] if values else []
+        return self._call("read", action)
+
+    def col_values(self, col, value_render_option=ValueRenderOption.formatted, **kwargs):
+        def action():
+            max_row, _ = self._extent()
+            return [r[0] if r else "" for r in self._read(1, col, max_row, col, value_render_option)]
+        return self._call("read", action)
+
+    def get(self, range_name, value_render_option=ValueRenderOption.formatted, **kwargs):
+        return self.batch_get([range_name], value_render_option=value_render_option)[0]
+
+    def batch_get(self, ranges, value_render_option=ValueRenderOption.formatted, **kwargs):
+        def action():
+            max_row, max_col = self._extent()
+            return [self._read(*parse_a1_range(a1, max_row, max_col), value_render_option) for a1 in ranges]
+        return self._call("read", action)
+
+    def update_cells(self, cell_list, value_input_option=None):
+        def action():
+            with self.spreadsheet.lock:
+                for cell in cell_list:
+                    self._set(cell.row, cell.col, cell.value)
+                self.spreadsheet.save()
+            return {"updatedCells": len(cell_list)}
+        return self._call("write", action)
+
+    def batch_update(self, data, value_input_option=None, **kwargs):
+        def action():
+            updated = 0
+            with self.spreadsheet.lock:
+                for entry in data:
+                    top, left = a1_to_rowcol(entry["range"].split("!")[-1].split(":")[0])
+                    for r, row_values in enumerate(entry["values"]):
+                        for c, value in enumerate(row_values):
+                            self._set(top + r, left + c, value)
+                            updated += 1
+                self.spreadsheet.save()
+            return {"totalUpdatedCells": updated}
+        return self._call("write", action)
+
+class LocalSpreadsheet:
+    def __init__(self, client, title, path=None):
+        self.client = client
+        self.title = title
+        self.path = path
+        self.lock = threading.RLock()
+        self._worksheets = {}
+        if path and os.path.exists(path):
+            with open(path) as fh:
+                for name, cells in json.load(fh).items():
+                    self._worksheets[name] = {(r, c): v for r, c, v in cells}
+
+    def worksheet(self, title):
+        """Return a worksheet, creating an empty one if it does not exist."""
+        with self.lock:
+            cells = self._worksheets.setdefault(title, {})
+        return LocalWorksheet(self, title, cells)
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            payload = {name: [[r, c, v] for (r, c), v in sorted(cells.items())]
+                       for name, cells in self._worksheets.items()}
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as fh:
+                json.dump(payload, fh)
+            os.replace(tmp, self.path)
+
+class LocalClient:
+    """Drop-in for gspread.Client. `request_hook(kind, action)` wraps every
+    call ("read" or "write"), e.g. to apply the app's rate limiter and
+    retries; without it the action is called directly."""
+
+    def __init__(self, directory=None, latency=0.0, error_rate=0.0, request_hook=None, seed=None):
+        self.directory = directory
+        self.latency = latency
+        self.error_rate = error_rate
+        self.request_hook = request_hook
+        self.calls = {"read": 0, "write": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._spreadsheets = {}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def open(self, title):
+        def action():
+            with self._lock:
+                spreadsheet = self._spreadsheets.get(title)
+                if spreadsheet is None:
+                    path = os.path.join(self.directory, f"{title}.json") if self.directory else None
+                    spreadsheet = self._spreadsheets[title] = LocalSpreadsheet(self, title, path)
+            return spreadsheet
+        return self.call("read", action)
+
+    def _simulate(self, kind, action):
+        with self._lock:
+            self.calls[kind] += 1
+            fail = self.error_rate and self._random.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise quota_error()
+        return action()
+
+    def call(self, kind, action):
+        if self.request_hook is None:
+            return self._simulate(kind, action)
+        return self.request_hook(kind, lambda: self._simulate(kind, action))
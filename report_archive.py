@@ -0,0 +1,391 @@
+"""Parquet archive of every parsed report.
+
+Every read a section makes of an upload is kept as Parquet, with the
+projected columns only, under one directory per store, report type and
+date:
+
+    REPORT_ARCHIVE_DIR/store=<store>/report=<section>/date=<YYYY-MM-DD>/
+
+(default .report_archive; set it empty to disable). A read is identified
+by the file's SHA-256 and the read options, so parsing the same file again
+for that store, report and date loads the Parquet instead of the xlsx.
+Each parse also leaves a small JSON manifest (files, digests, options), so
+a past day can be re-processed or audited without the original uploads:
+
+    python report_archive.py                                        # list what is archived
+    python report_archive.py "Store 12 Report" menu_sales 2025-11-17
+    python report_archive.py "Store 12 Report" menu_sales 2025-11-17 --frames
+"""
+import argparse
+import contextlib
+import contextvars
+import functools
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+from datetime import datetime, timezone
+
+import pandas as pd
+
+import report_processing
+from key_index import KeyIndex, file_digest
+from report_processing import SECTIONS, iter_excel_projected, read_excel_projected, upload_name
+
+_REPORT_ARCHIVE_DIR = os.environ.get("REPORT_ARCHIVE_DIR", ".report_archive")
+_current = contextvars.ContextVar("report_archive_scope", default=None)
+
+def _slug(text):
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", str(text)).strip("_") or "default"
+
+def _callable_tag(value):
+    """A bound argument of a projection, with callables by name."""
+    if isinstance(value, functools.partial):
+        return (value.func.__qualname__, tuple(_callable_tag(arg) for arg in value.args))
+    if callable(value):
+        return value.__qualname__
+    return value
+
+def _read_tag(columns, header, max_col, formats=None):
+    """Short stable id of a read's options. Projections are callables or
+    name lists; callables are identified by name (and bound arguments),
+    report formats by name."""
+    if isinstance(columns, functools.partial):
+        projection = _callable_tag(columns)
+    elif callable(columns):
+        projection = columns.__qualname__
+    elif columns is not None:
+        projection = sorted(columns)
+    else:
+        projection = None
+    options = (projection, header, max_col)
+    if formats is not None:
+        options += (repr(formats),)
+    return hashlib.sha1(repr(options).encode()).hexdigest()[:12]
+
+# ── PARQUET PARTS ───────────────────────────────────────────────────────────
+# One read is a directory of part files, one per chunk it was read in, so
+# streamed sections can be served chunk by chunk again.
+
+def _parquet_safe(df):
+    """`df` as Parquet can store it: object columns mixing types (numbers
+    and text in one column, as in positional or messy exports) become text,
+    which every processor already accepts, and column names become text."""
+    df = df.copy()
+    for column in df.columns[df.dtypes == object]:
+        values = df[column]
+        present = values.notna()
+        if not values[present].map(type).eq(str).all():
+            df[column] = values.where(~present, values.astype(str))
+    df.columns = [str(c) for c in df.columns]
+    return df
+
+def _load_part(path, header, formats=None):
+    df = pd.read_parquet(path)
+    read_format = report_processing.report_format(df, formats) if formats else None
+    if header is None or (read_format is not None and read_format.header is None):
+        # Positional reads are numbered 0..n, as read_excel_projected does
+        df.columns = range(len(df.columns))
+    return df
+
+def _parts(directory):
+    return sorted(glob.glob(os.path.join(directory, "part-*.parquet")))
+
+class _PartWriter:
+    """Writes the parts of one read to a temporary directory that is moved
+    into place on commit, so a read is either archived whole or not at all."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.tmp = f"{directory}.tmp-{os.getpid()}-{id(self)}"
+        self.count = 0
+        os.makedirs(self.tmp, exist_ok=True)
+
+    def add(self, df):
+        _parquet_safe(df).to_parquet(os.path.join(self.tmp, f"part-{self.count:05d}.parquet"), index=False)
+        self.count += 1
+
+    def commit(self):
+        try:
+            os.rename(self.tmp, self.directory)
+        except OSError:
+            # Archived meanwhile by another parse of the same file
+            self.discard()
+
+    def discard(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+# ── ARCHIVE READER ──────────────────────────────────────────────────────────
+
+class ArchivedUpload:
+    """Stand-in for an upload that only exists in the archive."""
+
+    def __init__(self, name, digest):
+        self.name = name
+        self.digest = digest
+
+class ArchiveReader:
+    """Reader called like read_excel_projected (and chunked like
+    iter_excel_projected) that serves reads already in the partition and
+    archives the others as they are read by `reader`. Failing to write the
+    archive is reported once and never fails the parse."""
+
+    def __init__(self, partition, reader=None):
+        self.partition = partition
+        self.reader = reader or read_excel_projected
+        self.hits = 0
+        self.disabled = False
+        self._digests = {}
+
+    def digest(self, uploaded_file):
+        if isinstance(uploaded_file, ArchivedUpload):
+            return uploaded_file.digest
+        key = id(uploaded_file)
+        if key not in self._digests:
+            self._digests[key] = file_digest(uploaded_file)
+        return self._digests[key]
+
+    def _read_dir(self, uploaded_file, columns, header, max_col, formats):
+        tag = _read_tag(columns, header, max_col, formats)
+        return os.path.join(self.partition.path, f"{self.digest(uploaded_file)[:16]}-{tag}")
+
+    def _writer(self, directory, uploaded_file):
+        if isinstance(uploaded_file, ArchivedUpload):
+            raise ValueError(f"'{uploaded_file.name}' is not in the archive with these read options.")
+        if self.disabled or os.path.isdir(directory):
+            return None
+        try:
+            return _PartWriter(directory)
+        except OSError as e:
+            self._disable(e)
+            return None
+
+    def _disable(self, error):
+        self.disabled = True
+        report_processing.ui.warning(f"Could not archive the parsed report: {error}")
+
+    def _add(self, writer, df):
+        if writer is None or self.disabled:
+            return
+        try:
+            writer.add(df)
+        except Exception as e:
+            writer.discard()
+            self._disable(e)
+
+    def _load_first(self, parts, header, formats, uploaded_file):
+        """The first archived part, or None (after a warning) when the
+        archive can't be read and the upload itself is at hand."""
+        try:
+            return _load_part(parts[0], header, formats)
+        except Exception as e:
+            if isinstance(uploaded_file, ArchivedUpload):
+                raise
+            self._disable(e)
+            return None
+
+    def __call__(self, uploaded_file, columns=None, header=0, max_col=None, formats=None):
+        directory = self._read_dir(uploaded_file, columns, header, max_col, formats)
+        parts = _parts(directory)
+        first = self._load_first(parts, header, formats, uploaded_file) if parts and not self.disabled else None
+        if first is not None:
+            self.hits += 1
+            frames = [first] + [_load_part(path, header, formats) for path in parts[1:]]
+            return first if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        writer = self._writer(directory, uploaded_file)
+        try:
+            df = self.reader(uploaded_file, columns=columns, header=header, max_col=max_col, formats=formats)
+        except Exception:
+            if writer is not None:
+                writer.discard()
+            raise
+        self._add(writer, df)
+        if writer is not None and not self.disabled:
+            writer.commit()
+        return df
+
+    def chunks(self, uploaded_file, columns=None, header=0, max_col=None, formats=None):
+        directory = self._read_dir(uploaded_file, columns, header, max_col, formats)
+        parts = _parts(directory)
+        first = self._load_first(parts, header, formats, uploaded_file) if parts and not self.disabled else None
+        if first is not None:
+            self.hits += 1
+            yield first
+            for path in parts[1:]:
+                yield _load_part(path, header, formats)
+            return
+        writer = self._writer(directory, uploaded_file)
+        chunks = getattr(self.reader, "chunks", None) or iter_excel_projected
+        complete = False
+        try:
+            for df in chunks(uploaded_file, columns=columns, header=header, max_col=max_col, formats=formats):
+                self._add(writer, df)
+                yield df
+            complete = True
+        finally:
+            if writer is not None and not self.disabled:
+                if complete:
+                    writer.commit()
+                else:
+                    writer.discard()
+
+    def save_manifest(self, section, uploaded_files, options):
+        if self.disabled:
+            return
+        try:
+            self.partition.save_manifest(section, [(upload_name(f), self.digest(f)) for f in uploaded_files], options)
+        except OSError as e:
+            self._disable(e)
+
+# ── PARTITIONS ──────────────────────────────────────────────────────────────
+
+class ArchivePartition:
+    """The archive directory of one store, report type (section) and date."""
+
+    def __init__(self, store, report, date, root=None):
+        self.store = str(store)
+        self.report = report
+        self.date = str(date)
+        self.root = root or _REPORT_ARCHIVE_DIR
+
+    @property
+    def path(self):
+        return os.path.join(self.root, f"store={_slug(self.store)}", f"report={_slug(self.report)}", f"date={self.date}")
+
+    def __repr__(self):
+        return f"ArchivePartition({self.path!r})"
+
+    def reader(self, reader=None):
+        return ArchiveReader(self, reader)
+
+    def run(self, section, files, reader=None, **options):
+        """SECTIONS[section] on `files` through the archive; the parse is
+        recorded in a manifest once it succeeds."""
+        archive_reader = self.reader(reader)
+        result = SECTIONS[section](files, reader=archive_reader, **options)
+        archive_reader.save_manifest(section, files, options)
+        return result
+
+    def save_manifest(self, section, files, options):
+        """Record a parse: `files` are (name, digest) pairs. One manifest per
+        distinct set of files and options; parsing them again refreshes it."""
+        options = dict(options)
+        if options.get("key_index") is not None:
+            # Replays skip the same lines the parse did
+            options["key_index"] = {"path": options["key_index"].path, "day": options["key_index"].day}
+        record = {
+            "store": self.store, "report": self.report, "date": self.date, "section": section,
+            "files": [{"name": name, "digest": digest} for name, digest in files],
+            "options": options,
+            "archived_at": datetime.now(timezone.utc).isoformat(),
+        }
+        ident = hashlib.sha1(json.dumps([record["files"], options], sort_keys=True, default=str).encode()).hexdigest()[:12]
+        os.makedirs(self.path, exist_ok=True)
+        path = os.path.join(self.path, f"manifest-{ident}.json")
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, "w") as fh:
+            json.dump(record, fh, indent=2, default=str)
+        os.replace(tmp, path)
+
+    def manifests(self):
+        """The parses archived here, oldest first."""
+        records = []
+        for path in glob.glob(os.path.join(self.path, "manifest-*.json")):
+            with open(path) as fh:
+                records.append(json.load(fh))
+        return sorted(records, key=lambda r: r["archived_at"])
+
+    def reprocess(self, manifest):
+        """Re-run an archived parse from the Parquet alone."""
+        uploads = [ArchivedUpload(f["name"], f["digest"]) for f in manifest["files"]]
+        options = dict(manifest["options"])
+        if options.get("key_index"):
+            # Never committed: the replay only reads the index
+            options["key_index"] = KeyIndex(options["key_index"]["path"], options["key_index"]["day"])
+        return SECTIONS[manifest["section"]](uploads, reader=self.reader(), **options)
+
+    def frames(self):
+        """{read directory: DataFrame} of everything archived here."""
+        frames = {}
+        for directory in sorted(glob.glob(os.path.join(self.path, "*-*"))):
+            parts = _parts(directory)
+            if parts and ".tmp-" not in directory:
+                frames[os.path.basename(directory)] = pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True)
+        return frames
+
+class ArchiveScope:
+    """The store and date reports parsed now are archived under."""
+
+    def __init__(self, store, date, root=None):
+        self.store = store
+        self.date = date.isoformat() if hasattr(date, "isoformat") else str(date)
+        self.root = _REPORT_ARCHIVE_DIR if root is None else root
+
+    def partition(self, report):
+        """The partition for `report` (a section name), or None when
+        archiving is disabled."""
+        if not self.root:
+            return None
+        return ArchivePartition(self.store, report, self.date, self.root)
+
+@contextlib.contextmanager
+def scope(archive_scope):
+    """Archive the parses made inside the block under `archive_scope` (an
+    ArchiveScope, or None for no archiving)."""
+    token = _current.set(archive_scope)
+    try:
+        yield archive_scope
+    finally:
+        _current.reset(token)
+
+def current_partition(report):
+    """The partition for `report` in the current scope, or None."""
+    archive_scope = _current.get()
+    return None if archive_scope is None else archive_scope.partition(report)
+
+def partitions(root=None):
+    """Every archived (store, report, date), from the manifests."""
+    found = set()
+    for path in glob.glob(os.path.join(root or _REPORT_ARCHIVE_DIR, "store=*", "report=*", "date=*", "manifest-*.json")):
+        with open(path) as fh:
+            record = json.load(fh)
+        found.add((record["store"], record["report"], record["date"]))
+    return sorted(found)
+
+# ── CLI ─────────────────────────────────────────────────────────────────────
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List, re-process or inspect archived reports.")
+    parser.add_argument("store", nargs="?", help="Store (the sheet name the report was written to).")
+    parser.add_argument("report", nargs="?", help=f"Report type: one of {', '.join(SECTIONS)}.")
+    parser.add_argument("date", nargs="?", help="Date the report was written for (YYYY-MM-DD).")
+    parser.add_argument("--root", default=None, help="Archive directory (default: REPORT_ARCHIVE_DIR or .report_archive).")
+    parser.add_argument("--frames", action="store_true", help="Print the archived rows instead of re-processing them.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    if not args.date:
+        for store, report, date in partitions(args.root):
+            print(f"{store}\t{report}\t{date}")
+        return
+
+    partition = ArchivePartition(args.store, args.report, args.date, args.root)
+    if args.frames:
+        for name, df in partition.frames().items():
+            print(f"# {name}: {len(df)} row(s)")
+            print(df.to_string(max_rows=20))
+        return
+    manifests = partition.manifests()
+    if not manifests:
+        sys.exit(f"Nothing archived for {args.store} / {args.report} / {args.date}.")
+    for manifest in manifests:
+        names = ", ".join(f["name"] for f in manifest["files"])
+        print(f"# {names} {json.dumps(manifest['options'])} (archived {manifest['archived_at']})")
+        print(json.dumps(partition.reprocess(manifest), indent=2, default=str))
+
+if __name__ == "__main__":
+    main()
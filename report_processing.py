@@ -0,0 +1,1354 @@
+"""Parsing and aggregation of the DMS report exports.
+
+Nothing here imports Streamlit, so the parsers can also run in worker
+processes. User-facing messages go through `ui`; the app points it at
+Streamlit with set_ui(st), worker processes record them for the app to
+replay, and anything else gets them through logging.
+"""
+import functools
+import io
+import itertools
+import logging
+import os
+import re
+import time
+import warnings
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from key_index import file_digest
+
+warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
+logger = logging.getLogger(__name__)
+
+# ── MESSAGES ────────────────────────────────────────────────────────────────
+
+class _LogUI:
+    """Default message sink: the logging module."""
+
+    def write(self, message):
+        logger.info(message)
+
+    info = write
+    success = write
+    caption = write
+
+    def warning(self, message):
+        logger.warning(message)
+
+    def error(self, message):
+        logger.error(message)
+
+class MessageRecorder:
+    """Message sink that keeps (level, message) pairs to be replayed later."""
+
+    def __init__(self):
+        self.messages = []
+
+    def __getattr__(self, level):
+        if level not in ("write", "info", "success", "caption", "warning", "error"):
+            raise AttributeError(level)
+        return lambda message: self.messages.append((level, str(message)))
+
+def replay_messages(messages, target):
+    for level, message in messages:
+        getattr(target, level)(message)
+
+ui = _LogUI()
+
+def set_ui(target):
+    """Send processing messages to `target` (anything with write/info/
+    success/caption/warning/error, e.g. the streamlit module). Returns the
+    previous target."""
+    global ui
+    previous, ui = ui, target
+    return previous
+
+# Money text to number text: "$1,234.56" -> "1234.56", "(12.00)" -> "-12.00"
+_NUMBER_TEXT_JUNK = str.maketrans({**dict.fromkeys('$, \t\r\n)'), '(': '-'})
+
+# Values sampled to tell whether a column repeats enough to factorize
+_DISTINCT_SAMPLE = 1000
+
+def _parse_numbers(values, errors):
+    """float array of an object array: numbers as they are, text through
+    one translate pass. Missing cells and blank text become NaN."""
+    # Text goes straight to the translate pass; trying it as a number
+    # first costs as much as parsing it
+    is_str = np.fromiter((isinstance(value, str) for value in values), dtype=bool, count=len(values))
+    parsed = np.full(len(values), np.nan)
+    if not is_str.all():
+        parsed[~is_str] = pd.to_numeric(values[~is_str], errors='coerce')
+    is_text = np.isnan(parsed) & pd.notna(values)
+    if is_text.any():
+        text = values if is_text.all() else values[is_text]
+        cleaned = np.array([str(value).translate(_NUMBER_TEXT_JUNK) for value in text], dtype=object)
+        try:
+            text_values = cleaned.astype(float)
+        except ValueError:
+            # Blank or unparseable text; sort it out value by value
+            text_values = pd.to_numeric(cleaned, errors='coerce')
+        if errors != 'coerce':
+            invalid = np.isnan(text_values) & (cleaned != '')
+            if invalid.any():
+                raise ValueError(f"could not convert string to float: {text[invalid][0]!r}")
+        parsed[is_text] = text_values
+    return parsed
+
+def clean_column_data(column, errors='raise'):
+    """Parse a money/number column to float.
+
+    Columns Excel already delivered as numbers are converted directly. Other
+    columns parse numbers as-is and text with one translate pass that drops
+    "$", thousands separators and whitespace and makes accounting negatives
+    like "(123.45)" negative. Columns whose values repeat are factorized
+    first so each distinct value is parsed once; mostly distinct ones are
+    parsed row by row. Blank cells become NaN. Text that is not a number
+    raises ValueError, or becomes NaN with errors='coerce'.
+    """
+    if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+        return column.astype(float)
+    sample = column.iloc[:_DISTINCT_SAMPLE]
+    if sample.nunique() > len(sample) // 2:
+        # Factorizing would cost more than the repeats save
+        values = _parse_numbers(column.to_numpy(dtype=object), errors)
+    else:
+        codes, distinct = pd.factorize(column)
+        # factorize marks missing cells with -1; they stay NaN
+        values = np.append(_parse_numbers(np.asarray(distinct, dtype=object), errors), np.nan)[codes]
+    return pd.Series(values, index=column.index, name=column.name)
+
+def convert_to_native_type(value):
+    if isinstance(value, pd.Series):
+        value = value.sum()
+    if pd.isna(value):
+        return 0
+    elif isinstance(value, (np.integer, np.int64, np.int32, int)):
+        return int(value)
+    elif isinstance(value, (np.floating, np.float64, np.float32, float)):
+        return float(value)
+    elif isinstance(value, (np.bool_, bool)):
+        return bool(value)
+    elif isinstance(value, (np.str_, str)):
+        return str(value)
+    else:
+        return str(value)
+
+# ── ADVISOR NAMES ───────────────────────────────────────────────────────────
+# An export has hundreds of thousands of rows but a few dozen advisors, so
+# names are normalized once per distinct value and rows are aggregated by
+# integer name id.
+
+def map_distinct(column, transform):
+    """transform(column) for an element-wise Series transform, computed on
+    the distinct values only (blank cells included) and mapped back to the
+    rows."""
+    codes, distinct = pd.factorize(column)
+    distinct = pd.Series(distinct, dtype=object)
+    if (codes < 0).any():
+        codes = np.where(codes < 0, len(distinct), codes)
+        distinct = pd.concat([distinct, pd.Series([np.nan], dtype=object)], ignore_index=True)
+    values = transform(distinct).to_numpy()[codes]
+    return pd.Series(values, index=column.index, name=column.name)
+
+def normalize_names(column, as_text=True):
+    """column.astype(str).str.strip().str.upper(), or without `as_text`
+    column.str.strip().str.upper() (blank cells stay blank), computed once
+    per distinct name."""
+    if as_text:
+        return map_distinct(column, lambda names: names.astype(str).str.strip().str.upper())
+    return map_distinct(column, lambda names: names.str.strip().str.upper())
+
+def _bincount_sum(ids, values, n):
+    """Per-id sums of a numeric column; NaN counts as 0, as in groupby."""
+    totals = np.bincount(ids, weights=np.nan_to_num(values.to_numpy(dtype=float)), minlength=n)
+    if pd.api.types.is_integer_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return totals.round().astype(np.int64)
+    return totals
+
+def group_metrics(df, names_column, spec):
+    """Compute several per-name metrics over integer name ids.
+
+    `spec` maps a metric name to (column, reducer), where reducer is any
+    groupby reducer name ('sum', 'nunique', 'size', ...). The names column is
+    factorized once into ids; 'size' and 'sum' are one np.bincount each, any
+    other reducer goes through a single groupby().agg() over the ids. Rows
+    without a name are ignored, as in groupby. A 'sum' column must be
+    numeric (clean text columns with clean_column_data first); anything else
+    raises TypeError. Returns {metric: {name: value}}.
+    """
+    codes, names = pd.factorize(df[names_column])
+    has_name = codes >= 0
+    if not has_name.all():
+        df = df.loc[has_name]
+        codes = codes[has_name]
+    n = len(names)
+    totals = {}
+    grouped = {}
+    for metric, (column, reducer) in spec.items():
+        if reducer == 'size':
+            totals[metric] = np.bincount(codes, minlength=n)
+        elif reducer == 'sum':
+            # groupby would join text cells into one string instead
+            if not pd.api.types.is_numeric_dtype(df[column]):
+                raise TypeError(f"Column '{column}' is not numeric ({df[column].dtype}) and cannot be summed.")
+            totals[metric] = _bincount_sum(codes, df[column], n)
+        else:
+            grouped[metric] = pd.NamedAgg(column=column, aggfunc=reducer)
+    if grouped:
+        result = df.groupby(codes, sort=False).agg(**grouped)
+        for metric in grouped:
+            totals[metric] = result[metric].to_numpy()
+    # Every id has rows, so each array lines up with `names`
+    return {metric: pd.Series(totals[metric], index=names).to_dict() for metric in spec}
+
+def process_menu_sales_data(df, names_column='Advisor Name', ro_number_column='RO Number'):
+    df[names_column] = normalize_names(df[names_column], as_text=False)
+    df['Opcode Labor Gross'] = clean_column_data(df['Opcode Labor Gross'])
+    df['Opcode Parts Gross'] = clean_column_data(df['Opcode Parts Gross'])
+    
+    # Count unique RO Numbers per advisor
+    df = df.dropna(subset=[ro_number_column])
+    df[ro_number_column] = df[ro_number_column].astype(str).str.strip()
+    metrics = group_metrics(df, names_column, {
+        'name_counts': (ro_number_column, 'nunique'),
+        'labor_gross_sums': ('Opcode Labor Gross', 'sum'),
+        'parts_gross_sums': ('Opcode Parts Gross', 'sum'),
+    })
+    return metrics['name_counts'], metrics['labor_gross_sums'], metrics['parts_gross_sums']
+
+def process_alacarte_data(df, names_column='Advisor Name'):
+    df[names_column] = normalize_names(df[names_column], as_text=False)
+    df['Opcode Labor Gross'] = clean_column_data(df['Opcode Labor Gross'])
+    df['Opcode Parts Gross'] = clean_column_data(df['Opcode Parts Gross'])
+    metrics = group_metrics(df, names_column, {
+        'name_counts': (names_column, 'size'),
+        'labor_gross_sums': ('Opcode Labor Gross', 'sum'),
+        'parts_gross_sums': ('Opcode Parts Gross', 'sum'),
+    })
+    return metrics['name_counts'], metrics['labor_gross_sums'], metrics['parts_gross_sums']
+
+def process_commodity_file(df, names_column='Primary Advisor Name', gross_column='Gross'):
+    df[names_column] = normalize_names(df[names_column])
+    df[gross_column] = clean_column_data(df[gross_column])
+    metrics = group_metrics(df, names_column, {
+        'name_counts': (names_column, 'size'),
+        'parts_gross_sums': (gross_column, 'sum'),
+    })
+    return metrics['name_counts'], metrics['parts_gross_sums']
+
+#    TIRES
+def tires_columns(header_names):
+    """Column projection for Tires files: every column process_tires_data
+    could pick as the names, quantity or gross column."""
+    selected = []
+    for col in header_names:
+        col_lower = str(col).lower()
+        if ('advisor' in col_lower and 'name' in col_lower) or 'part count' in col_lower \
+                or 'actual quantity' in col_lower or 'gross' in col_lower:
+            selected.append(col)
+    return selected
+
+def process_tires_data(df):
+    names_column = None
+    quantity_column = None
+    gross_column = None
+
+    for col in df.columns:
+        col_lower = col.lower()
+        if 'advisor' in col_lower and 'name' in col_lower:
+            names_column = col
+        elif 'part count' in col_lower or 'actual quantity' in col_lower:
+            quantity_column = col
+        elif 'opcode parts gross' in col_lower or 'gross' in col_lower:
+            gross_column = col
+
+    if names_column and quantity_column and gross_column:
+        if 'advisor name group' in names_column.lower():
+            ui.write("Detected GM Tires Format.")
+        else:
+            ui.write("Detected Original Tires Format.")
+    else:
+        raise ValueError("Tires Excel does not match any known format.")
+
+    df[names_column] = normalize_names(df[names_column])
+
+    try:
+        df[quantity_column] = clean_column_data(df[quantity_column])
+        df[gross_column] = clean_column_data(df[gross_column])
+    except Exception as e:
+        raise ValueError(f"Error cleaning columns: {e}")
+
+    metrics = group_metrics(df, names_column, {
+        'actual_quantity_sums': (quantity_column, 'sum'),
+        'gross_sums': (gross_column, 'sum'),
+    })
+
+    actual_quantity_sums = {k: float(v) for k, v in metrics['actual_quantity_sums'].items()}
+    gross_sums = {k: float(v) for k, v in metrics['gross_sums'].items()}
+    return actual_quantity_sums, gross_sums
+
+#    ALIGNMENT MENUS & A-LA-CARTE: NEW WHEEL ALIGNMENT
+def process_alignment_new_format(df, advisor_col='Advisor Name', story_col='Operation Tech Story'):
+    if story_col not in df.columns:
+        return {}
+    is_alignment = map_distinct(df[story_col], lambda stories: stories.astype(str).str.contains("wheel alignment", case=False, regex=False))
+    advisors = normalize_names(df.loc[is_alignment.astype(bool), advisor_col]).to_frame()
+    alignment_counts = group_metrics(advisors, advisor_col, {'name_counts': (advisor_col, 'size')})['name_counts']
+
+    # Return just name_counts; no parts/labor
+    return {advisor: int(count) for advisor, count in sorted(alignment_counts.items())}
+
+#  RECOMMENDATIONS / DAILY / RO COUNT
+def process_recommendations_data(df, names_column="Name"):
+    df.columns = df.columns.str.strip()
+    df[names_column] = normalize_names(df[names_column], as_text=False)
+    df = df[df[names_column] != "TOTAL"]
+    required_columns = ['Recommendations', 'Recommendations Sold', 'Recommendations $ amount', 'Recommendations Sold $ amount']
+    for col in required_columns:
+        if col not in df.columns:
+            raise ValueError(f"Column '{col}' not found in the uploaded Recommendations Excel. Please check the column names.")
+    # Money columns are cleaned per row before summing (summing text cells
+    # first would concatenate them)
+    df['Recommendations $ amount'] = clean_column_data(df['Recommendations $ amount'])
+    df['Recommendations Sold $ amount'] = clean_column_data(df['Recommendations Sold $ amount'])
+    metrics = group_metrics(df, names_column, {
+        'rec_count': ('Recommendations', 'sum'),
+        'rec_sold_count': ('Recommendations Sold', 'sum'),
+        'rec_amount': ('Recommendations $ amount', 'sum'),
+        'rec_sold_amount': ('Recommendations Sold $ amount', 'sum'),
+    })
+    return metrics['rec_count'], metrics['rec_sold_count'], metrics['rec_amount'], metrics['rec_sold_amount']
+
+def process_daily_data(df):
+    df.columns = df.columns.str.strip()
+    
+    # Auto-detect format: Old format has 'Name' and 'Pay Type', new format has 'Service Advisor'
+    if 'Name' in df.columns and 'Pay Type' in df.columns:
+        # Old format
+        names_column = 'Name'
+        df[names_column] = normalize_names(df[names_column], as_text=False)
+        df = df[df[names_column] != "TOTAL"]
+        df = df[df['Pay Type'].str.upper() == "ALL"]
+        ui.write("Detected Old Daily Data Format")
+    elif 'Service Advisor' in df.columns:
+        # New format
+        names_column = 'Service Advisor'
+        df[names_column] = normalize_names(df[names_column], as_text=False)
+        df = df[df[names_column] != "TOTAL"]
+        ui.write("Detected New Advisor Preformance 3.0 format")
+    else:
+        raise ValueError("Daily Data Excel format not recognized. ")
+    
+    required_columns = ['Labor Gross', 'Parts Gross']
+    for col in required_columns:
+        if col not in df.columns:
+            raise ValueError(f"Column '{col}' not found in the uploaded Daily Data Excel. Please check the column names.")
+    df['Labor Gross'] = clean_column_data(df['Labor Gross'])
+    df['Parts Gross'] = clean_column_data(df['Parts Gross'])
+    metrics = group_metrics(df, names_column, {
+        'labor_gross_sums': ('Labor Gross', 'sum'),
+        'parts_gross_sums': ('Parts Gross', 'sum'),
+    })
+    return metrics['labor_gross_sums'], metrics['parts_gross_sums']
+
+def process_ro_count_data(df, advisor_column='Advisor Name', ro_number_column='RO Number'):
+    df.columns = df.columns.str.strip()
+    if advisor_column not in df.columns or ro_number_column not in df.columns:
+        raise ValueError(f"Columns '{advisor_column}' or '{ro_number_column}' not found in the uploaded RO Count Excel.")
+    df[advisor_column] = normalize_names(df[advisor_column], as_text=False)
+    df = df.dropna(subset=[ro_number_column])
+    df[ro_number_column] = df[ro_number_column].astype(str).str.strip()
+    metrics = group_metrics(df, advisor_column, {'ro_counts': (ro_number_column, 'nunique')})
+    return metrics['ro_counts']
+
+#   RTH PROCESSING FUNCTIONS
+
+def process_technician_report_data(df):
+    """Process Technician Report Excel to extract Actual Hours and Assigned Billed Hours per technician."""
+    df.columns = df.columns.str.strip()
+    
+    required_columns = ['Technician Name', 'Actual Hours', 'Assigned Billed Hours']
+    for col in required_columns:
+        if col not in df.columns:
+            raise ValueError(f"Column '{col}' not found in the Technician Report Excel. Please check the column names.")
+    
+    # Clean and normalize technician names
+    df['Technician Name'] = normalize_names(df['Technician Name'])
+    
+    # Clean numeric columns
+    df['Actual Hours'] = clean_column_data(df['Actual Hours'], errors='coerce').fillna(0)
+    df['Assigned Billed Hours'] = clean_column_data(df['Assigned Billed Hours'], errors='coerce').fillna(0)
+    
+    # Group by technician and sum hours
+    metrics = group_metrics(df, 'Technician Name', {
+        'actual_hours': ('Actual Hours', 'sum'),
+        'assigned_billed_hours': ('Assigned Billed Hours', 'sum'),
+    })
+    
+    return metrics['actual_hours'], metrics['assigned_billed_hours']
+
+def process_employee_timecard_data(df):
+    """
+    Process Employee Timecard Report Excel to extract attendance hours and daily objectives.
+    This file has a vertical layout with bi-weekly data for multiple technicians.
+    
+    Structure:
+    - Row 1 (index 0): Date range in columns H-L (e.g., "11/16/2025 - 11/30/2025")
+    - Row 6 (index 5): First tech - Column A: Employee #, Column C: "Lastname, Firstname"
+    - Row 7 (index 6): Headers (Date, ..., Paid)
+    - Row 8+ (index 7+): Every 3 rows = 1 day (Date in Column A, Paid in Column K)
+    - Next tech starts when we see another name in Column C
+    
+    Returns: (date_range_tuple, {employee_id_or_name: {day: {"attendance": hours, "objective": 8 or 0}}})
+    """
+    timecard_data = {}
+    date_range = None
+    
+    # Extract date range from row 1 (index 0), columns H-L (indexes 7-11)
+    try:
+        row_1 = df.iloc[0]
+        # Look for date range string in columns H-L
+        for col_idx in range(7, 12):  # Columns H, I, J, K, L
+            if col_idx < len(row_1):
+                cell_value = str(row_1.iloc[col_idx]).strip()
+                if "-" in cell_value and "/" in cell_value:
+                    # Found date range like "11/16/2025 - 11/30/2025"
+                    parts = cell_value.split("-")
+                    if len(parts) == 2:
+                        start_date = pd.to_datetime(parts[0].strip(), errors='coerce')
+                        end_date = pd.to_datetime(parts[1].strip(), errors='coerce')
+                        if pd.notna(start_date) and pd.notna(end_date):
+                            date_range = (start_date, end_date)
+                            break
+    except Exception as e:
+        ui.warning(f"Could not extract date range from row 1: {e}")
+    
+    # Tech sections start where Column C (index 2) has "Lastname, Firstname"
+    # and Column A (index 0) has the employee number. Find them all with one
+    # mask and number the blocks with a cumulative sum.
+    col_a = df.iloc[:, 0]
+    col_c_text = df.iloc[:, 2].where(df.iloc[:, 2].notna(), "").astype(str).str.strip()
+    is_tech_header = col_c_text.str.contains(",", regex=False) & (col_c_text.str.len() > 3)
+    block_ids = is_tech_header.cumsum()
+    tech_ids = col_a[is_tech_header].where(col_a[is_tech_header].notna(), "").astype(str).str.strip()
+    block_tech_ids = pd.Series(tech_ids.values, index=block_ids[is_tech_header].values)
+    row_tech_ids = block_ids.map(block_tech_ids).fillna("")
+
+    # Date rows: any non-header row inside a tech section whose Column A parses as a date
+    in_section = ~is_tech_header & (row_tech_ids != "")
+    dates = pd.to_datetime(col_a[in_section], errors='coerce', format='mixed')
+    dates = dates[dates.notna()]
+
+    # Paid amount from Column K (index 10)
+    if df.shape[1] > 10:
+        paid = clean_column_data(df.iloc[:, 10].loc[dates.index], errors='coerce').fillna(0)
+    else:
+        paid = pd.Series(0.0, index=dates.index)
+
+    day_rows = pd.DataFrame({
+        "block": block_ids.loc[dates.index],
+        "tech_id": row_tech_ids.loc[dates.index],
+        "day": dates.dt.day.astype(str),
+        "attendance": paid,
+    })
+    # A day listed twice within a section keeps its last value
+    day_rows = day_rows.drop_duplicates(subset=["block", "day"], keep="last")
+
+    # A later section with the same employee number replaces the earlier one
+    for _, section in day_rows.groupby("block", sort=True):
+        timecard_data[section["tech_id"].iloc[0]] = {
+            day: {
+                "attendance": float(attendance),
+                # Daily objective: 8 if paid > 0, else 0
+                "objective": 8 if attendance > 0 else 0
+            }
+            for day, attendance in zip(section["day"], section["attendance"])
+        }
+
+    return date_range, timecard_data
+
+#   APPOINTMENTS PROCESSING FUNCTIONS
+
+def process_appointments_data(df, is_volkswagen=False):
+    """
+    Process Appointments Excel file to extract appointments per advisor for all dates.
+    
+    Args:
+        df: DataFrame with columns Date, User, Role, Appointments, Cancelled
+        is_volkswagen: If True, sum all Pinnacle variations into "PINNACLE"
+    
+    Returns:
+        {day_str: {first_name: appointments_count}} - e.g., {"31": {"PINNACLE": 7, "MINNIE": 2}}
+    """
+    df.columns = df.columns.str.strip()
+    
+    # Validate required columns
+    required_columns = ['Date', 'User', 'Appointments']
+    for col in required_columns:
+        if col not in df.columns:
+            raise ValueError(f"Column '{col}' not found in the Appointments Excel. Available columns: {', '.join(df.columns)}")
+    
+    # Parse dates
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    df = df.dropna(subset=['Date'])
+    
+    if df.empty:
+        ui.warning("No valid dates found in the uploaded file.")
+        return {}
+    
+    # Extract day number from date
+    df['Day'] = df['Date'].dt.day.astype(str)
+    
+    # Clean and extract first names (once per distinct user)
+    df['FirstName'] = map_distinct(df['User'], lambda users: users.astype(str).str.strip().str.split().str[0].str.upper())
+    
+    # Special handling for Volkswagen: sum all Pinnacle/Pinnacal variations
+    if is_volkswagen:
+        df['FirstName'] = map_distinct(df['FirstName'], lambda names: names.apply(
+            lambda x: 'PINNACLE' if ('PINNACLE' in x or 'PINNACAL' in x) else x
+        ))
+    
+    # Clean Appointments column
+    df['Appointments'] = pd.to_numeric(df['Appointments'], errors='coerce').fillna(0)
+    
+    # Group by day and first name, sum appointments
+    appointments_by_day = {}
+    for day, group in df.groupby('Day'):
+        day_appointments = group.groupby('FirstName')['Appointments'].sum().to_dict()
+        # Convert to native types
+        day_appointments = {k: convert_to_native_type(v) for k, v in day_appointments.items()}
+        appointments_by_day[day] = day_appointments
+    
+    # Get unique dates for display
+    unique_dates = df['Date'].dt.date.unique()
+    ui.info(f"Found data for {len(unique_dates)} date(s): {', '.join(str(d) for d in sorted(unique_dates))}")
+    
+    return appointments_by_day
+
+# ── COLUMN-PROJECTED EXCEL READER ───────────────────────────────────────────
+# DMS exports are wide but each processor only needs a handful of columns.
+# The reader streams the first worksheet in openpyxl's read-only mode, sniffs
+# the header row and keeps only the projected columns.
+
+# Rows per DataFrame when a file is read in pieces
+STREAM_CHUNK_ROWS = 50000
+
+def _header_names(header_values):
+    """Column names the way pd.read_excel builds them: blanks become
+    'Unnamed: i' and repeated names get a '.n' suffix."""
+    names = []
+    seen = {}
+    for i, value in enumerate(header_values):
+        name = f"Unnamed: {i}" if value is None or value == "" else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+# Text pd.read_excel reads as a blank cell by default: the na_values list
+# in the pandas.read_excel docs
+_NA_STRINGS = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a",
+    "nan", "null",
+})
+
+def _convert_cell(value):
+    if value is None or (isinstance(value, str) and value in _NA_STRINGS):
+        return np.nan
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def read_excel_projected(uploaded_file, columns=None, header=0, max_col=None, formats=None):
+    """Read the first worksheet of an Excel file, keeping only `columns`.
+
+    `columns` is None (keep everything), a sequence of header names (matched
+    after stripping whitespace; names not present are ignored so the
+    processors can report them), or a callable that receives the stripped
+    header names and returns the ones to keep. `header` is the 0-based row
+    holding the header, or None for positional columns limited to `max_col`.
+    Numbers stored as text are read as numbers, as pd.read_excel does.
+
+    With `formats` (ReportFormat candidates, see REPORT_FORMATS) the file's
+    first rows pick the format, whose header row, projection, column limit
+    and dtypes replace the other options; the frame's
+    attrs["report_format"] names the format.
+    """
+    return next(iter_excel_projected(uploaded_file, columns, header, max_col, chunk_rows=None, formats=formats))
+
+def iter_excel_projected(uploaded_file, columns=None, header=0, max_col=None, chunk_rows=STREAM_CHUNK_ROWS, formats=None):
+    """read_excel_projected in pieces: yields DataFrames of about
+    `chunk_rows` rows (all rows at once when None), at least one, so a file
+    never has to be held as one frame."""
+    if hasattr(uploaded_file, "seek"):
+        uploaded_file.seek(0)
+    workbook = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True)
+    report_format = None
+    try:
+        if formats is not None:
+            limits = [f.max_col for f in formats]
+            max_col = None if None in limits else max(limits)
+        rows = workbook.worksheets[0].iter_rows(values_only=True, max_col=max_col)
+
+        if formats is not None:
+            # The format is told from the first rows of this same read
+            head = list(itertools.islice(rows, SNIFF_ROWS))
+            report_format = sniff_format(formats, head, upload_name(uploaded_file))
+            rows = itertools.chain(head, rows)
+            columns, header, max_col = report_format.columns, report_format.header, report_format.max_col
+
+        if header is None:
+            names = None
+        else:
+            header_values = ()
+            for row_index, row in enumerate(rows):
+                if row_index == header:
+                    header_values = row
+                    break
+            names = _header_names(header_values)
+            stripped = [str(name).strip() for name in names]
+            if columns is None:
+                wanted = set(stripped)
+            elif callable(columns):
+                wanted = set(columns(stripped))
+            else:
+                wanted = set(columns)
+            positions = [i for i, name in enumerate(stripped) if name in wanted]
+            labels = [names[i] for i in positions]
+
+        data = None
+        n_rows = 0
+        last_non_blank = 0
+        emitted = False
+        for row in rows:
+            if data is None:
+                if names is None:
+                    positions = list(range(len(row) if max_col is None else min(len(row), max_col)))
+                    labels = positions
+                data = [[] for _ in positions]
+            blank = True
+            for out, i in zip(data, positions):
+                value = _convert_cell(row[i]) if i < len(row) else np.nan
+                if blank and value is not np.nan:
+                    blank = False
+                out.append(value)
+            n_rows += 1
+            if not blank:
+                last_non_blank = n_rows
+                # Cut only after a non-blank row, so trailing blanks are never emitted
+                if chunk_rows and n_rows >= chunk_rows:
+                    yield _typed(pd.DataFrame(dict(zip(labels, data)), columns=labels), report_format)
+                    emitted = True
+                    data = [[] for _ in positions]
+                    n_rows = last_non_blank = 0
+    finally:
+        workbook.close()
+
+    # Trailing blank rows are dropped, as pd.read_excel does
+    if data is None:
+        labels = [] if names is None else labels
+        yield _typed(pd.DataFrame(columns=labels), report_format)
+    elif last_non_blank or not emitted:
+        yield _typed(pd.DataFrame({label: values[:last_non_blank] for label, values in zip(labels, data)}, columns=labels),
+                     report_format)
+
+def _typed(df, report_format):
+    # As in pd.read_excel, a column whose cells are all numbers or number
+    # text ("5", " 7 ") is numeric; any other text keeps the column as is
+    for label in (df.columns[df.dtypes == object] if len(df) else ()):
+        try:
+            df[label] = pd.to_numeric(df[label])
+        except (ValueError, TypeError):
+            pass
+    return df if report_format is None else report_format.convert(df)
+
+# ── REPORT FORMATS ──────────────────────────────────────────────────────────
+# Several reports come in more than one layout (header on another row,
+# other column names). A ReportFormat describes one layout; a read given
+# the candidates of a section tells them apart from the first rows of the
+# file and then loads it with that layout's projection and dtypes, in the
+# same pass.
+
+# Rows a read looks at to tell the format
+SNIFF_ROWS = 10
+
+def _to_number(column):
+    return clean_column_data(column, errors='coerce')
+
+def _to_numeric(column):
+    return pd.to_numeric(column, errors='coerce')
+
+def _to_date(column):
+    return pd.to_datetime(column, errors='coerce')
+
+class ReportFormat:
+    """One layout of a report.
+
+    `tokens` are regular expressions that must each match a whole header
+    name (stripped, case-insensitive) on row `header` (0-based). A layout
+    with header None is positional and matches any file. `columns` and
+    `max_col` are read_excel_projected options; `dtypes` maps header names
+    to converters applied as the rows are loaded, for columns the processor
+    converts the same way anyway.
+    """
+
+    def __init__(self, name, tokens=(), header=0, columns=None, max_col=None, dtypes=None):
+        self.name = name
+        self.tokens = tuple(tokens)
+        self.header = header
+        self.columns = columns
+        self.max_col = max_col
+        self.dtypes = dtypes or {}
+
+    def __repr__(self):
+        # Part of the parse-cache and archive keys
+        return f"ReportFormat({self.name!r}, header={self.header}, max_col={self.max_col})"
+
+    def matches(self, rows):
+        if self.header is None:
+            return True
+        if self.header >= len(rows):
+            return False
+        names = [str(value).strip() for value in rows[self.header] if value is not None]
+        return all(any(re.fullmatch(token, name, re.IGNORECASE) for name in names) for token in self.tokens)
+
+    def with_columns(self, columns):
+        """This layout with another projection."""
+        return ReportFormat(self.name, self.tokens, self.header, columns, self.max_col, self.dtypes)
+
+    def convert(self, df):
+        for column in df.columns:
+            to_type = self.dtypes.get(str(column).strip())
+            if to_type is not None:
+                df[column] = to_type(df[column])
+        df.attrs["report_format"] = self.name
+        return df
+
+def sniff_format(formats, rows, name="file"):
+    """The first of `formats` that matches the first `rows` of a file."""
+    for report_format in formats:
+        if report_format.matches(rows):
+            return report_format
+    raise ValueError(f"'{name}' does not match any known layout ({', '.join(f.name for f in formats)}).")
+
+def report_format(df, formats):
+    """The one of `formats` a frame was read with, or None."""
+    name = df.attrs.get("report_format")
+    return next((f for f in formats if f.name == name), None)
+
+# ── MULTI-FILE INGESTION HELPERS ────────────────────────────────────────────
+
+_COLUMN_ALIASES = {
+    "Repair Order":        "RO Number",
+    "RO#":                 "RO Number",
+    "RO No":               "RO Number",
+    "Repair Order Number": "RO Number",
+    "Operation":           "Op Text",
+}
+
+_DEDUPE_KEY_CANDIDATES = [
+    ["RO Number", "Line"],
+    ["RO Number", "Op Code", "Open Date"],
+    ["RO Number", "Op Text"],
+]
+
+def _project_with_aliases(columns, dedupe_keys, header_names):
+    """Projection for multi-file sections: `columns` under any of their alias
+    names, plus the dedupe key columns when `dedupe_keys` is set. Files that
+    have none of the dedupe key sets are deduplicated on the full row, so for
+    those every column is kept."""
+    canonical = [_COLUMN_ALIASES.get(name, name) for name in header_names]
+    wanted = set(columns)
+    if dedupe_keys:
+        present = set(canonical)
+        if not any(all(k in present for k in keys) for keys in _DEDUPE_KEY_CANDIDATES):
+            return header_names
+        wanted.update(k for keys in _DEDUPE_KEY_CANDIDATES for k in keys)
+    return [name for name, canon in zip(header_names, canonical) if canon in wanted]
+
+def upload_name(uploaded_file):
+    """File name of an upload or of a path on disk."""
+    return getattr(uploaded_file, "name", None) or os.path.basename(str(uploaded_file))
+
+def read_many_excels(uploaded_files, columns=None, dedupe_keys=False, reader=None):
+    """Read a list of uploaded Excel files into one concatenated DataFrame.
+    Adds a '__source_file' column to track origin. Errors per file are shown
+    as ui.error but do not abort the rest. `columns` (canonical names)
+    limits what is read; see _project_with_aliases. `reader` defaults to
+    read_excel_projected."""
+    reader = reader or read_excel_projected
+    projection = None
+    if columns is not None:
+        projection = functools.partial(_project_with_aliases, tuple(columns), dedupe_keys)
+    dfs = []
+    for f in uploaded_files:
+        try:
+            df = reader(f, columns=projection)
+            df["__source_file"] = upload_name(f)
+            dfs.append(df)
+        except Exception as e:
+            ui.error(f"Could not read '{upload_name(f)}': {e}")
+    if not dfs:
+        return pd.DataFrame()
+    return pd.concat(dfs, ignore_index=True)
+
+def normalize_columns(df):
+    """Rename common column-name variants to the canonical names expected
+    by the processing functions. Only renames columns that actually exist."""
+    return df.rename(columns={k: v for k, v in _COLUMN_ALIASES.items() if k in df.columns})
+
+def dedupe_rows(df):
+    """Drop duplicate rows using the best available key subset.
+    Priority: ['RO Number','Line'] > ['RO Number','Op Code','Open Date'] >
+    ['RO Number','Op Text'] > full-row dedup."""
+    cols = set(df.columns)
+    for keys in _DEDUPE_KEY_CANDIDATES:
+        if all(k in cols for k in keys):
+            before = len(df)
+            df = df.drop_duplicates(subset=keys)
+            removed = before - len(df)
+            if removed:
+                ui.info(f"Deduplication removed {removed} duplicate row(s) using keys {keys}.")
+            return df
+    before = len(df)
+    df = df.drop_duplicates()
+    removed = before - len(df)
+    if removed:
+        ui.info(f"Deduplication removed {removed} duplicate row(s) via full-row match.")
+    return df
+
+# ── STREAMING AGGREGATION ───────────────────────────────────────────────────
+# For multi-file sections the files are folded chunk by chunk into running
+# per-advisor totals instead of being concatenated, so memory is bounded by
+# one chunk plus the totals and an 8-byte hash per distinct dedupe key.
+
+def _key_text(column):
+    if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+        values = column.astype(float)
+        text = values.astype(str)
+        whole = values.notna() & (values % 1 == 0)
+        text[whole] = values[whole].astype("int64").astype(str)
+        return text
+    return column.astype(str).str.strip()
+
+def key_hashes(df):
+    """64-bit hash of each row of `df` (its columns are the key). Values are
+    hashed as stripped text with whole numbers written without decimals, so
+    an RO hashes alike whether the export stored it as 500000, 500000.0 or
+    " 500000"."""
+    return pd.util.hash_pandas_object(df.apply(_key_text), index=False).to_numpy()
+
+class SeenKeys:
+    """Compact set of row keys, kept as sorted 64-bit hashes."""
+
+    def __init__(self):
+        self._hashes = np.empty(0, dtype=np.uint64)
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def add_new(self, df):
+        """Add the rows of `df` (its columns are the key) and return a mask
+        of the rows whose key had not been seen, first occurrence only."""
+        if df.empty:
+            return np.zeros(0, dtype=bool)
+        hashes = key_hashes(df)
+        new = ~pd.Series(hashes).duplicated().to_numpy() & ~np.isin(hashes, self._hashes)
+        self._hashes = np.union1d(self._hashes, hashes[new])
+        return new
+
+def _index_keys(columns):
+    """The dedupe key set used for the persistent key index, or None."""
+    return next((keys for keys in _DEDUPE_KEY_CANDIDATES if all(k in columns for k in keys)), None)
+
+def drop_counted(df, key_index, namespace):
+    """Drop the rows a key_index.KeyIndex says were counted for another
+    day by the report `namespace`. Files without an RO/line key set are
+    left alone."""
+    keys = _index_keys(df.columns)
+    if keys is None or df.empty:
+        return df
+    keyset = f"{namespace}:{'|'.join(keys)}"
+    hashes = key_hashes(df[keys])
+    uncounted = key_index.uncounted(keyset, hashes)
+    key_index.add_updates({"keys": {keyset: hashes[uncounted]}, "files": []})
+    if not uncounted.all():
+        ui.info(f"Key index: skipped {int((~uncounted).sum())} row(s) already counted for another day.")
+    return df[uncounted]
+
+def _chunk_reader(reader):
+    """The chunked form of `reader`: iter_excel_projected for the plain
+    reader, `reader.chunks` for wrappers that have one, otherwise None (the
+    reader only reads whole files, e.g. the app's frame cache)."""
+    if reader is read_excel_projected:
+        return iter_excel_projected
+    return getattr(reader, "chunks", None)
+
+def fold_many_excels(uploaded_files, fold, columns=None, dedupe=False, chunks=iter_excel_projected, key_index=None,
+                     namespace=None):
+    """Stream uploaded Excel files chunk by chunk into `fold(df)`.
+
+    Chunks are read with the same projection as read_many_excels, get
+    canonical column names and, with `dedupe`, lose rows whose key was seen
+    in any earlier row, using the same key priority as dedupe_rows (chosen
+    per file). With a `key_index` (key_index.KeyIndex), files and rows
+    already counted for another day by the report `namespace` are skipped
+    too; a file and its rows
+    are only added to the index's pending updates once the whole file has
+    been folded. Errors per file are shown as ui.error but do not abort the
+    rest. Returns the number of rows folded.
+    """
+    projection = None
+    if columns is not None:
+        projection = functools.partial(_project_with_aliases, tuple(columns), dedupe or key_index is not None)
+    seen = {}
+    removed = {}
+    counted = 0
+    folded = 0
+    for f in uploaded_files:
+        try:
+            if key_index is not None:
+                digest = f"{namespace}:{file_digest(f)}"
+                day = key_index.file_counted_on(digest)
+                if day is not None:
+                    ui.warning(f"Skipped '{upload_name(f)}': the same file was already counted for day {day}.")
+                    continue
+                file_keys = {}
+            for df in chunks(f, columns=projection):
+                df = normalize_columns(df)
+                df["__source_file"] = upload_name(f)
+                index_keys = _index_keys(df.columns)
+                if dedupe:
+                    keys = tuple(index_keys or df.columns)
+                    new = seen.setdefault(keys, SeenKeys()).add_new(df[list(keys)])
+                    removed[keys] = removed.get(keys, 0) + int((~new).sum())
+                    df = df[new]
+                if key_index is not None and index_keys is not None and not df.empty:
+                    keyset = f"{namespace}:{'|'.join(index_keys)}"
+                    hashes = key_hashes(df[index_keys])
+                    uncounted = key_index.uncounted(keyset, hashes)
+                    file_keys.setdefault(keyset, []).append(hashes[uncounted])
+                    counted += int((~uncounted).sum())
+                    df = df[uncounted]
+                fold(df)
+                folded += len(df)
+            if key_index is not None:
+                key_index.add_updates({"keys": {k: np.concatenate(v) for k, v in file_keys.items()}, "files": [digest]})
+        except Exception as e:
+            ui.error(f"Could not read '{upload_name(f)}': {e}")
+    for keys, count in removed.items():
+        if count:
+            how = f"using keys {list(keys)}" if keys in map(tuple, _DEDUPE_KEY_CANDIDATES) else "via full-row match"
+            ui.info(f"Deduplication removed {count} duplicate row(s) {how}.")
+    if counted:
+        ui.info(f"Key index: skipped {counted} row(s) already counted for another day.")
+    return folded
+
+def _add_counts(totals, counts):
+    for name, value in counts.items():
+        totals[name] = totals.get(name, 0) + value
+
+class MenuSalesTotals:
+    """Running process_menu_sales_data: distinct ROs and gross sums per
+    advisor."""
+
+    def __init__(self, names_column='Advisor Name', ro_number_column='RO Number'):
+        self.names_column = names_column
+        self.ro_number_column = ro_number_column
+        self.name_counts = {}
+        self.labor_gross_sums = {}
+        self.parts_gross_sums = {}
+        self._advisor_ros = SeenKeys()
+
+    def __call__(self, df):
+        df = df.copy()
+        df[self.names_column] = normalize_names(df[self.names_column], as_text=False)
+        df['Opcode Labor Gross'] = clean_column_data(df['Opcode Labor Gross'])
+        df['Opcode Parts Gross'] = clean_column_data(df['Opcode Parts Gross'])
+        df = df.dropna(subset=[self.ro_number_column])
+        df[self.ro_number_column] = df[self.ro_number_column].astype(str).str.strip()
+        df = df[df[self.names_column].notna()]
+        metrics = group_metrics(df, self.names_column, {
+            'labor_gross_sums': ('Opcode Labor Gross', 'sum'),
+            'parts_gross_sums': ('Opcode Parts Gross', 'sum'),
+        })
+        new_pairs = self._advisor_ros.add_new(df[[self.names_column, self.ro_number_column]])
+        new_counts = df.loc[new_pairs, self.names_column].value_counts()
+        for name in metrics['labor_gross_sums']:
+            self.name_counts[name] = self.name_counts.get(name, 0) + int(new_counts.get(name, 0))
+        _add_counts(self.labor_gross_sums, metrics['labor_gross_sums'])
+        _add_counts(self.parts_gross_sums, metrics['parts_gross_sums'])
+
+    def result(self):
+        return self.name_counts, self.labor_gross_sums, self.parts_gross_sums
+
+class AlignmentCounts:
+    """Running process_alignment_new_format: wheel alignments per advisor."""
+
+    def __init__(self, advisor_col='Advisor Name', story_col='Operation Tech Story'):
+        self.advisor_col = advisor_col
+        self.story_col = story_col
+        self.counts = {}
+
+    def __call__(self, df):
+        _add_counts(self.counts, process_alignment_new_format(df.copy(), self.advisor_col, self.story_col))
+
+    def result(self):
+        return self.counts
+
+# ── UPLOAD SECTIONS ─────────────────────────────────────────────────────────
+# Read + process one upload section of the app. Every section only reads the
+# columns its processor uses. `reader` is called like read_excel_projected;
+# the app passes its cached variant.
+
+_RO_COUNT_COLUMNS = ('Advisor Name', 'RO Number')
+_MENU_SALES_COLUMNS = ('Advisor Name', 'RO Number', 'Opcode Labor Gross', 'Opcode Parts Gross')
+_ALACARTE_COLUMNS = ('Advisor Name', 'Opcode Labor Gross', 'Opcode Parts Gross')
+_COMMODITY_COLUMNS = ('Primary Advisor Name', 'Gross')
+_ALIGNMENT_COLUMNS = ('Advisor Name', 'Operation Tech Story')
+_RECOMMENDATIONS_COLUMNS = ('Name', 'Recommendations', 'Recommendations Sold', 'Recommendations $ amount', 'Recommendations Sold $ amount')
+
+# Tires: an advisor name, a quantity and a gross column, in either layout
+_TIRES_TOKENS = (r'(?=.*advisor)(?=.*name).*', r'.*(part count|actual quantity).*', r'.*gross.*')
+
+# Layouts per section, in the order they are tried
+REPORT_FORMATS = {
+    "tires": (
+        ReportFormat("Original Format", _TIRES_TOKENS, header=0, columns=tires_columns),
+        # Two title rows above the header
+        ReportFormat("GM Format", _TIRES_TOKENS, header=2, columns=tires_columns),
+    ),
+    "daily": (
+        ReportFormat("Old Daily Data Format", ('Name', 'Pay Type'),
+                     columns=('Name', 'Pay Type', 'Labor Gross', 'Parts Gross')),
+        ReportFormat("Advisor Performance 3.0", ('Service Advisor',),
+                     columns=('Service Advisor', 'Labor Gross', 'Parts Gross')),
+    ),
+    "technician_report": (
+        # Header in row 2
+        ReportFormat("Technician Report", ('Technician Name',), header=1,
+                     columns=('Technician Name', 'Actual Hours', 'Assigned Billed Hours'),
+                     dtypes={'Actual Hours': _to_number, 'Assigned Billed Hours': _to_number}),
+    ),
+    "timecard": (
+        # No header row since the structure is vertical; columns A-L hold
+        # ids, names, dates, Paid and the date range
+        ReportFormat("Employee Timecard", header=None, max_col=12),
+    ),
+    "appointments": (
+        # Header in row 2
+        ReportFormat("Appointments", ('Date', 'User'), header=1,
+                     columns=('Date', 'User', 'Role', 'Appointments', 'Cancelled'),
+                     dtypes={'Date': _to_date, 'Appointments': _to_numeric}),
+    ),
+}
+
+def compute_ro_count(files, reader=read_excel_projected):
+    return process_ro_count_data(reader(files[0], columns=_RO_COUNT_COLUMNS), advisor_column='Advisor Name', ro_number_column='RO Number')
+
+def compute_menu_sales(files, reader=read_excel_projected, dedupe=True, key_index=None):
+    chunks = _chunk_reader(reader)
+    if chunks is not None:
+        totals = MenuSalesTotals()
+        rows = fold_many_excels(files, totals, columns=_MENU_SALES_COLUMNS, dedupe=dedupe, chunks=chunks, key_index=key_index,
+                                namespace="menu_sales")
+        ui.write(f"Combined rows: {rows}")
+        return totals.result()
+    df = normalize_columns(read_many_excels(files, columns=_MENU_SALES_COLUMNS, dedupe_keys=dedupe or key_index is not None, reader=reader))
+    if dedupe:
+        df = dedupe_rows(df)
+    if key_index is not None:
+        df = drop_counted(df, key_index, "menu_sales")
+    ui.write(f"Combined rows: {len(df)}")
+    return process_menu_sales_data(df, "Advisor Name", "RO Number")
+
+def compute_alacarte(files, reader=read_excel_projected):
+    return process_alacarte_data(reader(files[0], columns=_ALACARTE_COLUMNS), "Advisor Name")
+
+def compute_commodity(files, reader=read_excel_projected):
+    return process_commodity_file(reader(files[0], columns=_COMMODITY_COLUMNS))
+
+def compute_tires(files, reader=read_excel_projected):
+    """Returns (actual_quantity_sums, gross_sums, format_label)."""
+    formats = REPORT_FORMATS["tires"]
+    df = reader(files[0], formats=formats)
+    actual_quantity_sums, gross_sums = process_tires_data(df)
+    return actual_quantity_sums, gross_sums, report_format(df, formats).name
+
+def compute_alignment(files, reader=read_excel_projected, dedupe=True, label="Alignment", key_index=None):
+    chunks = _chunk_reader(reader)
+    if chunks is not None:
+        counts = AlignmentCounts()
+        rows = fold_many_excels(files, counts, columns=_ALIGNMENT_COLUMNS, dedupe=dedupe, chunks=chunks, key_index=key_index,
+                                namespace=f"alignment/{label}")
+        ui.write(f"{label} combined rows: {rows}")
+        return counts.result()
+    df = normalize_columns(read_many_excels(files, columns=_ALIGNMENT_COLUMNS, dedupe_keys=dedupe or key_index is not None, reader=reader))
+    if dedupe:
+        df = dedupe_rows(df)
+    if key_index is not None:
+        df = drop_counted(df, key_index, f"alignment/{label}")
+    ui.write(f"{label} combined rows: {len(df)}")
+    return process_alignment_new_format(df, advisor_col="Advisor Name", story_col="Operation Tech Story")
+
+def compute_recommendations(files, reader=read_excel_projected):
+    return process_recommendations_data(reader(files[0], columns=_RECOMMENDATIONS_COLUMNS), "Name")
+
+def compute_daily(files, reader=read_excel_projected):
+    return process_daily_data(reader(files[0], formats=REPORT_FORMATS["daily"]))
+
+def compute_technician_report(files, reader=read_excel_projected):
+    return process_technician_report_data(reader(files[0], formats=REPORT_FORMATS["technician_report"]))
+
+def compute_timecard(files, reader=read_excel_projected):
+    return process_employee_timecard_data(reader(files[0], formats=REPORT_FORMATS["timecard"]))
+
+def compute_appointments(files, reader=read_excel_projected, is_volkswagen=False):
+    return process_appointments_data(reader(files[0], formats=REPORT_FORMATS["appointments"]), is_volkswagen=is_volkswagen)
+
+SECTIONS = {
+    "ro_count": compute_ro_count,
+    "menu_sales": compute_menu_sales,
+    "alacarte": compute_alacarte,
+    "commodity": compute_commodity,
+    "tires": compute_tires,
+    "alignment": compute_alignment,
+    "recommendations": compute_recommendations,
+    "daily": compute_daily,
+    "technician_report": compute_technician_report,
+    "timecard": compute_timecard,
+    "appointments": compute_appointments,
+}
+
+# Sections that fold their files chunk by chunk when the reader allows it
+STREAMED_SECTIONS = frozenset({"menu_sales", "alignment"})
+
+# ── PARALLEL SECTION JOBS ───────────────────────────────────────────────────
+
+class NamedUpload(io.BytesIO):
+    """Upload bytes with the `name` attribute the readers report."""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+
+class _CountingReader:
+    """read_excel_projected that tallies the rows and seconds it spends."""
+
+    def __init__(self):
+        self.rows = 0
+        self.seconds = 0.0
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        df = read_excel_projected(*args, **kwargs)
+        self.seconds += time.perf_counter() - start
+        self.rows += len(df)
+        return df
+
+    def chunks(self, *args, **kwargs):
+        iterator = iter_excel_projected(*args, **kwargs)
+        while True:
+            start = time.perf_counter()
+            df = next(iterator, None)
+            self.seconds += time.perf_counter() - start
+            if df is None:
+                return
+            self.rows += len(df)
+            yield df
+
+def run_section_job(section, files, options, archive=None):
+    """Worker-process entry point. `files` is a list of (name, bytes).
+    Returns (result, messages, error, stats); messages are recorded for the
+    caller to replay, error is None on success and stats holds rows_read,
+    read_ms and process_ms. With `archive` (a report_archive.ArchivePartition)
+    the reads go through the Parquet archive."""
+    recorder = MessageRecorder()
+    previous = set_ui(recorder)
+    reader = _CountingReader()
+    start = time.perf_counter()
+    result, error = None, None
+    try:
+        uploads = [NamedUpload(name, data) for name, data in files]
+        if archive is None:
+            result = SECTIONS[section](uploads, reader=reader, **options)
+        else:
+            result = archive.run(section, uploads, reader=reader, **options)
+    except Exception as e:
+        error = str(e)
+    finally:
+        set_ui(previous)
+    total_ms = (time.perf_counter() - start) * 1000
+    stats = {"rows_read": reader.rows, "read_ms": reader.seconds * 1000, "process_ms": total_ms - reader.seconds * 1000}
+    if options.get("key_index") is not None:
+        # The caller owns the index and commits what this parse let through
+        stats["key_index_updates"] = options["key_index"].take_updates()
+    return result, recorder.messages, error, stats
+
+def run_section_jobs(jobs, executor):
+    """Run (section, files, options[, archive]) jobs on `executor` and return their
+    (result, messages, error, stats) outcomes in job order, whatever order
+    they finish in."""
+    futures = [executor.submit(run_section_job, *job) for job in jobs]
+    outcomes = []
+    for future in futures:
+        try:
+            outcomes.append(future.result())
+        except Exception as e:
+            # The worker died or the job could not be pickled
+            outcomes.append((None, [], str(e), {}))
+    return outcomes
+
+# ── PARTITIONED SECTIONS ────────────────────────────────────────────────────
+# One export can hold several partitions of the data: every store of a group
+# (told apart by a store column) or every day of a month (by the RO date).
+# The split job reads each file once and runs the section once per
+# partition on that partition's rows.
+
+# Columns a DMS export may date its rows by, in order of preference
+DATE_COLUMNS = ('Open Date', 'RO Open Date', 'Close Date', 'Closed Date', 'RO Date', 'Date')
+
+def _text_keys(values):
+    return values.astype(str).str.strip()
+
+def _date_keys(values):
+    """ISO dates ("2025-11-17"); blank for anything that isn't a date."""
+    dates = pd.to_datetime(values, errors="coerce", format="mixed")
+    return dates.dt.strftime("%Y-%m-%d").fillna("")
+
+_PARTITION_KEYS = {"text": _text_keys, "date": _date_keys}
+
+def _projected(columns, names):
+    """The names a read projection keeps: `columns` is None (all), a name
+    list or a callable, as for read_excel_projected."""
+    if columns is None:
+        return list(names)
+    if callable(columns):
+        return list(columns(names))
+    return [name for name in names if name in columns]
+
+def _partition_projection(partition_columns, columns, names):
+    """`columns` projected from `names`, plus the first of
+    `partition_columns` among them."""
+    wanted = _projected(columns, names)
+    column = next((c for c in partition_columns if c in names), None)
+    return wanted + [column] if column is not None and column not in wanted else wanted
+
+class _PartitionReader:
+    """Reader that loads each file once with a partition column added to
+    the projection and serves only the rows whose key is `self.key`.
+
+    `columns` are the candidate names of the partition column; the first
+    one in the file's header is used."""
+
+    def __init__(self, columns, partition, reader):
+        self.columns = (columns,) if isinstance(columns, str) else tuple(columns)
+        self.to_keys = _PARTITION_KEYS[partition]
+        self.reader = reader
+        self.key = None
+        self.rows_served = 0
+        self._frames = {}
+
+    def __call__(self, uploaded_file, columns=None, header=0, max_col=None, formats=None):
+        name = upload_name(uploaded_file)
+        if header is None or any(f.header is None for f in formats or ()):
+            raise ValueError(f"'{name}' has no header row, so it can't be split by {' / '.join(self.columns)}.")
+        key = (id(uploaded_file), repr(columns), header, max_col, repr(formats))
+        if key not in self._frames:
+            # Partials rather than closures: the archive tells reads apart by them
+            if formats is None:
+                df = self.reader(uploaded_file, columns=functools.partial(_partition_projection, self.columns, columns),
+                                 header=header, max_col=max_col)
+            else:
+                split_formats = tuple(f.with_columns(functools.partial(_partition_projection, self.columns, f.columns))
+                                      for f in formats)
+                # The formats ignore `columns`; it marks the read as split
+                df = self.reader(uploaded_file, columns=functools.partial(_partition_projection, self.columns),
+                                 formats=split_formats)
+                columns = report_format(df, formats).columns
+            # Found in the frame, not the header: an archived read skips the projection
+            labels = {str(label).strip(): label for label in df.columns}
+            column = next((c for c in self.columns if c in labels), None)
+            if column is None:
+                raise ValueError(f"No {' / '.join(self.columns)} column in '{name}'.")
+            keys = self.to_keys(df[labels[column]]).to_numpy()
+            if column not in _projected(columns, list(labels)):
+                df = df.drop(columns=[labels[column]])
+            self._frames[key] = (df, keys)
+        df, keys = self._frames[key]
+        rows = df[keys == self.key].reset_index(drop=True)
+        self.rows_served += len(rows)
+        return rows
+
+    def unmatched_rows(self, keys):
+        """Rows, over all files read, whose key is not in `keys`."""
+        wanted = list(keys)
+        unmatched = {}
+        for (file_id, *_), (_, values) in self._frames.items():
+            unmatched[file_id] = int((~np.isin(values, wanted)).sum())
+        return sum(unmatched.values())
+
+def run_split_section_job(section, files, options, columns, keys, partition="text", archive=None, key_indexes=None):
+    """Worker-process entry point for an export holding several partitions:
+    like run_section_job, but returns {key: (result, messages, error,
+    stats)} for every key in `keys`. `columns` names the partition column
+    (or candidates for it) and `partition` is "text" (e.g. store numbers) or
+    "date" (ISO dates). stats["partition_rows"] is 0 for a key with no rows.
+    With `archive` (a report_archive.ArchivePartition) the file reads go
+    through the Parquet archive. With `key_indexes` ({key:
+    key_index.KeyIndex}) each key's rows are checked against that key's
+    index, and stats["key_index_updates"] holds what its run let through."""
+    counting = _CountingReader()
+    archive_reader = None if archive is None else archive.reader(counting)
+    reader = _PartitionReader(columns, partition, archive_reader or counting)
+    uploads = [NamedUpload(name, data) for name, data in files]
+    keys = [str(key).strip() for key in keys]
+    outcomes = {}
+    for key in keys:
+        key_index = (key_indexes or {}).get(key)
+        key_options = options if key_index is None else {**options, "key_index": key_index}
+        recorder = MessageRecorder()
+        previous = set_ui(recorder)
+        reader.key = key
+        rows_before, served_before, read_before = counting.rows, reader.rows_served, counting.seconds
+        start = time.perf_counter()
+        result, error = None, None
+        try:
+            result = SECTIONS[section](uploads, reader=reader, **key_options)
+        except Exception as e:
+            error = str(e)
+        finally:
+            set_ui(previous)
+        read_ms = (counting.seconds - read_before) * 1000
+        total_ms = (time.perf_counter() - start) * 1000
+        stats = {"rows_read": counting.rows - rows_before, "partition_rows": reader.rows_served - served_before,
+                 "read_ms": read_ms, "process_ms": total_ms - read_ms}
+        if key_index is not None:
+            # The caller owns the indexes and commits what this run let through
+            stats["key_index_updates"] = key_index.take_updates()
+        outcomes[key] = (result, recorder.messages, error, stats)
+    unmatched = reader.unmatched_rows(keys)
+    if unmatched and keys:
+        outcomes[keys[0]][1].append(("warning", f"{unmatched} row(s) match none of the requested {' / '.join(reader.columns)} values."))
+    if archive_reader is not None and all(error is None for _, _, error, _ in outcomes.values()):
+        archive_reader.save_manifest(section, uploads, options)
+    return outcomes
+
+def run_split_section_jobs(jobs, executor):
+    """Run run_split_section_job argument tuples on `executor` and return
+    their {key: outcome} dicts in job order."""
+    futures = [executor.submit(run_split_section_job, *job) for job in jobs]
+    outcomes = []
+    for future, job in zip(futures, jobs):
+        try:
+            outcomes.append(future.result())
+        except Exception as e:
+            outcomes.append({str(key).strip(): (None, [], str(e), {}) for key in job[4]})
+    return outcomes
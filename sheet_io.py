@@ -0,0 +1,811 @@
+"""Google Sheets I/O: rate limiting, the connection cache, sheet layout
+discovery, write plans and the update functions for every tab.
+
+Like report_processing, nothing here imports Streamlit, so the same code
+backs the app and the headless batch runner. Messages go through
+report_processing's `ui` sink.
+"""
+import math
+import os
+import random
+import threading
+import time
+
+import gspread
+import pandas as pd
+from cachetools import TTLCache
+from gspread.cell import Cell
+from gspread.http_client import HTTPClient
+from gspread.utils import ValueInputOption, ValueRenderOption, rowcol_to_a1
+from oauth2client.service_account import ServiceAccountCredentials
+
+import instrumentation
+import local_sheets
+import report_processing
+from report_processing import convert_to_native_type
+
+# ── SHEETS API RATE LIMITING ────────────────────────────────────────────────
+
+# Per-minute Sheets API quotas of one service account ("per user" quotas).
+_SHEETS_READS_PER_MINUTE = 60
+_SHEETS_WRITES_PER_MINUTE = 60
+_RETRY_STATUS_CODES = (408, 429)
+_MAX_RETRIES = 6
+_BACKOFF_BASE_SECONDS = 1.0
+_BACKOFF_MAX_SECONDS = 64.0
+
+class TokenBucket:
+    """Thread-safe token bucket: `capacity` tokens, refilled at `rate` per
+    second. `acquire` blocks until a token is available."""
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waiting = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Take one token. Returns the seconds spent waiting for it."""
+        start = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+        try:
+            while True:
+                with self._lock:
+                    self._refill()
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return time.monotonic() - start
+                    wait = (1 - self._tokens) / self.rate
+                time.sleep(wait)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+class SheetsRateLimiter:
+    """Shared read and write buckets sized to the per-minute quotas, plus the
+    counters shown in the UI."""
+
+    def __init__(self, reads_per_minute=_SHEETS_READS_PER_MINUTE, writes_per_minute=_SHEETS_WRITES_PER_MINUTE):
+        self._buckets = {
+            "read": TokenBucket(reads_per_minute, reads_per_minute / 60.0),
+            "write": TokenBucket(writes_per_minute, writes_per_minute / 60.0),
+        }
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.last_wait = 0.0
+        self.total_wait = 0.0
+
+    def acquire(self, kind):
+        waited = self._buckets[kind].acquire()
+        with self._lock:
+            self.requests += 1
+            self.last_wait = waited
+            self.total_wait += waited
+        instrumentation.count("rate_limit_wait_ms", waited * 1000)
+        return waited
+
+    def backoff(self, attempt):
+        """Sleep before retry `attempt` (0-based): exponential with full jitter."""
+        delay = random.uniform(0, min(_BACKOFF_MAX_SECONDS, _BACKOFF_BASE_SECONDS * 2 ** attempt))
+        with self._lock:
+            self.retries += 1
+            self.total_wait += delay
+        instrumentation.count("retries")
+        instrumentation.count("rate_limit_wait_ms", delay * 1000)
+        time.sleep(delay)
+
+    def call(self, kind, action):
+        """Run `action()` under the limiter, retrying 408/429/5xx APIErrors."""
+        attempt = 0
+        while True:
+            self.acquire(kind)
+            instrumentation.count("http_calls")
+            try:
+                with instrumentation.stage(f"sheets {kind}"):
+                    return action()
+            except gspread.exceptions.APIError as e:
+                if attempt >= _MAX_RETRIES or not _is_retryable(e):
+                    raise
+            self.backoff(attempt)
+            attempt += 1
+
+    def queue_depth(self):
+        return sum(bucket.waiting for bucket in self._buckets.values())
+
+    def status(self):
+        return (f"Sheets API: {self.queue_depth()} call(s) queued, last wait {self.last_wait:.1f}s, "
+                f"{self.total_wait:.1f}s waited and {self.retries} retries over {self.requests} calls.")
+
+def _is_retryable(error):
+    code = getattr(error.response, "status_code", None)
+    return code in _RETRY_STATUS_CODES or (code is not None and code >= 500)
+
+class RateLimitedHTTPClient(HTTPClient):
+    """gspread HTTP client that takes a token from the shared limiter before
+    every request and retries 408/429/5xx responses with backoff. Every
+    gspread call (open, batch_get, batch_update, ...) goes through here."""
+
+    limiter = None
+
+    def request(self, method, endpoint, *args, **kwargs):
+        if self.limiter is None:
+            return super().request(method, endpoint, *args, **kwargs)
+        kind = "read" if method.upper() == "GET" else "write"
+        return self.limiter.call(kind, lambda: super(RateLimitedHTTPClient, self).request(method, endpoint, *args, **kwargs))
+
+# ── GOOGLE SHEETS CONNECTION CACHE ─────────────────────────────────────────
+
+_SHEETS_SCOPES = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+_WORKSHEET_CACHE_TTL_SECONDS = 10 * 60
+_WORKSHEET_CACHE_SIZE = 64
+# "google" (default) or "local" for the offline stand-in in local_sheets.py
+_SHEETS_BACKEND = os.environ.get("SHEETS_BACKEND", "google")
+
+def _is_auth_error(error):
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) in (401, 403)
+
+class SheetConnectionCache:
+    """Process-wide cache of the authorized gspread client and the opened
+    worksheet handles, keyed by (sheet name, worksheet name). Handles expire
+    after a TTL; the client is kept and its access token is refreshed when it
+    expires instead of re-authorizing on every rerun. `credentials` is called
+    for the service account info dict when the client is authorized."""
+
+    def __init__(self, credentials, limiter=None, ttl=_WORKSHEET_CACHE_TTL_SECONDS, maxsize=_WORKSHEET_CACHE_SIZE):
+        self._lock = threading.RLock()
+        self._credentials = credentials
+        self._limiter = limiter
+        self._client = None
+        self._worksheets = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._layouts = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def _authorize(self):
+        if _SHEETS_BACKEND == "local":
+            return local_sheets.from_environment(request_hook=self._limiter.call if self._limiter else None)
+        creds = ServiceAccountCredentials.from_json_keyfile_dict(
+            self._credentials(),
+            scopes=_SHEETS_SCOPES
+        )
+        client = gspread.authorize(creds, http_client=RateLimitedHTTPClient)
+        client.http_client.limiter = self._limiter
+        return client
+
+    def get_client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self._authorize()
+            else:
+                # google-auth refreshes on demand, but refreshing here keeps the
+                # first request after a long idle period from failing with 401.
+                auth = getattr(getattr(self._client, "http_client", None), "auth", None)
+                if auth is not None and not auth.valid:
+                    self._client.http_client.login()
+            return self._client
+
+    def reset_client(self):
+        with self._lock:
+            self._client = None
+            self._worksheets.clear()
+            self._layouts.clear()
+
+    def get_worksheet(self, sheet_name, worksheet_name):
+        key = (sheet_name, worksheet_name)
+        with self._lock:
+            worksheet = self._worksheets.get(key)
+        if worksheet is not None:
+            return worksheet
+        try:
+            worksheet = self.get_client().open(sheet_name).worksheet(worksheet_name)
+        except gspread.exceptions.APIError as e:
+            if not _is_auth_error(e):
+                raise
+            # Credentials were revoked or rotated: authorize again once.
+            self.reset_client()
+            worksheet = self.get_client().open(sheet_name).worksheet(worksheet_name)
+        with self._lock:
+            self._worksheets[key] = worksheet
+        return worksheet
+
+    def get_layout(self, sheet_name, worksheet_name, first_date_col, block_stride, refresh=False):
+        """Return the cached SheetLayout of a worksheet, fetching it on a miss
+        or when `refresh` is set (e.g. the requested day was not found)."""
+        key = (sheet_name, worksheet_name, first_date_col, block_stride)
+        with self._lock:
+            layout = None if refresh else self._layouts.get(key)
+        if layout is not None:
+            return layout
+        worksheet = self.get_worksheet(sheet_name, worksheet_name)
+        layout = SheetLayout.fetch(worksheet, first_date_col, block_stride)
+        with self._lock:
+            self._layouts[key] = layout
+        return layout
+
+    def invalidate(self, sheet_name, worksheet_name=None):
+        """Drop cached handles and layouts for a sheet (or a single worksheet
+        of it), e.g. after the spreadsheet or one of its tabs was renamed."""
+        with self._lock:
+            for cache in (self._worksheets, self._layouts):
+                for key in list(cache.keys()):
+                    if key[0] == sheet_name and (worksheet_name is None or key[1] == worksheet_name):
+                        cache.pop(key, None)
+
+# ── SHEET LAYOUT DISCOVERY ──────────────────────────────────────────────────
+
+_LAYOUT_FIRST_BLOCK_ROW = 4
+
+class SheetLayout:
+    """Date columns and per-person block start rows of a worksheet.
+
+    Every tab uses the same shape: row 2 holds the day numbers starting at
+    `first_date_col`, and column A holds one name every `block_stride` rows
+    starting at row 4 (column B optionally holds an employee number). The
+    whole layout is read with a single batch_get call.
+    """
+
+    def __init__(self, date_row, col_a, col_b, first_date_col, block_stride):
+        self.first_date_col = first_date_col
+        self.block_stride = block_stride
+
+        self.day_to_col = {}
+        for i, day_str in enumerate(date_row[first_date_col - 1:]):
+            day_str = str(day_str).strip()
+            if day_str:
+                self.day_to_col.setdefault(day_str, i + first_date_col)
+
+        # (start_row, name, employee_id) for each block, in sheet order
+        self.blocks = []
+        idx = _LAYOUT_FIRST_BLOCK_ROW - 1
+        while idx < len(col_a):
+            name = str(col_a[idx]).strip()
+            if not name:
+                break
+            employee_id = str(col_b[idx]).strip() if idx < len(col_b) and col_b[idx] else ""
+            self.blocks.append((idx + 1, name, employee_id))
+            idx += block_stride
+
+    @classmethod
+    def fetch(cls, worksheet, first_date_col, block_stride):
+        date_range, name_range = worksheet.batch_get(["2:2", "A:B"])
+        date_row = date_range[0] if date_range else []
+        col_a = [row[0] if len(row) > 0 else "" for row in name_range]
+        col_b = [row[1] if len(row) > 1 else "" for row in name_range]
+        return cls(date_row, col_a, col_b, first_date_col, block_stride)
+
+    def name_mapping(self):
+        return {name.upper(): start_row for start_row, name, _ in self.blocks}
+
+    def first_name_mapping(self):
+        return {name.split()[0].upper(): start_row for start_row, name, _ in self.blocks}
+
+    def employee_id_mapping(self):
+        return {employee_id: start_row for start_row, _, employee_id in self.blocks if employee_id}
+
+# ── SHEET WRITE PLAN ────────────────────────────────────────────────────────
+
+# Cells per values:batchUpdate request; keeps each payload well under the
+# Sheets API request size limit.
+_WRITE_PLAN_MAX_CELLS = 10000
+# Numbers closer than this to the sheet's current value count as unchanged.
+_DIFF_TOLERANCE = 1e-6
+
+def _same_value(current, new, tolerance=_DIFF_TOLERANCE):
+    if current is None or current == '':
+        return new is None or new == ''
+    if isinstance(new, (int, float)) and not isinstance(new, bool):
+        if isinstance(current, bool) or not isinstance(current, (int, float)):
+            return False
+        return math.isclose(current, new, rel_tol=0, abs_tol=tolerance)
+    return str(current) == str(new)
+
+class SheetWritePlan:
+    """Collects cells from several sections and writes them together.
+
+    Cells are keyed by (row, col), so a later value for the same cell
+    replaces an earlier one. `flush` merges adjacent cells into rectangular
+    ranges and sends them with as few `batch_update` calls as the size limit
+    allows.
+    """
+
+    def __init__(self, max_cells_per_request=_WRITE_PLAN_MAX_CELLS):
+        self.max_cells_per_request = max_cells_per_request
+        self._cells = {}
+        self.added = 0
+
+    def add(self, cells):
+        for cell in cells:
+            self._cells[(cell.row, cell.col)] = cell.value
+            self.added += 1
+
+    def __len__(self):
+        return len(self._cells)
+
+    def ranges(self):
+        """Rectangles of planned cells, as batch_update entries: runs of
+        consecutive rows in one column, widened across neighbouring columns
+        that have the same run (e.g. one block row over many days)."""
+        runs = []
+        run = []
+        for row, col in sorted(self._cells, key=lambda rc: (rc[1], rc[0])):
+            if run and (col != run[-1][1] or row != run[-1][0] + 1):
+                runs.append((run[0][0], run[-1][0], run[0][1]))
+                run = []
+            run.append((row, col))
+        if run:
+            runs.append((run[0][0], run[-1][0], run[0][1]))
+
+        # Runs arrive in column order, so each rectangle is extended by the
+        # next column's identical run
+        open_rects = {}
+        rects = []
+        for top, bottom, col in runs:
+            rect = open_rects.get((top, bottom))
+            if rect is not None and rect[3] == col - 1:
+                rect[3] = col
+            else:
+                rect = [top, col, bottom, col]
+                open_rects[(top, bottom)] = rect
+                rects.append(rect)
+        return [self._range_entry(*rect) for rect in sorted(rects, key=lambda r: (r[1], r[0]))]
+
+    def _range_entry(self, top, left, bottom, right):
+        a1 = f"{rowcol_to_a1(top, left)}:{rowcol_to_a1(bottom, right)}"
+        values = [[self._cells[(row, col)] for col in range(left, right + 1)] for row in range(top, bottom + 1)]
+        return {'range': a1, 'values': values}
+
+    def drop_unchanged(self, sheet, tolerance=_DIFF_TOLERANCE):
+        """Read the plan's bounding box in one batch_get and remove every
+        cell whose value is already on the sheet. Returns the number of cells
+        removed.
+
+        Cells are read as formulas, so a formula cell never matches a planned
+        value and is overwritten, as it would be without the diff."""
+        if not self._cells:
+            return 0
+        rows = [row for row, _ in self._cells]
+        cols = [col for _, col in self._cells]
+        top, left = min(rows), min(cols)
+        box = f"{rowcol_to_a1(top, left)}:{rowcol_to_a1(max(rows), max(cols))}"
+        grid = sheet.batch_get([box], value_render_option=ValueRenderOption.formula)[0]
+        unchanged = []
+        for (row, col), value in self._cells.items():
+            r, c = row - top, col - left
+            current = grid[r][c] if r < len(grid) and c < len(grid[r]) else None
+            if _same_value(current, value, tolerance):
+                unchanged.append((row, col))
+        for rc in unchanged:
+            del self._cells[rc]
+        return len(unchanged)
+
+    def requests(self):
+        """Split the ranges into batch_update payloads."""
+        batches, batch, size = [], [], 0
+        for entry in self.ranges():
+            n = len(entry['values']) * len(entry['values'][0])
+            if batch and size + n > self.max_cells_per_request:
+                batches.append(batch)
+                batch, size = [], 0
+            batch.append(entry)
+            size += n
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def flush(self, sheet, diff=False):
+        """Write the planned cells. With `diff`, cells that already hold the
+        planned value are skipped (see drop_unchanged). The diff costs one
+        extra read request and round trip per flush, so it only pays off when
+        re-running a day leaves most cells unchanged. Returns (cells_written,
+        requests_sent, cells_skipped)."""
+        with instrumentation.stage("plan diff"):
+            skipped = self.drop_unchanged(sheet) if diff else 0
+        with instrumentation.stage("plan write"):
+            batches = self.requests()
+            for batch in batches:
+                sheet.batch_update(batch, value_input_option=ValueInputOption.raw)
+        written = len(self._cells)
+        self._cells.clear()
+        self.added = 0
+        instrumentation.count("cells_written", written)
+        instrumentation.count("cells_skipped", skipped)
+        return written, len(batches), skipped
+
+def _never_diff():
+    return False
+
+_diff_writes = _never_diff
+
+def set_diff_writes(provider):
+    """Set the callable that says whether write_cells skips unchanged
+    cells (the app reads its checkbox). Returns the previous provider."""
+    global _diff_writes
+    previous, _diff_writes = _diff_writes, provider
+    return previous
+
+def diff_writes_enabled():
+    return _diff_writes()
+
+def describe_write(cells_written, requests_sent, cells_skipped):
+    planned = cells_written + cells_skipped
+    if not planned:
+        return "No cells to write."
+    return (f"Wrote {cells_written} of {planned} cells in {requests_sent} request(s); "
+            f"{cells_skipped} unchanged ({cells_skipped / planned:.0%} skipped).")
+
+def write_cells(sheet, cells):
+    """Write a list of Cells through a SheetWritePlan, honouring the
+    "only write changed cells" setting."""
+    plan = SheetWritePlan()
+    plan.add(cells)
+    result = plan.flush(sheet, diff=diff_writes_enabled())
+    report_processing.ui.caption(describe_write(*result))
+    return result
+
+def update_rth_technician_data(sheet, actual_hours, assigned_billed_hours, date_col_index, tech_mapping, plan=None):
+    """Update RTH Google Sheet with Technician Report data."""
+    cells_to_update = []
+    
+    for tech_name, start_row in tech_mapping.items():
+        # Row offsets for each tech's 4-row block:
+        # start_row + 0: Attendance Hours
+        # start_row + 1: Actual Hours (we update this)
+        # start_row + 2: Assigned Billed Hours (we update this)
+        # start_row + 3: Daily Objective
+        
+        # Update Actual Hours (row start_row + 1)
+        actual_hour_value = convert_to_native_type(actual_hours.get(tech_name, 0))
+        cell_actual = Cell(row=start_row + 1, col=date_col_index, value=actual_hour_value)
+        cells_to_update.append(cell_actual)
+        
+        # Update Assigned Billed Hours (row start_row + 2)
+        assigned_billed_value = convert_to_native_type(assigned_billed_hours.get(tech_name, 0))
+        cell_assigned = Cell(row=start_row + 2, col=date_col_index, value=assigned_billed_value)
+        cells_to_update.append(cell_assigned)
+    
+    if plan is not None:
+        plan.add(cells_to_update)
+        return
+    if cells_to_update:
+        try:
+            write_cells(sheet, cells_to_update)
+        except Exception as e:
+            report_processing.ui.error(f"Failed to update RTH Google Sheet cells: {e}")
+
+def update_rth_timecard_data(sheet, date_range, timecard_data, tech_mapping_with_employee_id, day_to_col=None, plan=None):
+    """
+    Update RTH Google Sheet with Employee Timecard data for all days in the date range.
+    Days without data will be set to 0.
+    
+    Args:
+        sheet: Google Sheet object
+        date_range: Tuple of (start_date, end_date) from the timecard report
+        timecard_data: {tech_id: {day: {"attendance": X, "objective": Y}}}
+        tech_mapping_with_employee_id: {tech_id: start_row} or {tech_name: start_row}
+        day_to_col: {day_str: column} from the sheet's SheetLayout; read from the sheet if omitted
+        plan: SheetWritePlan to add the cells to instead of writing them
+    """
+    cells_to_update = []
+    
+    # Day-to-column mapping from row 2 (dates start at column E=5)
+    if day_to_col is None:
+        day_to_col = SheetLayout.fetch(sheet, first_date_col=5, block_stride=4).day_to_col
+    
+    # Generate all days in the date range
+    all_days_in_range = []
+    if date_range:
+        start_date, end_date = date_range
+        current_date = start_date
+        while current_date <= end_date:
+            day_str = str(current_date.day)
+            all_days_in_range.append(day_str)
+            current_date += pd.Timedelta(days=1)
+    
+    for tech_id, days_data in timecard_data.items():
+        # Try to find this tech in the Google Sheet mapping
+        start_row = None
+        
+        # First try direct employee ID match
+        if tech_id in tech_mapping_with_employee_id:
+            start_row = tech_mapping_with_employee_id[tech_id]
+        else:
+            # Try matching by name if employee ID didn't work
+            # (In case the mapping uses names instead of IDs)
+            for mapped_id, row in tech_mapping_with_employee_id.items():
+                if mapped_id == tech_id:
+                    start_row = row
+                    break
+        
+        if start_row is None:
+            report_processing.ui.warning(f"Technician {tech_id} not found in Google Sheet. Skipping.")
+            continue
+        
+        # Update data for ALL days in the date range
+        for day in all_days_in_range:
+            if day not in day_to_col:
+                continue
+            
+            date_col_index = day_to_col[day]
+            
+            # Get data for this day, or use 0 if no data
+            if day in days_data:
+                attendance_value = convert_to_native_type(days_data[day]["attendance"])
+                objective_value = convert_to_native_type(days_data[day]["objective"])
+            else:
+                # No data for this day - set both to 0
+                attendance_value = 0
+                objective_value = 0
+            
+            # Update Attendance Hours (row start_row + 0)
+            cell_attendance = Cell(row=start_row, col=date_col_index, value=attendance_value)
+            cells_to_update.append(cell_attendance)
+            
+            # Update Daily Objective (row start_row + 3)
+            cell_objective = Cell(row=start_row + 3, col=date_col_index, value=objective_value)
+            cells_to_update.append(cell_objective)
+    
+    if plan is not None:
+        plan.add(cells_to_update)
+        return
+    if cells_to_update:
+        try:
+            cells_written, _, _ = write_cells(sheet, cells_to_update)
+            report_processing.ui.success(f"Updated {cells_written} cells successfully!")
+        except Exception as e:
+            report_processing.ui.error(f"Failed to update Employee Timecard data in Google Sheet: {e}")
+
+def update_appointments_in_sheet(sheet, vw_data, toyota_data, alfa_data, advisor_mapping, update_vw=True, update_toyota=True, update_alfa=True, day_to_col=None, plan=None):
+    """
+    Update Appointments Google Sheet with data from three brands for multiple days.
+    
+    Args:
+        sheet: Google Sheet object
+        vw_data: {day_str: {first_name: appointments}} for Volkswagen
+        toyota_data: {day_str: {first_name: appointments}} for Toyota
+        alfa_data: {day_str: {first_name: appointments}} for Alfa
+        advisor_mapping: {first_name: start_row} mapping
+        update_vw: Whether to update Volkswagen row (default True)
+        update_toyota: Whether to update Toyota row (default True)
+        update_alfa: Whether to update Alfa row (default True)
+        day_to_col: {day_str: column} from the sheet's SheetLayout; read from the sheet if omitted
+        plan: SheetWritePlan to add the cells to instead of writing them
+    """
+    cells_to_update = []
+    
+    # Day-to-column mapping from row 2
+    # Row 2: A=tech, B=empty, C=empty, D=1, E=2, F=3...
+    if day_to_col is None:
+        day_to_col = SheetLayout.fetch(sheet, first_date_col=4, block_stride=4).day_to_col
+    
+    # Collect all unique days from all brand data
+    all_days = set()
+    if update_vw and vw_data:
+        all_days.update(vw_data.keys())
+    if update_toyota and toyota_data:
+        all_days.update(toyota_data.keys())
+    if update_alfa and alfa_data:
+        all_days.update(alfa_data.keys())
+    
+    # For each day, update all advisors
+    for day in all_days:
+        if day not in day_to_col:
+            report_processing.ui.warning(f"Day {day} not found in Google Sheet columns. Skipping.")
+            continue
+        
+        date_col_index = day_to_col[day]
+        
+        for advisor_name, start_row in advisor_mapping.items():
+            # Row offsets for each brand:
+            # start_row + 0: Volkswagen
+            # start_row + 1: Toyota
+            # start_row + 2: Alfa
+            # start_row + 3: Daily Objective (not updated)
+            
+            # Update Volkswagen (row start_row + 0)
+            if update_vw and vw_data and day in vw_data:
+                vw_value = convert_to_native_type(vw_data[day].get(advisor_name, 0))
+                cell_vw = Cell(row=start_row, col=date_col_index, value=vw_value)
+                cells_to_update.append(cell_vw)
+            
+            # Update Toyota (row start_row + 1)
+            if update_toyota and toyota_data and day in toyota_data:
+                toyota_value = convert_to_native_type(toyota_data[day].get(advisor_name, 0))
+                cell_toyota = Cell(row=start_row + 1, col=date_col_index, value=toyota_value)
+                cells_to_update.append(cell_toyota)
+            
+            # Update Alfa (row start_row + 2)
+            if update_alfa and alfa_data and day in alfa_data:
+                alfa_value = convert_to_native_type(alfa_data[day].get(advisor_name, 0))
+                cell_alfa = Cell(row=start_row + 2, col=date_col_index, value=alfa_value)
+                cells_to_update.append(cell_alfa)
+    
+    if plan is not None:
+        plan.add(cells_to_update)
+        return
+    if cells_to_update:
+        try:
+            cells_written, _, _ = write_cells(sheet, cells_to_update)
+            report_processing.ui.success(f"Updated {cells_written} cells successfully for {len(all_days)} day(s)!")
+        except Exception as e:
+            report_processing.ui.error(f"Failed to update Appointments Google Sheet cells: {e}")
+
+#   SHEET UPDATE UTILITIES
+
+COMMODITIES = [
+    'Air Filters', 'Cabin Filters', 'Batteries', 'Tires', 'Brakes',
+    'Wipers', 'Belts', 'Fluids', 'Factory Chemicals'
+]
+
+# Row of each metric within an advisor's 26-row block (1 = the name row)
+ADVISOR_DATA_ROW_OFFSETS = {
+    'RO Count': 1,
+    'Menu Sales': 2,
+    'Menu Sales Labor Gross': 3,
+    'Menu Sales Parts Gross': 4,
+    'A-la-carte Count': 5,
+    'A-la-carte Labor Gross': 6,
+    'A-la-carte Parts Gross': 7,
+    'Labor Gross': 18,
+    'Parts Gross': 19,
+    'Rec Count': 20,
+    'Rec Sold Count': 21,
+    'Rec Amount': 22,
+    'Rec Sold Amount': 23,
+    'Daily Labor Gross': 24,
+    'Daily Parts Gross': 25,
+}
+
+def update_google_sheet(sheet, data_series1, *args, date_col_index, start_row_offset, advisor_mapping, plan=None):
+    cells_to_update = []
+    for advisor_name, start_row in advisor_mapping.items():
+        row_index = start_row + start_row_offset
+        value1 = data_series1.get(advisor_name, 0)
+        value1 = convert_to_native_type(value1)
+        cell = Cell(row=row_index, col=date_col_index, value=value1)
+        cells_to_update.append(cell)
+        for i, data_series in enumerate(args):
+            value = data_series.get(advisor_name, 0)
+            value = convert_to_native_type(value)
+            cell = Cell(row=row_index + i + 1, col=date_col_index, value=value)
+            cells_to_update.append(cell)
+    if plan is not None:
+        plan.add(cells_to_update)
+        return True
+    if cells_to_update:
+        try:
+            write_cells(sheet, cells_to_update)
+        except Exception as e:
+            report_processing.ui.error(f"Failed to update Google Sheet cells: {e}")
+            return False
+    return True
+
+def update_commodities_in_sheet(sheet, date_col_index, commodities_data, commodities_list, advisor_mapping, data_row_offsets, plan=None):
+    cells_to_update = {}
+    commodity_row_offsets = {
+        'Air Filters': 8,
+        'Cabin Filters': 9,
+        'Batteries': 10,
+        'Tires': 11,
+        'Brakes': 12,
+        'Alignments': 13,       
+        'Wipers': 14,
+        'Belts': 15,
+        'Fluids': 16,
+        'Factory Chemicals': 17,
+    }
+    labor_gross_offset = data_row_offsets['Labor Gross']
+    parts_gross_offset = data_row_offsets['Parts Gross'] 
+    total_parts_gross_per_advisor = {advisor: 0 for advisor in advisor_mapping.keys()}
+    total_labor_gross_per_advisor = {advisor: 0 for advisor in advisor_mapping.keys()}
+
+    for commodity in commodities_list:
+        data = commodities_data.get(commodity, {})
+        if commodity == 'Tires':
+            actual_quantity_sums = data.get('actual_quantity_sums', {})
+            gross_sums = data.get('gross_sums', {})
+        else:
+            name_counts = data.get('name_counts', {})
+            parts_gross_sums = data.get('parts_gross_sums', {})
+            labor_gross_sums = data.get('labor_gross_sums', {}) if commodity == 'Alignments' else {}
+
+        for advisor_name, start_row in advisor_mapping.items():
+            base_row = start_row + commodity_row_offsets[commodity] - 1
+            if commodity == 'Tires':
+                actual_quantity = convert_to_native_type(actual_quantity_sums.get(advisor_name, 0))
+                cell_actual_quantity = Cell(row=base_row, col=date_col_index, value=actual_quantity)
+                cells_to_update.setdefault(advisor_name, []).append(cell_actual_quantity)
+                gross = convert_to_native_type(gross_sums.get(advisor_name, 0))
+                total_parts_gross_per_advisor[advisor_name] += gross
+            else:
+                
+                count_value = convert_to_native_type(name_counts.get(advisor_name, 0))
+                cell_count = Cell(row=base_row, col=date_col_index, value=count_value)
+                cells_to_update.setdefault(advisor_name, []).append(cell_count)
+                parts_gross_value = convert_to_native_type(parts_gross_sums.get(advisor_name, 0))
+                total_parts_gross_per_advisor[advisor_name] += parts_gross_value
+
+                
+                if commodity == 'Alignments':
+                    labor_gross_value = convert_to_native_type(labor_gross_sums.get(advisor_name, 0))
+                    total_labor_gross_per_advisor[advisor_name] += labor_gross_value
+
+    # Add final labor/parts totals
+    for advisor_name, start_row in advisor_mapping.items():
+        labor_gross = total_labor_gross_per_advisor.get(advisor_name, 0)
+        labor_gross_row = start_row + labor_gross_offset - 1
+        cell_labor_gross = Cell(row=labor_gross_row, col=date_col_index, value=labor_gross)
+
+        parts_gross = total_parts_gross_per_advisor.get(advisor_name, 0)
+        parts_gross_row = start_row + parts_gross_offset - 1
+        cell_parts_gross = Cell(row=parts_gross_row, col=date_col_index, value=parts_gross)
+
+        cells_to_update.setdefault(advisor_name, []).extend([cell_labor_gross, cell_parts_gross])
+
+    all_cells = []
+    for advisor_cells in cells_to_update.values():
+        all_cells.extend(advisor_cells)
+
+    if plan is not None:
+        plan.add(all_cells)
+        return True
+    if all_cells:
+        try:
+            write_cells(sheet, all_cells)
+        except Exception as e:
+            report_processing.ui.error(f"Failed to update Commodities in Google Sheet: {e}")
+            return False
+    return True
+
+# Advisor-tab sections written with update_google_sheet, by the
+# ADVISOR_DATA_ROW_OFFSETS row their first series goes to
+ADVISOR_SERIES_ROWS = {
+    "RO Count": 'RO Count',
+    "Menu Sales": 'Menu Sales',
+    "A-La-Carte": 'A-la-carte Count',
+    "Recommendations": 'Rec Count',
+    "Daily Data": 'Daily Labor Gross',
+}
+
+def plan_advisor_sections(plan, results, date_col_index, advisor_mapping):
+    """Add one day's Advisor-tab cells to `plan`. `results` maps section
+    labels ("RO Count", a commodity, "Alignment Menus", ...) to parsed
+    results; sections not in it are left alone. Returns the labels added."""
+    added = []
+    for label, first_row in ADVISOR_SERIES_ROWS.items():
+        if label in results:
+            result = results[label]
+            series = result if isinstance(result, tuple) else (result,)
+            update_google_sheet(None, *series, date_col_index=date_col_index,
+                                start_row_offset=ADVISOR_DATA_ROW_OFFSETS[first_row] - 1,
+                                advisor_mapping=advisor_mapping, plan=plan)
+            added.append(label)
+
+    commodities_data = {}
+    for commodity in COMMODITIES:
+        if commodity not in results:
+            continue
+        result = results[commodity]
+        if commodity == 'Tires':
+            commodities_data['Tires'] = {'actual_quantity_sums': result[0], 'gross_sums': result[1]}
+        else:
+            commodities_data[commodity] = {'name_counts': result[0], 'parts_gross_sums': result[1]}
+        added.append(commodity)
+    alignment_counts = {}
+    for label in ("Alignment Menus", "Alignment A-La-Carte"):
+        if label in results:
+            for advisor, count in results[label].items():
+                alignment_counts[advisor] = alignment_counts.get(advisor, 0) + count
+            added.append(label)
+    if commodities_data or alignment_counts:
+        commodities_data['Alignments'] = {'name_counts': alignment_counts, 'parts_gross_sums': {}, 'labor_gross_sums': {}}
+        update_commodities_in_sheet(None, date_col_index, commodities_data, COMMODITIES + ['Alignments'],
+                                    advisor_mapping, ADVISOR_DATA_ROW_OFFSETS, plan=plan)
+    return added
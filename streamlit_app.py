@@ -1,14 +1,35 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from gspread.cell import Cell
+from cachetools import LRUCache
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+import contextlib
+import hashlib
+import instrumentation
+import multiprocessing
+import os
+import pickle
+import report_archive
+import threading
 import warnings
-import time
-import numpy as np
+from report_processing import (
+    DATE_COLUMNS, SECTIONS, STREAMED_SECTIONS, read_excel_projected,
+    replay_messages, run_section_job, run_section_jobs,
+    run_split_section_job, run_split_section_jobs, set_ui,
+)
+from sheet_io import (
+    ADVISOR_DATA_ROW_OFFSETS, COMMODITIES, SheetConnectionCache,
+    SheetsRateLimiter, SheetWritePlan, describe_write, diff_writes_enabled,
+    plan_advisor_sections, set_diff_writes, update_appointments_in_sheet,
+    update_commodities_in_sheet, update_google_sheet,
+    update_rth_technician_data, update_rth_timecard_data,
+)
+from key_index import KeyIndex, index_path
 
 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
+set_ui(st)
+set_diff_writes(lambda: st.session_state.get("diff_writes", False))
 
 def set_bg_color():
     st.markdown(
@@ -80,701 +101,381 @@ def set_bg_color():
         unsafe_allow_html=True
     )
 
+# ── GOOGLE SHEETS CONNECTION CACHE ─────────────────────────────────────────
+
+@st.cache_resource
+def get_sheets_rate_limiter():
+    return SheetsRateLimiter()
+
+@st.cache_resource
+def get_sheet_connection_cache():
+    return SheetConnectionCache(lambda: st.secrets["GOOGLE_CREDENTIALS"], get_sheets_rate_limiter())
+
 def connect_to_google_sheet(sheet_name, worksheet_name):
     try:
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(
-            st.secrets["GOOGLE_CREDENTIALS"], 
-            scopes=["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        )
-        client = gspread.authorize(creds)
-        sheet = client.open(sheet_name).worksheet(worksheet_name)
-        return sheet
+        return get_sheet_connection_cache().get_worksheet(sheet_name, worksheet_name)
     except Exception as e:
         st.error(f"An unexpected error occurred while connecting to Google Sheets: {e}. Please check the configuration and try again.")
         return None
 
-def clean_column_data(column):
-    return column.replace(r'[\$,]', '', regex=True).replace(',', '', regex=True).astype(float)
-
-def convert_to_native_type(value):
-    if isinstance(value, pd.Series):
-        value = value.sum()
-    if pd.isna(value):
-        return 0
-    elif isinstance(value, (np.integer, np.int64, np.int32, int)):
-        return int(value)
-    elif isinstance(value, (np.floating, np.float64, np.float32, float)):
-        return float(value)
-    elif isinstance(value, (np.bool_, bool)):
-        return bool(value)
-    elif isinstance(value, (np.str_, str)):
-        return str(value)
-    else:
-        return str(value)
+def invalidate_sheet_connection(sheet_name, worksheet_name=None):
+    get_sheet_connection_cache().invalidate(sheet_name, worksheet_name)
 
+# ── SHEET LAYOUT DISCOVERY ──────────────────────────────────────────────────
 
-def process_menu_sales_data(df, names_column='Advisor Name', ro_number_column='RO Number'):
-    df[names_column] = df[names_column].str.strip().str.upper()
-    df['Opcode Labor Gross'] = clean_column_data(df['Opcode Labor Gross'])
-    df['Opcode Parts Gross'] = clean_column_data(df['Opcode Parts Gross'])
-    
-    # Count unique RO Numbers per advisor
-    df = df.dropna(subset=[ro_number_column])
-    df[ro_number_column] = df[ro_number_column].astype(str).str.strip()
-    unique_ro = df.drop_duplicates(subset=[names_column, ro_number_column])
-    name_counts = unique_ro.groupby(names_column)[ro_number_column].nunique().to_dict()
-    
-    labor_gross_sums = df.groupby(names_column)['Opcode Labor Gross'].sum().to_dict()
-    parts_gross_sums = df.groupby(names_column)['Opcode Parts Gross'].sum().to_dict()
-    return name_counts, labor_gross_sums, parts_gross_sums
-
-def process_alacarte_data(df, names_column='Advisor Name'):
-    df[names_column] = df[names_column].str.strip().str.upper()
-    df['Opcode Labor Gross'] = clean_column_data(df['Opcode Labor Gross'])
-    df['Opcode Parts Gross'] = clean_column_data(df['Opcode Parts Gross'])
-    name_counts = df[names_column].value_counts().to_dict()
-    labor_gross_sums = df.groupby(names_column)['Opcode Labor Gross'].sum().to_dict()
-    parts_gross_sums = df.groupby(names_column)['Opcode Parts Gross'].sum().to_dict()
-    return name_counts, labor_gross_sums, parts_gross_sums
-
-def process_commodity_file(df, names_column='Primary Advisor Name', gross_column='Gross'):
-    df[names_column] = df[names_column].astype(str).str.strip().str.upper()
-    df[gross_column] = clean_column_data(df[gross_column])
-    name_counts = df[names_column].value_counts()
-    parts_gross_sums = df.groupby(names_column)[gross_column].sum()
-    name_counts = name_counts.to_dict()
-    parts_gross_sums = parts_gross_sums.to_dict()
-    return name_counts, parts_gross_sums
-
-#    TIRES
-def process_tires_data(df):
-    names_column = None
-    quantity_column = None
-    gross_column = None
-
-    for col in df.columns:
-        col_lower = col.lower()
-        if 'advisor' in col_lower and 'name' in col_lower:
-            names_column = col
-        elif 'part count' in col_lower or 'actual quantity' in col_lower:
-            quantity_column = col
-        elif 'opcode parts gross' in col_lower or 'gross' in col_lower:
-            gross_column = col
-
-    if names_column and quantity_column and gross_column:
-        if 'advisor name group' in names_column.lower():
-            st.write("Detected GM Tires Format.")
-        else:
-            st.write("Detected Original Tires Format.")
+def load_sheet_layout(sheet_name, worksheet_name, first_date_col, block_stride, day=None):
+    """Return the cached layout of a worksheet. If `day` is given and missing
+    from the cached layout, the layout is fetched again once in case the sheet
+    was edited since it was cached."""
+    cache = get_sheet_connection_cache()
+    try:
+        layout = cache.get_layout(sheet_name, worksheet_name, first_date_col, block_stride)
+        if day is not None and day not in layout.day_to_col:
+            layout = cache.get_layout(sheet_name, worksheet_name, first_date_col, block_stride, refresh=True)
+        return layout
+    except Exception as e:
+        st.error(f"Failed to read the layout of the Google Sheet: {e}")
+        return None
+
+# ── TAB SHEETS ──────────────────────────────────────────────────────────────
+# A tab opens and lays out its sheet only once it is used: when "Connect to
+# sheet" is pressed or a file is uploaded to it. The worksheet and layout
+# are then kept in the session, so reruns from other widgets make no Sheets
+# API calls; "Reload sheet" reads them again.
+
+def tab_sheet(tab, sheet_name, worksheet_name, first_date_col, block_stride, used=False, day=None):
+    """Return (worksheet, layout) for a tab, or (None, None) while the tab
+    is unused or its sheet could not be opened. A `day` missing from the
+    stored layout is looked up again once, in case the sheet was edited."""
+    state_key = f"{tab}_sheet"
+    target = (sheet_name, worksheet_name, first_date_col, block_stride)
+    state = st.session_state.get(state_key)
+    if state is not None and state["target"] != target:
+        state = None
+
+    if state is None:
+        reload = st.button("Connect to sheet", key=f"{tab}_connect", help="Opens the sheet and reads its dates and names.")
     else:
-        raise ValueError("Tires Excel does not match any known format.")
+        reload = st.button("Reload sheet", key=f"{tab}_connect",
+                           help="Reads the sheet's dates and names again, e.g. after editing or renaming it.")
+        if reload:
+            invalidate_sheet_connection(sheet_name, worksheet_name)
+
+    if reload or (state is None and used):
+        state = {"target": target, "sheet": None, "layout": None, "days_checked": set()}
+        st.session_state[state_key] = state
+        state["sheet"] = connect_to_google_sheet(sheet_name, worksheet_name)
+        if state["sheet"] is not None:
+            state["layout"] = load_sheet_layout(sheet_name, worksheet_name, first_date_col, block_stride, day=day)
+            state["days_checked"].add(day)
+
+    if state is None:
+        st.caption("The sheet is opened once you upload a file or press Connect to sheet.")
+        return None, None
+    if state["layout"] is None:
+        st.error("Failed to connect to the Google Sheet. Please check the inputs and press Connect to sheet.")
+        return None, None
+    if day is not None and day not in state["layout"].day_to_col and day not in state["days_checked"]:
+        state["days_checked"].add(day)
+        layout = load_sheet_layout(sheet_name, worksheet_name, first_date_col, block_stride, day=day)
+        if layout is not None:
+            state["layout"] = layout
+    return state["sheet"], state["layout"]
+
+# ── PARSED UPLOAD CACHE ─────────────────────────────────────────────────────
+
+_UPLOAD_CACHE_MAX_BYTES = 512 * 1024 * 1024
+_MISSING = object()
+
+def _cache_entry_size(value):
+    if isinstance(value, pd.DataFrame):
+        return max(int(value.memory_usage(deep=True).sum()), 1)
+    try:
+        return max(len(pickle.dumps(value)), 1)
+    except Exception:
+        return 1024
+
+class UploadCache:
+    """LRU cache of parsed DataFrames and the aggregates computed from them,
+    bounded by an approximate byte budget. Keys are built from the SHA-256 of
+    the upload bytes, so the same file is parsed once however many buttons
+    use it."""
+
+    def __init__(self, max_bytes=_UPLOAD_CACHE_MAX_BYTES):
+        self._lock = threading.Lock()
+        self._entries = LRUCache(maxsize=max_bytes, getsizeof=_cache_entry_size)
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._entries.get(key, default)
+
+    def put(self, key, value):
+        with self._lock:
+            try:
+                self._entries[key] = value
+            except ValueError:
+                # Larger than the whole budget: use it once, don't cache it.
+                pass
 
-    df[names_column] = df[names_column].astype(str).str.strip().str.upper()
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+@st.cache_resource
+def get_upload_cache():
+    return UploadCache()
+
+def upload_digest(uploaded_file):
+    """SHA-256 of an uploaded file's bytes (or of a file on disk)."""
+    if hasattr(uploaded_file, "getvalue"):
+        data = uploaded_file.getvalue()
+    else:
+        with open(uploaded_file, "rb") as fh:
+            data = fh.read()
+    return hashlib.sha256(data).hexdigest()
 
-    try:
-        df[quantity_column] = clean_column_data(df[quantity_column])
-        df[gross_column] = clean_column_data(df[gross_column])
-    except Exception as e:
-        raise ValueError(f"Error cleaning columns: {e}")
+def _options_key(options):
+    return tuple(sorted((k, repr(v)) for k, v in options.items()))
 
-    actual_quantity_sums = df.groupby(names_column)[quantity_column].sum().to_dict()
-    gross_sums = df.groupby(names_column)[gross_column].sum().to_dict()
+def read_excel_cached(uploaded_file, **reader_options):
+    """read_excel_projected through the upload cache. Returns a copy because
+    the processing functions modify the frame in place."""
+    key = ("excel", upload_digest(uploaded_file), _options_key(reader_options))
 
-    actual_quantity_sums = {k: float(v) for k, v in actual_quantity_sums.items()}
-    gross_sums = {k: float(v) for k, v in gross_sums.items()}
-    return actual_quantity_sums, gross_sums
+    def _read():
+        with instrumentation.stage("read excel"):
+            return read_excel_projected(uploaded_file, **reader_options)
 
-def process_tires_gm_format(file):
-    try:
-        df = pd.read_excel(file, skiprows=2, header=0)
-        actual_quantity_sums, gross_sums = process_tires_data(df)
-        return actual_quantity_sums, gross_sums
-    except Exception as e:
-        raise ValueError(f"Error processing GM Format Tires Excel file: {e}")
-
-#    ALIGNMENT MENUS & A-LA-CARTE: NEW WHEEL ALIGNMENT
-def process_alignment_new_format(df, advisor_col='Advisor Name', story_col='Operation Tech Story'):
-   
-    df[advisor_col] = df[advisor_col].astype(str).str.strip().str.upper()
-    alignment_counts = {}
-    for _, row in df.iterrows():
-        advisor = row[advisor_col]
-        story_text = str(row.get(story_col, "")).lower()
-        if "wheel alignment" in story_text:
-            alignment_counts[advisor] = alignment_counts.get(advisor, 0) + 1
-
-    # Return just name_counts; no parts/labor
-    return alignment_counts
-
-#  RECOMMENDATIONS / DAILY / RO COUNT
-def process_recommendations_data(df, names_column="Name"):
-    df.columns = df.columns.str.strip()
-    df = df[df[names_column].str.strip().str.upper() != "TOTAL"]
-    required_columns = ['Recommendations', 'Recommendations Sold', 'Recommendations $ amount', 'Recommendations Sold $ amount']
-    for col in required_columns:
-        if col not in df.columns:
-            raise ValueError(f"Column '{col}' not found in the uploaded Recommendations Excel. Please check the column names.")
-    df[names_column] = df[names_column].str.strip().str.upper()
-    rec_count = df.groupby(names_column)['Recommendations'].sum().to_dict()
-    rec_sold_count = df.groupby(names_column)['Recommendations Sold'].sum().to_dict()
-    rec_amount = clean_column_data(df.groupby(names_column)['Recommendations $ amount'].sum()).to_dict()
-    rec_sold_amount = clean_column_data(df.groupby(names_column)['Recommendations Sold $ amount'].sum()).to_dict()
-    return rec_count, rec_sold_count, rec_amount, rec_sold_amount
-
-def process_daily_data(df):
-    df.columns = df.columns.str.strip()
-    
-    # Auto-detect format: Old format has 'Name' and 'Pay Type', new format has 'Service Advisor'
-    if 'Name' in df.columns and 'Pay Type' in df.columns:
-        # Old format
-        names_column = 'Name'
-        df = df[df[names_column].str.strip().str.upper() != "TOTAL"]
-        df = df[df['Pay Type'].str.upper() == "ALL"]
-        st.write("Detected Old Daily Data Format")
-    elif 'Service Advisor' in df.columns:
-        # New format
-        names_column = 'Service Advisor'
-        df = df[df[names_column].str.strip().str.upper() != "TOTAL"]
-        st.write("Detected New Advisor Preformance 3.0 format")
+    df = get_upload_cache().get_or_compute(key, _read).copy()
+    instrumentation.count("rows_read", len(df))
+    return df
+
+def _aggregate_key(name, uploaded_files, options):
+    return ("aggregate", name, tuple(upload_digest(f) for f in uploaded_files), _options_key(options))
+
+def cached_aggregate(name, uploaded_files, compute, **options):
+    """Cache the result of `compute()` under the digests of the files it was
+    computed from plus any options that change the result."""
+    return get_upload_cache().get_or_compute(_aggregate_key(name, uploaded_files, options), compute)
+
+# ── SECTION AGGREGATES ──────────────────────────────────────────────────────
+# Read + process one upload section (see report_processing.SECTIONS). Results
+# are cached by file content, so the per-section buttons and "Input All"
+# share the same parse.
+
+def aggregate_section(section, files, **options):
+    # Multi-file sections stream their files instead of caching whole frames
+    reader = read_excel_projected if section in STREAMED_SECTIONS else read_excel_cached
+    archive = report_archive.current_partition(section)
+    if archive is None:
+        compute = lambda: SECTIONS[section](files, reader=reader, **options)
     else:
-        raise ValueError("Daily Data Excel format not recognized. ")
-    
-    df[names_column] = df[names_column].str.strip().str.upper()
-    required_columns = ['Labor Gross', 'Parts Gross']
-    for col in required_columns:
-        if col not in df.columns:
-            raise ValueError(f"Column '{col}' not found in the uploaded Daily Data Excel. Please check the column names.")
-    df['Labor Gross'] = clean_column_data(df['Labor Gross'])
-    df['Parts Gross'] = clean_column_data(df['Parts Gross'])
-    labor_gross_sums = df.groupby(names_column)['Labor Gross'].sum().to_dict()
-    parts_gross_sums = df.groupby(names_column)['Parts Gross'].sum().to_dict()
-    return labor_gross_sums, parts_gross_sums
-
-def process_ro_count_data(df, advisor_column='Advisor Name', ro_number_column='RO Number'):
-    df.columns = df.columns.str.strip()
-    if advisor_column not in df.columns or ro_number_column not in df.columns:
-        raise ValueError(f"Columns '{advisor_column}' or '{ro_number_column}' not found in the uploaded RO Count Excel.")
-    df[advisor_column] = df[advisor_column].str.strip().str.upper()
-    df = df.dropna(subset=[ro_number_column])
-    df[ro_number_column] = df[ro_number_column].astype(str).str.strip()
-    unique_ro = df.drop_duplicates(subset=[advisor_column, ro_number_column])
-    ro_counts = unique_ro.groupby(advisor_column)[ro_number_column].nunique().to_dict()
-    return ro_counts
-
-#   RTH PROCESSING FUNCTIONS
-
-def process_technician_report_data(df):
-    """Process Technician Report Excel to extract Actual Hours and Assigned Billed Hours per technician."""
-    df.columns = df.columns.str.strip()
-    
-    required_columns = ['Technician Name', 'Actual Hours', 'Assigned Billed Hours']
-    for col in required_columns:
-        if col not in df.columns:
-            raise ValueError(f"Column '{col}' not found in the Technician Report Excel. Please check the column names.")
-    
-    # Clean and normalize technician names
-    df['Technician Name'] = df['Technician Name'].astype(str).str.strip().str.upper()
-    
-    # Clean numeric columns
-    df['Actual Hours'] = pd.to_numeric(df['Actual Hours'], errors='coerce').fillna(0)
-    df['Assigned Billed Hours'] = pd.to_numeric(df['Assigned Billed Hours'], errors='coerce').fillna(0)
-    
-    # Group by technician and sum hours
-    actual_hours = df.groupby('Technician Name')['Actual Hours'].sum().to_dict()
-    assigned_billed_hours = df.groupby('Technician Name')['Assigned Billed Hours'].sum().to_dict()
-    
-    return actual_hours, assigned_billed_hours
+        compute = lambda: archive.run(section, files, reader=reader, **options)
+    with instrumentation.stage(f"parse {section}"):
+        if options.get("key_index") is not None:
+            # What the key index skips depends on what was committed since,
+            # so these parses are never served from the cache
+            return compute()
+        # The partition is part of the key so a new store or date is archived too
+        return cached_aggregate(section, files, compute, archive=archive, **options)
 
-def update_rth_technician_data(sheet, actual_hours, assigned_billed_hours, date_col_index, tech_mapping):
-    """Update RTH Google Sheet with Technician Report data."""
-    cells_to_update = []
-    
-    for tech_name, start_row in tech_mapping.items():
-        # Row offsets for each tech's 4-row block:
-        # start_row + 0: Attendance Hours
-        # start_row + 1: Actual Hours (we update this)
-        # start_row + 2: Assigned Billed Hours (we update this)
-        # start_row + 3: Daily Objective
-        
-        # Update Actual Hours (row start_row + 1)
-        actual_hour_value = convert_to_native_type(actual_hours.get(tech_name, 0))
-        cell_actual = Cell(row=start_row + 1, col=date_col_index, value=actual_hour_value)
-        cells_to_update.append(cell_actual)
-        
-        # Update Assigned Billed Hours (row start_row + 2)
-        assigned_billed_value = convert_to_native_type(assigned_billed_hours.get(tech_name, 0))
-        cell_assigned = Cell(row=start_row + 2, col=date_col_index, value=assigned_billed_value)
-        cells_to_update.append(cell_assigned)
-    
-    if cells_to_update:
-        try:
-            sheet.update_cells(cells_to_update)
-        except Exception as e:
-            st.error(f"Failed to update RTH Google Sheet cells: {e}")
+def aggregate_ro_count(file):
+    return aggregate_section("ro_count", [file])
 
-def process_employee_timecard_data(df):
-    """
-    Process Employee Timecard Report Excel to extract attendance hours and daily objectives.
-    This file has a vertical layout with bi-weekly data for multiple technicians.
-    
-    Structure:
-    - Row 1 (index 0): Date range in columns H-L (e.g., "11/16/2025 - 11/30/2025")
-    - Row 6 (index 5): First tech - Column A: Employee #, Column C: "Lastname, Firstname"
-    - Row 7 (index 6): Headers (Date, ..., Paid)
-    - Row 8+ (index 7+): Every 3 rows = 1 day (Date in Column A, Paid in Column K)
-    - Next tech starts when we see another name in Column C
-    
-    Returns: (date_range_tuple, {employee_id_or_name: {day: {"attendance": hours, "objective": 8 or 0}}})
-    """
-    timecard_data = {}
-    date_range = None
-    
-    # Extract date range from row 1 (index 0), columns H-L (indexes 7-11)
-    try:
-        row_1 = df.iloc[0]
-        # Look for date range string in columns H-L
-        for col_idx in range(7, 12):  # Columns H, I, J, K, L
-            if col_idx < len(row_1):
-                cell_value = str(row_1.iloc[col_idx]).strip()
-                if "-" in cell_value and "/" in cell_value:
-                    # Found date range like "11/16/2025 - 11/30/2025"
-                    parts = cell_value.split("-")
-                    if len(parts) == 2:
-                        start_date = pd.to_datetime(parts[0].strip(), errors='coerce')
-                        end_date = pd.to_datetime(parts[1].strip(), errors='coerce')
-                        if pd.notna(start_date) and pd.notna(end_date):
-                            date_range = (start_date, end_date)
-                            break
-    except Exception as e:
-        st.warning(f"Could not extract date range from row 1: {e}")
-    
-    # Iterate through rows to find tech sections
-    current_tech_id = None
-    current_tech_name = None
-    current_tech_data = {}
-    
-    for idx, row in df.iterrows():
-        # Check if this row starts a new tech section
-        # Tech section starts when Column C (index 2) has a name and Column A (index 0) has employee number
-        col_c_value = str(row.iloc[2]).strip() if pd.notna(row.iloc[2]) else ""
-        col_a_value = str(row.iloc[0]).strip() if pd.notna(row.iloc[0]) else ""
-        
-        # Detect new tech section: Column C has "Lastname, Firstname" format
-        if col_c_value and "," in col_c_value and len(col_c_value) > 3:
-            # Save previous tech's data if exists
-            if current_tech_id and current_tech_data:
-                timecard_data[current_tech_id] = current_tech_data
-            
-            # Start new tech
-            current_tech_id = col_a_value  # Employee number
-            current_tech_name = col_c_value  # "Lastname, Firstname"
-            
-            # Convert "Lastname, Firstname" to "FIRSTNAME LASTNAME" for matching
-            if "," in current_tech_name:
-                parts = current_tech_name.split(",")
-                if len(parts) == 2:
-                    lastname = parts[0].strip()
-                    firstname = parts[1].strip()
-                    current_tech_name = f"{firstname} {lastname}".upper()
-            
-            current_tech_data = {}
-            continue
-        
-        # If we're in a tech section, look for date rows
-        if current_tech_id:
-            # Check if Column A has a date (try to parse as date)
-            try:
-                date_value = pd.to_datetime(row.iloc[0], errors='coerce')
-                if pd.notna(date_value):
-                    # This is a date row! Extract day number
-                    day_number = str(date_value.day)
-                    
-                    # Get Paid amount from Column K (index 10)
-                    paid_value = pd.to_numeric(row.iloc[10], errors='coerce') if len(row) > 10 else 0
-                    paid_value = paid_value if pd.notna(paid_value) else 0
-                    
-                    # Calculate daily objective: 8 if paid > 0, else 0
-                    daily_objective = 8 if paid_value > 0 else 0
-                    
-                    # Store the data
-                    current_tech_data[day_number] = {
-                        "attendance": float(paid_value),
-                        "objective": daily_objective
-                    }
-            except:
-                pass
-    
-    # Save last tech's data
-    if current_tech_id and current_tech_data:
-        timecard_data[current_tech_id] = current_tech_data
-    
-    return date_range, timecard_data
+def aggregate_menu_sales(files, dedupe, key_index=None):
+    return aggregate_section("menu_sales", files, dedupe=dedupe, key_index=key_index)
 
-def update_rth_timecard_data(sheet, date_range, timecard_data, tech_mapping_with_employee_id):
-    """
-    Update RTH Google Sheet with Employee Timecard data for all days in the date range.
-    Days without data will be set to 0.
-    
-    Args:
-        sheet: Google Sheet object
-        date_range: Tuple of (start_date, end_date) from the timecard report
-        timecard_data: {tech_id: {day: {"attendance": X, "objective": Y}}}
-        tech_mapping_with_employee_id: {tech_id: start_row} or {tech_name: start_row}
-    """
-    cells_to_update = []
-    
-    # Get date row to build day-to-column mapping
-    date_row = sheet.row_values(2)[4:]  # Skip first 4 columns (A, B, C, D)
-    day_to_col = {}
-    for i, day_str in enumerate(date_row):
-        if day_str.strip():
-            day_to_col[day_str.strip()] = i + 5  # Column index (E=5, F=6, etc.)
-    
-    # Generate all days in the date range
-    all_days_in_range = []
-    if date_range:
-        start_date, end_date = date_range
-        current_date = start_date
-        while current_date <= end_date:
-            day_str = str(current_date.day)
-            all_days_in_range.append(day_str)
-            current_date += pd.Timedelta(days=1)
-    
-    for tech_id, days_data in timecard_data.items():
-        # Try to find this tech in the Google Sheet mapping
-        start_row = None
-        
-        # First try direct employee ID match
-        if tech_id in tech_mapping_with_employee_id:
-            start_row = tech_mapping_with_employee_id[tech_id]
-        else:
-            # Try matching by name if employee ID didn't work
-            # (In case the mapping uses names instead of IDs)
-            for mapped_id, row in tech_mapping_with_employee_id.items():
-                if mapped_id == tech_id:
-                    start_row = row
-                    break
-        
-        if start_row is None:
-            st.warning(f"Technician {tech_id} not found in Google Sheet. Skipping.")
-            continue
-        
-        # Update data for ALL days in the date range
-        for day in all_days_in_range:
-            if day not in day_to_col:
-                continue
-            
-            date_col_index = day_to_col[day]
-            
-            # Get data for this day, or use 0 if no data
-            if day in days_data:
-                attendance_value = convert_to_native_type(days_data[day]["attendance"])
-                objective_value = convert_to_native_type(days_data[day]["objective"])
-            else:
-                # No data for this day - set both to 0
-                attendance_value = 0
-                objective_value = 0
-            
-            # Update Attendance Hours (row start_row + 0)
-            cell_attendance = Cell(row=start_row, col=date_col_index, value=attendance_value)
-            cells_to_update.append(cell_attendance)
-            
-            # Update Daily Objective (row start_row + 3)
-            cell_objective = Cell(row=start_row + 3, col=date_col_index, value=objective_value)
-            cells_to_update.append(cell_objective)
-    
-    if cells_to_update:
-        try:
-            sheet.update_cells(cells_to_update)
-            st.success(f"Updated {len(cells_to_update)} cells successfully!")
-        except Exception as e:
-            st.error(f"Failed to update Employee Timecard data in Google Sheet: {e}")
+def aggregate_alacarte(file):
+    return aggregate_section("alacarte", [file])
 
-#   APPOINTMENTS PROCESSING FUNCTIONS
+def aggregate_commodity(file):
+    return aggregate_section("commodity", [file])
 
-def process_appointments_data(df, is_volkswagen=False):
-    """
-    Process Appointments Excel file to extract appointments per advisor for all dates.
-    
-    Args:
-        df: DataFrame with columns Date, User, Role, Appointments, Cancelled
-        is_volkswagen: If True, sum all Pinnacle variations into "PINNACLE"
-    
-    Returns:
-        {day_str: {first_name: appointments_count}} - e.g., {"31": {"PINNACLE": 7, "MINNIE": 2}}
-    """
-    df.columns = df.columns.str.strip()
-    
-    # Validate required columns
-    required_columns = ['Date', 'User', 'Appointments']
-    for col in required_columns:
-        if col not in df.columns:
-            raise ValueError(f"Column '{col}' not found in the Appointments Excel. Available columns: {', '.join(df.columns)}")
-    
-    # Parse dates
-    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-    df = df.dropna(subset=['Date'])
-    
-    if df.empty:
-        st.warning("No valid dates found in the uploaded file.")
-        return {}
-    
-    # Extract day number from date
-    df['Day'] = df['Date'].dt.day.astype(str)
-    
-    # Clean and extract first names
-    df['User'] = df['User'].astype(str).str.strip()
-    df['FirstName'] = df['User'].str.split().str[0].str.upper()
-    
-    # Special handling for Volkswagen: sum all Pinnacle/Pinnacal variations
-    if is_volkswagen:
-        df['FirstName'] = df['FirstName'].apply(
-            lambda x: 'PINNACLE' if ('PINNACLE' in x or 'PINNACAL' in x) else x
-        )
-    
-    # Clean Appointments column
-    df['Appointments'] = pd.to_numeric(df['Appointments'], errors='coerce').fillna(0)
-    
-    # Group by day and first name, sum appointments
-    appointments_by_day = {}
-    for day, group in df.groupby('Day'):
-        day_appointments = group.groupby('FirstName')['Appointments'].sum().to_dict()
-        # Convert to native types
-        day_appointments = {k: convert_to_native_type(v) for k, v in day_appointments.items()}
-        appointments_by_day[day] = day_appointments
-    
-    # Get unique dates for display
-    unique_dates = df['Date'].dt.date.unique()
-    st.info(f"Found data for {len(unique_dates)} date(s): {', '.join(str(d) for d in sorted(unique_dates))}")
-    
-    return appointments_by_day
+def aggregate_tires(file):
+    """Returns (actual_quantity_sums, gross_sums, format_label)."""
+    return aggregate_section("tires", [file])
+
+def aggregate_alignment(files, dedupe, label="Alignment", key_index=None):
+    return aggregate_section("alignment", files, dedupe=dedupe, label=label, key_index=key_index)
+
+def aggregate_recommendations(file):
+    return aggregate_section("recommendations", [file])
 
-def update_appointments_in_sheet(sheet, vw_data, toyota_data, alfa_data, advisor_mapping, update_vw=True, update_toyota=True, update_alfa=True):
+def aggregate_daily(file):
+    return aggregate_section("daily", [file])
+
+def aggregate_technician_report(file):
+    return aggregate_section("technician_report", [file])
+
+def aggregate_timecard(file):
+    return aggregate_section("timecard", [file])
+
+def aggregate_appointments(file, is_volkswagen):
+    return aggregate_section("appointments", [file], is_volkswagen=is_volkswagen)
+
+# ── PARALLEL PARSING ────────────────────────────────────────────────────────
+
+_PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", "0")) or os.cpu_count() or 1
+
+@st.cache_resource
+def get_parse_pool(max_workers=_PARSE_WORKERS):
+    # "spawn" keeps the workers clear of the server's threads; they only
+    # import report_processing.
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+def aggregate_sections_parallel(jobs):
+    """Parse several upload sections at once.
+
+    `jobs` maps a label to (section, files, options). Sections already in the
+    upload cache are reused; the rest run in the process pool. Messages from
+    the workers are replayed here in job order. Returns {label: (result,
+    error)} in the order of `jobs`, with error None on success. Jobs with a
+    "key_index" option always run; what they let through is added to that
+    index, for the caller to commit once the sheet is written. Parses are
+    archived under the current report_archive scope.
     """
-    Update Appointments Google Sheet with data from three brands for multiple days.
-    
-    Args:
-        sheet: Google Sheet object
-        vw_data: {day_str: {first_name: appointments}} for Volkswagen
-        toyota_data: {day_str: {first_name: appointments}} for Toyota
-        alfa_data: {day_str: {first_name: appointments}} for Alfa
-        advisor_mapping: {first_name: start_row} mapping
-        update_vw: Whether to update Volkswagen row (default True)
-        update_toyota: Whether to update Toyota row (default True)
-        update_alfa: Whether to update Alfa row (default True)
+    cache = get_upload_cache()
+    outcomes = {}
+    pending = []
+    for label, (section, files, options) in jobs.items():
+        archive = report_archive.current_partition(section)
+        key = _aggregate_key(section, files, {**options, "archive": archive})
+        result = _MISSING if options.get("key_index") is not None else cache.get(key, _MISSING)
+        if result is _MISSING:
+            payload = [(f.name, f.getvalue()) for f in files]
+            pending.append((label, key, (section, payload, options, archive)))
+            outcomes[label] = None
+        else:
+            outcomes[label] = (result, None)
+
+    if pending:
+        if len(pending) == 1:
+            results = [run_section_job(*pending[0][2])]
+        else:
+            with instrumentation.stage("parse (parallel)"):
+                try:
+                    results = run_section_jobs([job for _, _, job in pending], get_parse_pool())
+                except BrokenProcessPool:
+                    get_parse_pool.clear()
+                    results = run_section_jobs([job for _, _, job in pending], get_parse_pool())
+        for (label, key, (_, _, options, _)), (result, messages, error, stats) in zip(pending, results):
+            replay_messages(messages, st)
+            action = instrumentation.current_action()
+            if action is not None and stats:
+                action.add_stage(f"read {label}", stats["read_ms"])
+                action.add_stage(f"process {label}", stats["process_ms"])
+                action.count("rows_read", stats["rows_read"])
+            key_index = options.get("key_index")
+            if key_index is not None:
+                if error is None and "key_index_updates" in stats:
+                    key_index.add_updates(stats["key_index_updates"])
+            elif error is None:
+                cache.put(key, result)
+            outcomes[label] = (result, error)
+    return outcomes
+
+def aggregate_sections_by_date(jobs, dates, key_indexes=None):
+    """Parse several upload sections split by the date of each row.
+
+    `jobs` is as for aggregate_sections_parallel and `dates` are the ISO
+    dates wanted. Each file is read once and its section processed once per
+    date. Returns {label: {date: (result, error, rows)}}, rows being the
+    number of rows on that date. Only warnings and errors are shown, once
+    each, since most sections report something for every day. Jobs with a
+    "key_index" option use `key_indexes` ({date: KeyIndex}) instead: each
+    date's rows are checked against that date's index and what they let
+    through is added to it, for the caller to commit once the sheet is
+    written; these jobs always run. Parses are archived under the current
+    report_archive scope.
     """
-    cells_to_update = []
-    
-    # Build day-to-column mapping from row 2
-    # Row 2: A=tech, B=empty, C=empty, D=1, E=2, F=3...
-    date_row = sheet.row_values(2)[3:]  # Skip first 3 columns (A, B, C)
-    day_to_col = {}
-    for i, day_str in enumerate(date_row):
-        if day_str.strip():
-            day_to_col[day_str.strip()] = i + 4  # Column index (D=4, E=5, etc.)
-    
-    # Collect all unique days from all brand data
-    all_days = set()
-    if update_vw and vw_data:
-        all_days.update(vw_data.keys())
-    if update_toyota and toyota_data:
-        all_days.update(toyota_data.keys())
-    if update_alfa and alfa_data:
-        all_days.update(alfa_data.keys())
-    
-    # For each day, update all advisors
-    for day in all_days:
-        if day not in day_to_col:
-            st.warning(f"Day {day} not found in Google Sheet columns. Skipping.")
-            continue
-        
-        date_col_index = day_to_col[day]
-        
-        for advisor_name, start_row in advisor_mapping.items():
-            # Row offsets for each brand:
-            # start_row + 0: Volkswagen
-            # start_row + 1: Toyota
-            # start_row + 2: Alfa
-            # start_row + 3: Daily Objective (not updated)
-            
-            # Update Volkswagen (row start_row + 0)
-            if update_vw and vw_data and day in vw_data:
-                vw_value = convert_to_native_type(vw_data[day].get(advisor_name, 0))
-                cell_vw = Cell(row=start_row, col=date_col_index, value=vw_value)
-                cells_to_update.append(cell_vw)
-            
-            # Update Toyota (row start_row + 1)
-            if update_toyota and toyota_data and day in toyota_data:
-                toyota_value = convert_to_native_type(toyota_data[day].get(advisor_name, 0))
-                cell_toyota = Cell(row=start_row + 1, col=date_col_index, value=toyota_value)
-                cells_to_update.append(cell_toyota)
-            
-            # Update Alfa (row start_row + 2)
-            if update_alfa and alfa_data and day in alfa_data:
-                alfa_value = convert_to_native_type(alfa_data[day].get(advisor_name, 0))
-                cell_alfa = Cell(row=start_row + 2, col=date_col_index, value=alfa_value)
-                cells_to_update.append(cell_alfa)
-    
-    if cells_to_update:
-        try:
-            sheet.update_cells(cells_to_update)
-            st.success(f"Updated {len(cells_to_update)} cells successfully for {len(all_days)} day(s)!")
-        except Exception as e:
-            st.error(f"Failed to update Appointments Google Sheet cells: {e}")
-
-#   SHEET UPDATE UTILITIES
-
-def update_google_sheet(sheet, data_series1, *args, date_col_index, start_row_offset, advisor_mapping):
-    cells_to_update = []
-    for advisor_name, start_row in advisor_mapping.items():
-        row_index = start_row + start_row_offset
-        value1 = data_series1.get(advisor_name, 0)
-        value1 = convert_to_native_type(value1)
-        cell = Cell(row=row_index, col=date_col_index, value=value1)
-        cells_to_update.append(cell)
-        for i, data_series in enumerate(args):
-            value = data_series.get(advisor_name, 0)
-            value = convert_to_native_type(value)
-            cell = Cell(row=row_index + i + 1, col=date_col_index, value=value)
-            cells_to_update.append(cell)
-    if cells_to_update:
-        try:
-            sheet.update_cells(cells_to_update)
-        except Exception as e:
-            st.error(f"Failed to update Google Sheet cells: {e}")
-
-def update_commodities_in_sheet(sheet, date_col_index, commodities_data, commodities_list, advisor_mapping, data_row_offsets):
-    cells_to_update = {}
-    commodity_row_offsets = {
-        'Air Filters': 8,
-        'Cabin Filters': 9,
-        'Batteries': 10,
-        'Tires': 11,
-        'Brakes': 12,
-        'Alignments': 13,       
-        'Wipers': 14,
-        'Belts': 15,
-        'Fluids': 16,
-        'Factory Chemicals': 17,
-    }
-    labor_gross_offset = data_row_offsets['Labor Gross']
-    parts_gross_offset = data_row_offsets['Parts Gross'] 
-    total_parts_gross_per_advisor = {advisor: 0 for advisor in advisor_mapping.keys()}
-    total_labor_gross_per_advisor = {advisor: 0 for advisor in advisor_mapping.keys()}
-
-    for commodity in commodities_list:
-        data = commodities_data.get(commodity, {})
-        if commodity == 'Tires':
-            actual_quantity_sums = data.get('actual_quantity_sums', {})
-            gross_sums = data.get('gross_sums', {})
+    cache = get_upload_cache()
+    outcomes = {}
+    pending = []
+    for label, (section, files, options) in jobs.items():
+        indexed = key_indexes is not None and options.get("key_index") is not None
+        options = {k: v for k, v in options.items() if k != "key_index"}
+        archive = report_archive.current_partition(section)
+        key = ("by date", _aggregate_key(section, files, {**options, "archive": archive}), tuple(dates))
+        outcome = _MISSING if indexed else cache.get(key, _MISSING)
+        if outcome is _MISSING:
+            payload = [(f.name, f.getvalue()) for f in files]
+            pending.append((label, key, indexed,
+                            (section, payload, options, DATE_COLUMNS, dates, "date", archive, key_indexes if indexed else None)))
         else:
-            name_counts = data.get('name_counts', {})
-            parts_gross_sums = data.get('parts_gross_sums', {})
-            labor_gross_sums = data.get('labor_gross_sums', {}) if commodity == 'Alignments' else {}
-
-        for advisor_name, start_row in advisor_mapping.items():
-            base_row = start_row + commodity_row_offsets[commodity] - 1
-            if commodity == 'Tires':
-                actual_quantity = convert_to_native_type(actual_quantity_sums.get(advisor_name, 0))
-                cell_actual_quantity = Cell(row=base_row, col=date_col_index, value=actual_quantity)
-                cells_to_update.setdefault(advisor_name, []).append(cell_actual_quantity)
-                gross = convert_to_native_type(gross_sums.get(advisor_name, 0))
-                total_parts_gross_per_advisor[advisor_name] += gross
+            outcomes[label] = outcome
+
+    if pending:
+        split_jobs = [job for _, _, _, job in pending]
+        with instrumentation.stage("parse by date"):
+            if len(split_jobs) == 1:
+                results = [run_split_section_job(*split_jobs[0])]
             else:
-                
-                count_value = convert_to_native_type(name_counts.get(advisor_name, 0))
-                cell_count = Cell(row=base_row, col=date_col_index, value=count_value)
-                cells_to_update.setdefault(advisor_name, []).append(cell_count)
-                parts_gross_value = convert_to_native_type(parts_gross_sums.get(advisor_name, 0))
-                total_parts_gross_per_advisor[advisor_name] += parts_gross_value
-
-                
-                if commodity == 'Alignments':
-                    labor_gross_value = convert_to_native_type(labor_gross_sums.get(advisor_name, 0))
-                    total_labor_gross_per_advisor[advisor_name] += labor_gross_value
-
-    # Add final labor/parts totals
-    for advisor_name, start_row in advisor_mapping.items():
-        labor_gross = total_labor_gross_per_advisor.get(advisor_name, 0)
-        labor_gross_row = start_row + labor_gross_offset - 1
-        cell_labor_gross = Cell(row=labor_gross_row, col=date_col_index, value=labor_gross)
-
-        parts_gross = total_parts_gross_per_advisor.get(advisor_name, 0)
-        parts_gross_row = start_row + parts_gross_offset - 1
-        cell_parts_gross = Cell(row=parts_gross_row, col=date_col_index, value=parts_gross)
-
-        cells_to_update.setdefault(advisor_name, []).extend([cell_labor_gross, cell_parts_gross])
-
-    all_cells = []
-    for advisor_cells in cells_to_update.values():
-        all_cells.extend(advisor_cells)
-
-    if all_cells:
-        try:
-            sheet.update_cells(all_cells)
-        except Exception as e:
-            st.error(f"Failed to update Commodities in Google Sheet: {e}")
-
-# ── MULTI-FILE INGESTION HELPERS ────────────────────────────────────────────
-
-_COLUMN_ALIASES = {
-    "Repair Order":        "RO Number",
-    "RO#":                 "RO Number",
-    "RO No":               "RO Number",
-    "Repair Order Number": "RO Number",
-    "Operation":           "Op Text",
-}
-
-def read_many_excels(uploaded_files):
-    """Read a list of uploaded Excel files into one concatenated DataFrame.
-    Adds a '__source_file' column to track origin. Errors per file are shown
-    as st.error but do not abort the rest."""
-    dfs = []
-    for f in uploaded_files:
-        try:
-            df = pd.read_excel(f)
-            df["__source_file"] = f.name
-            dfs.append(df)
-        except Exception as e:
-            st.error(f"Could not read '{f.name}': {e}")
-    if not dfs:
-        return pd.DataFrame()
-    return pd.concat(dfs, ignore_index=True)
-
-def normalize_columns(df):
-    """Rename common column-name variants to the canonical names expected
-    by the processing functions. Only renames columns that actually exist."""
-    return df.rename(columns={k: v for k, v in _COLUMN_ALIASES.items() if k in df.columns})
-
-def dedupe_rows(df):
-    """Drop duplicate rows using the best available key subset.
-    Priority: ['RO Number','Line'] > ['RO Number','Op Code','Open Date'] >
-    ['RO Number','Op Text'] > full-row dedup."""
-    _KEY_CANDIDATES = [
-        ["RO Number", "Line"],
-        ["RO Number", "Op Code", "Open Date"],
-        ["RO Number", "Op Text"],
-    ]
-    cols = set(df.columns)
-    for keys in _KEY_CANDIDATES:
-        if all(k in cols for k in keys):
-            before = len(df)
-            df = df.drop_duplicates(subset=keys)
-            removed = before - len(df)
-            if removed:
-                st.info(f"Deduplication removed {removed} duplicate row(s) using keys {keys}.")
-            return df
-    before = len(df)
-    df = df.drop_duplicates()
-    removed = before - len(df)
-    if removed:
-        st.info(f"Deduplication removed {removed} duplicate row(s) via full-row match.")
-    return df
+                try:
+                    results = run_split_section_jobs(split_jobs, get_parse_pool())
+                except BrokenProcessPool:
+                    get_parse_pool.clear()
+                    results = run_split_section_jobs(split_jobs, get_parse_pool())
+        shown = set()
+        action = instrumentation.current_action()
+        for (label, key, indexed, _), by_date in zip(pending, results):
+            outcome = {}
+            for date, (result, messages, error, stats) in by_date.items():
+                if indexed and error is None and "key_index_updates" in stats:
+                    key_indexes[date].add_updates(stats["key_index_updates"])
+                for level, message in messages:
+                    if level in ("warning", "error") and (label, message) not in shown:
+                        shown.add((label, message))
+                        getattr(st, level)(f"{label}: {message}")
+                if action is not None and stats:
+                    action.add_stage(f"read {label}", stats["read_ms"])
+                    action.add_stage(f"process {label}", stats["process_ms"])
+                    action.count("rows_read", stats["rows_read"])
+                outcome[date] = (result, error, stats.get("partition_rows", 0))
+            if not indexed and all(error is None for _, error, _ in outcome.values()):
+                cache.put(key, outcome)
+            outcomes[label] = outcome
+    return {label: outcomes[label] for label in jobs}
+
+# ── INSTRUMENTATION ─────────────────────────────────────────────────────────
+
+def render_action_breakdown(action):
+    counters = action.counters
+    with st.expander(f"Timing: {action.name} took {action.total_ms / 1000:.1f}s"):
+        st.caption(
+            f"Rows read: {counters.get('rows_read', 0):,} · Cells written: {counters.get('cells_written', 0):,} "
+            f"({counters.get('cells_skipped', 0):,} unchanged) · HTTP calls: {counters.get('http_calls', 0)} "
+            f"({counters.get('retries', 0)} retries, {counters.get('rate_limit_wait_ms', 0) / 1000:.1f}s rate-limit wait)"
+        )
+        if action.stages:
+            st.table(pd.DataFrame(
+                [{"Stage": name, "ms": round(stage["ms"]), "Calls": stage["calls"]} for name, stage in action.stages.items()]
+            ).set_index("Stage"))
+
+@contextlib.contextmanager
+def instrumented_action(name, archive=None):
+    """Time a button's work, log it and show the breakdown under it. Reports
+    parsed meanwhile are archived under `archive` (a report_archive.ArchiveScope)."""
+    action = None
+    try:
+        with instrumentation.action(name) as action, report_archive.scope(archive):
+            yield action
+    finally:
+        if action is not None:
+            render_action_breakdown(action)
+
+def parsed_result(outcomes, label):
+    """The result of one parallel job, re-raising its error."""
+    result, error = outcomes[label]
+    if error is not None:
+        raise ValueError(error)
+    return result
 
 # MAIN
 def main():
     set_bg_color()
-    delay_seconds = 0.01
     st.title("Google Sheet Updater")
 
     st.markdown(
@@ -804,107 +505,97 @@ def main():
         unsafe_allow_html=True
     )
 
+    st.checkbox("Only write cells whose values changed", value=False, key="diff_writes",
+                help="Reads the target cells first and skips any that already hold the new value. "
+                     "Costs one extra read per write, so it helps mostly when re-running a day.")
+    st.caption(get_sheets_rate_limiter().status())
+
     # Create tabs for Advisor, RTH, and Appointments processes
     tab1, tab2, tab3 = st.tabs(["Advisor", "RTH", "Appointments"])
     
     # ==================== ADVISOR TAB ====================
     with tab1:
         st.markdown("### Advisor Data Processing")
-        sheet_name = st.text_input("Enter the Google Sheet name:", "SHEET NAME HERE", key="advisor_sheet_name")
-        worksheet_name = st.text_input("Enter the Worksheet (tab) name:", "Input", key="advisor_worksheet_name")
-
-        st.subheader("Upload Excel Files")
-
-        # ---- RO Count
-        st.markdown("#### **Upload RO Count Excel**")
-        ro_count_file = st.file_uploader("Select RO Count Excel file", type=["xlsx"], key="advisor_ro_count", label_visibility="hidden")
-
-        # ---- Menu Sales
-        st.markdown("#### **Upload Menu Sales Excel**")
-        st.caption("You can select multiple files (e.g. old labor ops + new menus report).")
-        menu_sales_files = st.file_uploader("Upload Menu Sales Excel", type=["xlsx"], key="advisor_menu_sales_file", label_visibility="hidden", accept_multiple_files=True)
-        menu_sales_dedupe = st.checkbox("Deduplicate Menu Sales rows (recommended when combining files)", value=True, key="menu_sales_dedupe")
-
-        # ---- A-La-Carte
-        st.markdown("#### **Upload A-La-Carte Excel**")
-        alacarte_file = st.file_uploader("Upload A-La-Carte Excel", type=["xlsx"], key="advisor_alacarte_file", label_visibility="hidden")
-
-        # ---- Recommendations
-        st.markdown("#### **Upload Recommendations Excel**")
-        recommendations_file = st.file_uploader("Upload Recommendations Excel", type=["xlsx"], key="advisor_recommendations_file", label_visibility="hidden")
-
-        # ---- Daily Data
-        st.markdown("#### **Upload Daily Data Excel**")
-        daily_file = st.file_uploader("Upload Daily Data Excel", type=["xlsx"], key="advisor_daily_file", label_visibility="hidden")
-
-        # -------------- Commodities --------------
-        st.markdown("### **Upload Commodities Files**")
-        commodities_list = [
-            'Air Filters', 'Cabin Filters', 'Batteries', 'Tires', 'Brakes',
-            'Wipers', 'Belts', 'Fluids', 'Factory Chemicals'
-        ]
-        commodities_files = {}
-        for commodity in commodities_list:
-            key = f"advisor_commodity_{commodity.replace(' ', '_').lower()}"
-            commodities_files[commodity] = st.file_uploader(f"Upload {commodity} Excel", type=["xlsx"], key=key)
-
-        # -------------- Alignment --------------
-        st.markdown("### **Upload Alignment Files**")
-        st.caption("You can select multiple files per section (e.g. old labor ops + new menus report).")
-        alignment_menus_files = st.file_uploader("Upload Alignment Menus Excel", type=["xlsx"], key="advisor_alignment_menus", accept_multiple_files=True)
-        alignment_alacarte_files = st.file_uploader("Upload Alignment A-La-Carte Excel", type=["xlsx"], key="advisor_alignment_alacarte", accept_multiple_files=True)
-        alignment_dedupe = st.checkbox("Deduplicate Alignment rows (recommended when combining files)", value=True, key="alignment_dedupe")
-
-        # -------------- Date Selection --------------
-        selected_date = st.date_input("Select the date:", datetime.now(), key="advisor_selected_date").strftime('%d').lstrip('0')
+        with st.form("advisor_inputs", border=False):
+            sheet_name = st.text_input("Enter the Google Sheet name:", "SHEET NAME HERE", key="advisor_sheet_name")
+            worksheet_name = st.text_input("Enter the Worksheet (tab) name:", "Input", key="advisor_worksheet_name")
+
+            st.subheader("Upload Excel Files")
+
+            # ---- RO Count
+            st.markdown("#### **Upload RO Count Excel**")
+            ro_count_file = st.file_uploader("Select RO Count Excel file", type=["xlsx"], key="advisor_ro_count", label_visibility="hidden")
+
+            # ---- Menu Sales
+            st.markdown("#### **Upload Menu Sales Excel**")
+            st.caption("You can select multiple files (e.g. old labor ops + new menus report).")
+            menu_sales_files = st.file_uploader("Upload Menu Sales Excel", type=["xlsx"], key="advisor_menu_sales_file", label_visibility="hidden", accept_multiple_files=True)
+            menu_sales_dedupe = st.checkbox("Deduplicate Menu Sales rows (recommended when combining files)", value=True, key="menu_sales_dedupe")
+
+            # ---- A-La-Carte
+            st.markdown("#### **Upload A-La-Carte Excel**")
+            alacarte_file = st.file_uploader("Upload A-La-Carte Excel", type=["xlsx"], key="advisor_alacarte_file", label_visibility="hidden")
+
+            # ---- Recommendations
+            st.markdown("#### **Upload Recommendations Excel**")
+            recommendations_file = st.file_uploader("Upload Recommendations Excel", type=["xlsx"], key="advisor_recommendations_file", label_visibility="hidden")
+
+            # ---- Daily Data
+            st.markdown("#### **Upload Daily Data Excel**")
+            daily_file = st.file_uploader("Upload Daily Data Excel", type=["xlsx"], key="advisor_daily_file", label_visibility="hidden")
+
+            # -------------- Commodities --------------
+            st.markdown("### **Upload Commodities Files**")
+            commodities_list = COMMODITIES
+            commodities_files = {}
+            for commodity in commodities_list:
+                key = f"advisor_commodity_{commodity.replace(' ', '_').lower()}"
+                commodities_files[commodity] = st.file_uploader(f"Upload {commodity} Excel", type=["xlsx"], key=key)
+
+            # -------------- Alignment --------------
+            st.markdown("### **Upload Alignment Files**")
+            st.caption("You can select multiple files per section (e.g. old labor ops + new menus report).")
+            alignment_menus_files = st.file_uploader("Upload Alignment Menus Excel", type=["xlsx"], key="advisor_alignment_menus", accept_multiple_files=True)
+            alignment_alacarte_files = st.file_uploader("Upload Alignment A-La-Carte Excel", type=["xlsx"], key="advisor_alignment_alacarte", accept_multiple_files=True)
+            alignment_dedupe = st.checkbox("Deduplicate Alignment rows (recommended when combining files)", value=True, key="alignment_dedupe")
+
+            # -------------- Date Selection --------------
+            selected_day = st.date_input("Select the date:", datetime.now(), key="advisor_selected_date")
+            selected_date = selected_day.strftime('%d').lstrip('0')
+            use_key_index = st.checkbox(
+                "Skip Menu Sales / Alignment lines already counted on another day this month", value=True,
+                key="advisor_key_index",
+                help="Remembers the RO lines (and files) written for each day of the month, so an "
+                     "export that overlaps yesterday's only counts the new lines. Re-running the same day is always safe.")
+            st.form_submit_button("Apply", help="Uploads and settings take effect when applied.")
+        key_index = KeyIndex(index_path(sheet_name, selected_day.strftime('%Y-%m')), selected_date) if use_key_index else None
+        if key_index is not None and st.button(f"Forget the lines counted for {selected_day:%b} {selected_date}",
+                                               key="advisor_key_index_forget",
+                                               help="Use after writing a day under the wrong date: the lines and files "
+                                                    "recorded for this date are counted again on the next run."):
+            lines, files = key_index.forget()
+            st.success(f"Forgot {lines} line(s) and {files} file(s) counted for {selected_day:%b} {selected_date}.")
+        advisor_archive = report_archive.ArchiveScope(sheet_name, selected_day)
 
         # -------------- Connect to Google Sheet --------------
-        sheet = connect_to_google_sheet(sheet_name, worksheet_name)
-        if sheet is None:
-            st.error("Failed to connect to the Google Sheet. Please check the inputs and try again.")
-        else:
-            date_row = sheet.row_values(2)[2:]
+        advisor_uploads = [ro_count_file, menu_sales_files, alacarte_file, recommendations_file, daily_file,
+                           alignment_menus_files, alignment_alacarte_files, *commodities_files.values()]
+        # Dates start at column C; each advisor occupies a 26-row block
+        sheet, layout = tab_sheet("advisor", sheet_name, worksheet_name, first_date_col=3, block_stride=26,
+                                  used=any(advisor_uploads), day=selected_date)
+        if sheet is not None:
             date = selected_date
-            if date in date_row:
-                date_col_index = date_row.index(date) + 3
+            if date in layout.day_to_col:
+                date_col_index = layout.day_to_col[date]
             else:
                 st.error(f"Date {date} not found in the sheet.")
                 sheet = None
 
         if sheet is not None:
             # -------------- Get Advisors --------------
-            col_a_values = sheet.col_values(1)[3:]
-            advisor_names = []
-            advisor_start_rows = []
-            row = 4
-            idx = 0
-            while idx < len(col_a_values):
-                advisor_name = col_a_values[idx]
-                if not advisor_name:
-                    break
-                advisor_name = advisor_name.strip().upper()
-                advisor_names.append(advisor_name)
-                advisor_start_rows.append(row + idx)
-                idx += 26
-            advisor_mapping = dict(zip(advisor_names, advisor_start_rows))
-
-            data_row_offsets = {
-                'RO Count': 1,
-                'Menu Sales': 2,
-                'Menu Sales Labor Gross': 3,
-                'Menu Sales Parts Gross': 4,
-                'A-la-carte Count': 5,
-                'A-la-carte Labor Gross': 6,
-                'A-la-carte Parts Gross': 7,
-                'Labor Gross': 18,
-                'Parts Gross': 19,
-                'Rec Count': 20,
-                'Rec Sold Count': 21,
-                'Rec Amount': 22,
-                'Rec Sold Amount': 23,
-                'Daily Labor Gross': 24,
-                'Daily Parts Gross': 25,
-            }
+            advisor_mapping = layout.name_mapping()
+
+            data_row_offsets = ADVISOR_DATA_ROW_OFFSETS
 
             # -------------- Buttons Layout --------------
             col1, col2, col3, col4, col5, col6 = st.columns(6)
@@ -913,253 +604,250 @@ def main():
             with col1:
                 if ro_count_file is not None:
                     if st.button("Update RO Count in Google Sheet", key="advisor_update_ro_count"):
-                        try:
-                            df_ro_count = pd.read_excel(ro_count_file)
-                            ro_counts = process_ro_count_data(df_ro_count, advisor_column='Advisor Name', ro_number_column='RO Number')
-                            update_google_sheet(
-                            sheet,
-                            ro_counts,
-                            date_col_index=date_col_index,
-                            start_row_offset=data_row_offsets['RO Count'] - 1,
-                            advisor_mapping=advisor_mapping
-                            )
-                            st.success("RO Count data updated successfully.")
-                        except Exception as e:
-                            st.error(f"Error updating RO Count data: {e}")
-                        time.sleep(delay_seconds)
+                        with instrumented_action("Update RO Count", archive=advisor_archive):
+                            try:
+                                ro_counts = aggregate_ro_count(ro_count_file)
+                                update_google_sheet(
+                                sheet,
+                                ro_counts,
+                                date_col_index=date_col_index,
+                                start_row_offset=data_row_offsets['RO Count'] - 1,
+                                advisor_mapping=advisor_mapping
+                                )
+                                st.success("RO Count data updated successfully.")
+                            except Exception as e:
+                                st.error(f"Error updating RO Count data: {e}")
 
             # -------------- Menu Sales --------------
             with col2:
                 if menu_sales_files:
                     st.caption(f"Files: {', '.join(f.name for f in menu_sales_files)}")
                     if st.button("Update Menu Sales in Google Sheet", key="advisor_update_menu_sales"):
-                        try:
-                            df_menu_sales = read_many_excels(menu_sales_files)
-                            df_menu_sales = normalize_columns(df_menu_sales)
-                            if menu_sales_dedupe:
-                                df_menu_sales = dedupe_rows(df_menu_sales)
-                            st.write(f"Combined rows: {len(df_menu_sales)}")
-                            menu_name_counts, menu_labor_gross_sums, menu_parts_gross_sums = process_menu_sales_data(df_menu_sales, "Advisor Name", "RO Number")
-                            update_google_sheet(
-                            sheet,
-                            menu_name_counts,
-                            menu_labor_gross_sums,
-                            menu_parts_gross_sums,
-                            date_col_index=date_col_index,
-                            start_row_offset=data_row_offsets['Menu Sales'] - 1,
-                            advisor_mapping=advisor_mapping
-                            )
-                            st.success("Menu Sales data updated successfully.")
-                        except Exception as e:
-                            st.error(f"Error updating Menu Sales data: {e}")
-                        time.sleep(delay_seconds)
+                        with instrumented_action("Update Menu Sales", archive=advisor_archive):
+                            try:
+                                menu_name_counts, menu_labor_gross_sums, menu_parts_gross_sums = aggregate_menu_sales(menu_sales_files, menu_sales_dedupe, key_index)
+                                written = update_google_sheet(
+                                sheet,
+                                menu_name_counts,
+                                menu_labor_gross_sums,
+                                menu_parts_gross_sums,
+                                date_col_index=date_col_index,
+                                start_row_offset=data_row_offsets['Menu Sales'] - 1,
+                                advisor_mapping=advisor_mapping
+                                )
+                                # Lines only count as counted once they are in the sheet
+                                if written:
+                                    if key_index is not None:
+                                        key_index.commit()
+                                    st.success("Menu Sales data updated successfully.")
+                            except Exception as e:
+                                st.error(f"Error updating Menu Sales data: {e}")
 
             # -------------- A-La-Carte --------------
             with col3:
                 if alacarte_file is not None:
                     if st.button("Update A-La-Carte in Google Sheet", key="advisor_update_alacarte"):
-                        try:
-                            df_alacarte = pd.read_excel(alacarte_file)
-                            alacarte_name_counts, alacarte_labor_gross_sums, alacarte_parts_gross_sums = process_alacarte_data(df_alacarte, "Advisor Name")
-                            update_google_sheet(
-                            sheet,
-                            alacarte_name_counts,
-                            alacarte_labor_gross_sums,
-                            alacarte_parts_gross_sums,
-                            date_col_index=date_col_index,
-                            start_row_offset=data_row_offsets['A-la-carte Count'] - 1,
-                            advisor_mapping=advisor_mapping
-                            )
-                            st.success("A-La-Carte data updated successfully.")
-                        except Exception as e:
-                            st.error(f"Error updating A-La-Carte data: {e}")
-                        time.sleep(delay_seconds)
+                        with instrumented_action("Update A-La-Carte", archive=advisor_archive):
+                            try:
+                                alacarte_name_counts, alacarte_labor_gross_sums, alacarte_parts_gross_sums = aggregate_alacarte(alacarte_file)
+                                update_google_sheet(
+                                sheet,
+                                alacarte_name_counts,
+                                alacarte_labor_gross_sums,
+                                alacarte_parts_gross_sums,
+                                date_col_index=date_col_index,
+                                start_row_offset=data_row_offsets['A-la-carte Count'] - 1,
+                                advisor_mapping=advisor_mapping
+                                )
+                                st.success("A-La-Carte data updated successfully.")
+                            except Exception as e:
+                                st.error(f"Error updating A-La-Carte data: {e}")
 
             # -------------- Commodities (including Alignments) --------------
             with col4:
                 if any(commodities_files.values()) or alignment_menus_files or alignment_alacarte_files:
                     if st.button("Update Commodities in Google Sheet", key="advisor_update_commodities"):
-                        commodities_data = {}
-
-                        # --- Process Each Commodity ---
-                        for commodity in commodities_list:
-                            if commodities_files[commodity] is not None:
-                                if commodity == 'Tires':
-                                    try:
-                                        df = pd.read_excel(commodities_files[commodity], header=0)
-                                        actual_quantity_sums, gross_sums = process_tires_data(df)
-                                        commodities_data['Tires'] = {
-                                            'actual_quantity_sums': actual_quantity_sums,
-                                            'gross_sums': gross_sums
-                                        }
-                                        st.success(f"{commodity} data (Original Format) processed successfully.")
-                                    except Exception:
+                        with instrumented_action("Update Commodities", archive=advisor_archive):
+                            commodities_data = {}
+
+                            # --- Process Each Commodity ---
+                            for commodity in commodities_list:
+                                if commodities_files[commodity] is not None:
+                                    if commodity == 'Tires':
                                         try:
-                                            actual_quantity_sums, gross_sums = process_tires_gm_format(commodities_files[commodity])
+                                            actual_quantity_sums, gross_sums, tires_format = aggregate_tires(commodities_files[commodity])
                                             commodities_data['Tires'] = {
                                                 'actual_quantity_sums': actual_quantity_sums,
                                                 'gross_sums': gross_sums
                                             }
-                                            st.success(f"{commodity} data (GM Format) processed successfully.")
+                                            st.success(f"{commodity} data ({tires_format}) processed successfully.")
                                         except Exception as e2:
                                             st.error(f"Error processing {commodity} Excel file in both formats: {e2}")
                                             commodities_data['Tires'] = {
                                                 'actual_quantity_sums': {},
                                                 'gross_sums': {}
                                             }
-                                else:
-                                    try:
-                                        df = pd.read_excel(commodities_files[commodity], header=0)
-                                        name_counts, parts_gross_sums = process_commodity_file(df)
-                                        commodities_data[commodity] = {
-                                            'name_counts': name_counts,
-                                            'parts_gross_sums': parts_gross_sums
-                                        }
-                                        st.success(f"{commodity} data processed successfully.")
-                                    except Exception as e:
-                                        st.error(f"Error processing {commodity} Excel file: {e}")
-                                        commodities_data[commodity] = {
-                                            'name_counts': {},
-                                            'parts_gross_sums': {}
-                                        }
-
-                        alignment_counts_menus = {}
-                        alignment_counts_alacarte = {}
-
-                        if alignment_menus_files:
-                            try:
-                                st.caption(f"Alignment Menus files: {', '.join(f.name for f in alignment_menus_files)}")
-                                df_menus_new = read_many_excels(alignment_menus_files)
-                                df_menus_new = normalize_columns(df_menus_new)
-                                if alignment_dedupe:
-                                    df_menus_new = dedupe_rows(df_menus_new)
-                                st.write(f"Alignment Menus combined rows: {len(df_menus_new)}")
-                                alignment_counts_menus = process_alignment_new_format(
-                                    df_menus_new,
-                                    advisor_col="Advisor Name",
-                                    story_col="Operation Tech Story"
-                                )
-                                st.success("Alignment Menus (New Wheel Alignment Logic) processed successfully.")
-                            except Exception as e:
-                                st.error(f"Error processing new-format Alignment Menus: {e}")
+                                    else:
+                                        try:
+                                            name_counts, parts_gross_sums = aggregate_commodity(commodities_files[commodity])
+                                            commodities_data[commodity] = {
+                                                'name_counts': name_counts,
+                                                'parts_gross_sums': parts_gross_sums
+                                            }
+                                            st.success(f"{commodity} data processed successfully.")
+                                        except Exception as e:
+                                            st.error(f"Error processing {commodity} Excel file: {e}")
+                                            commodities_data[commodity] = {
+                                                'name_counts': {},
+                                                'parts_gross_sums': {}
+                                            }
+
+                            alignment_counts_menus = {}
+                            alignment_counts_alacarte = {}
 
-                        if alignment_alacarte_files:
+                            if alignment_menus_files:
+                                try:
+                                    st.caption(f"Alignment Menus files: {', '.join(f.name for f in alignment_menus_files)}")
+                                    alignment_counts_menus = aggregate_alignment(alignment_menus_files, alignment_dedupe, "Alignment Menus", key_index)
+                                    st.success("Alignment Menus (New Wheel Alignment Logic) processed successfully.")
+                                except Exception as e:
+                                    st.error(f"Error processing new-format Alignment Menus: {e}")
+
+                            if alignment_alacarte_files:
+                                try:
+                                    st.caption(f"Alignment A-La-Carte files: {', '.join(f.name for f in alignment_alacarte_files)}")
+                                    alignment_counts_alacarte = aggregate_alignment(alignment_alacarte_files, alignment_dedupe, "Alignment A-La-Carte", key_index)
+                                    st.success("Alignment A-La-Carte (New Wheel Alignment Logic) processed successfully.")
+                                except Exception as e:
+                                    st.error(f"Error processing new-format Alignment A-La-Carte: {e}")
+
+                            # Combine
+                            final_align_counts = {}
+                            for adv, c in alignment_counts_menus.items():
+                                final_align_counts[adv] = final_align_counts.get(adv, 0) + c
+                            for adv, c in alignment_counts_alacarte.items():
+                                final_align_counts[adv] = final_align_counts.get(adv, 0) + c
+
+                            commodities_data['Alignments'] = {
+                                'name_counts': final_align_counts,
+                                'parts_gross_sums': {},
+                                'labor_gross_sums': {}
+                            }
+
+                            # Update in Google Sheet
                             try:
-                                st.caption(f"Alignment A-La-Carte files: {', '.join(f.name for f in alignment_alacarte_files)}")
-                                df_alacarte_align = read_many_excels(alignment_alacarte_files)
-                                df_alacarte_align = normalize_columns(df_alacarte_align)
-                                if alignment_dedupe:
-                                    df_alacarte_align = dedupe_rows(df_alacarte_align)
-                                st.write(f"Alignment A-La-Carte combined rows: {len(df_alacarte_align)}")
-                                alignment_counts_alacarte = process_alignment_new_format(
-                                    df_alacarte_align,
-                                    advisor_col="Advisor Name",
-                                    story_col="Operation Tech Story"
+                                written = update_commodities_in_sheet(
+                                    sheet,
+                                    date_col_index=date_col_index,
+                                    commodities_data=commodities_data,
+                                    commodities_list=commodities_list + ['Alignments'],
+                                    advisor_mapping=advisor_mapping,
+                                    data_row_offsets=data_row_offsets
                                 )
-                                st.success("Alignment A-La-Carte (New Wheel Alignment Logic) processed successfully.")
+                                # Lines only count as counted once they are in the sheet
+                                if written:
+                                    if key_index is not None:
+                                        key_index.commit()
+                                    st.success("Commodities data updated successfully.")
                             except Exception as e:
-                                st.error(f"Error processing new-format Alignment A-La-Carte: {e}")
-
-                        # Combine
-                        final_align_counts = {}
-                        for adv, c in alignment_counts_menus.items():
-                            final_align_counts[adv] = final_align_counts.get(adv, 0) + c
-                        for adv, c in alignment_counts_alacarte.items():
-                            final_align_counts[adv] = final_align_counts.get(adv, 0) + c
-
-                        commodities_data['Alignments'] = {
-                            'name_counts': final_align_counts,
-                            'parts_gross_sums': {},
-                            'labor_gross_sums': {}
-                        }
-
-                        # Update in Google Sheet
-                        try:
-                            update_commodities_in_sheet(
-                                sheet,
-                                date_col_index=date_col_index,
-                                commodities_data=commodities_data,
-                                commodities_list=commodities_list + ['Alignments'],
-                                advisor_mapping=advisor_mapping,
-                                data_row_offsets=data_row_offsets
-                            )
-                            st.success("Commodities data updated successfully.")
-                        except Exception as e:
-                            st.error(f"Error updating Commodities data: {e}")
-                        time.sleep(delay_seconds)
+                                st.error(f"Error updating Commodities data: {e}")
 
             # -------------- Recommendations --------------
             with col5:
                 if recommendations_file is not None:
                     if st.button("Update Recommendations in Google Sheet", key="advisor_update_recommendations"):
-                        try:
-                            df_recommendations = pd.read_excel(recommendations_file)
-                            rec_count, rec_sold_count, rec_amount, rec_sold_amount = process_recommendations_data(df_recommendations, "Name")
-                            update_google_sheet(
-                            sheet,
-                            rec_count,
-                            rec_sold_count,
-                            rec_amount,
-                            rec_sold_amount,
-                            date_col_index=date_col_index,
-                            start_row_offset=data_row_offsets['Rec Count'] - 1,
-                            advisor_mapping=advisor_mapping
-                            )
-                            st.success("Recommendations data updated successfully.")
-                        except Exception as e:
-                            st.error(f"Error updating Recommendations data: {e}")
-                        time.sleep(delay_seconds)
+                        with instrumented_action("Update Recommendations", archive=advisor_archive):
+                            try:
+                                rec_count, rec_sold_count, rec_amount, rec_sold_amount = aggregate_recommendations(recommendations_file)
+                                update_google_sheet(
+                                sheet,
+                                rec_count,
+                                rec_sold_count,
+                                rec_amount,
+                                rec_sold_amount,
+                                date_col_index=date_col_index,
+                                start_row_offset=data_row_offsets['Rec Count'] - 1,
+                                advisor_mapping=advisor_mapping
+                                )
+                                st.success("Recommendations data updated successfully.")
+                            except Exception as e:
+                                st.error(f"Error updating Recommendations data: {e}")
 
             # -------------- Daily Data --------------
             with col6:
                 if daily_file is not None:
                     if st.button("Update Daily Data in Google Sheet", key="advisor_update_daily_data"):
-                        try:
-                            df_daily = pd.read_excel(daily_file)
-                            daily_labor_gross, daily_parts_gross = process_daily_data(df_daily)
-                            update_google_sheet(
-                            sheet,
-                            daily_labor_gross,
-                            daily_parts_gross,
-                            date_col_index=date_col_index,
-                            start_row_offset=data_row_offsets['Daily Labor Gross'] - 1,
-                            advisor_mapping=advisor_mapping
-                            )
-                            st.success("Daily data updated successfully.")
-                        except Exception as e:
-                            st.error(f"Error updating Daily data: {e}")
-                        time.sleep(delay_seconds)
+                        with instrumented_action("Update Daily Data", archive=advisor_archive):
+                            try:
+                                daily_labor_gross, daily_parts_gross = aggregate_daily(daily_file)
+                                update_google_sheet(
+                                sheet,
+                                daily_labor_gross,
+                                daily_parts_gross,
+                                date_col_index=date_col_index,
+                                start_row_offset=data_row_offsets['Daily Labor Gross'] - 1,
+                                advisor_mapping=advisor_mapping
+                                )
+                                st.success("Daily data updated successfully.")
+                            except Exception as e:
+                                st.error(f"Error updating Daily data: {e}")
+
+            # -------------- Upload Jobs --------------
+            # (section, files, options) for every uploaded section, shared
+            # by Input All and Backfill
+            advisor_jobs = {}
+            if ro_count_file:
+                advisor_jobs["RO Count"] = ("ro_count", [ro_count_file], {})
+            if menu_sales_files:
+                advisor_jobs["Menu Sales"] = ("menu_sales", menu_sales_files, {"dedupe": menu_sales_dedupe, "key_index": key_index})
+            if alacarte_file:
+                advisor_jobs["A-La-Carte"] = ("alacarte", [alacarte_file], {})
+            for commodity in commodities_list:
+                if commodities_files[commodity] is not None:
+                    section = "tires" if commodity == 'Tires' else "commodity"
+                    advisor_jobs[commodity] = (section, [commodities_files[commodity]], {})
+            if alignment_menus_files:
+                advisor_jobs["Alignment Menus"] = ("alignment", alignment_menus_files, {"dedupe": alignment_dedupe, "label": "Alignment Menus", "key_index": key_index})
+            if alignment_alacarte_files:
+                advisor_jobs["Alignment A-La-Carte"] = ("alignment", alignment_alacarte_files, {"dedupe": alignment_dedupe, "label": "Alignment A-La-Carte", "key_index": key_index})
+            if recommendations_file:
+                advisor_jobs["Recommendations"] = ("recommendations", [recommendations_file], {})
+            if daily_file:
+                advisor_jobs["Daily Data"] = ("daily", [daily_file], {})
 
             # -------------- Input All Button --------------
             if st.button("Input All", key="advisor_input_all"):
-                updated_sections = []
+                with instrumented_action("Input All", archive=advisor_archive):
+                    updated_sections = []
+
+                    # Parse every uploaded section up front, in parallel.
+                    with st.spinner(f"Parsing {len(advisor_jobs)} report(s)..."):
+                        parsed = aggregate_sections_parallel(advisor_jobs)
+
+                    # Every section adds its cells to one plan, written at the end.
+                    plan = SheetWritePlan()
 
-                # ---------- RO Count ----------
-                if ro_count_file:
+                    # ---------- RO Count ----------
+                    if ro_count_file:
                         try:
-                            df_ro_count = pd.read_excel(ro_count_file)
-                            ro_counts = process_ro_count_data(df_ro_count, advisor_column='Advisor Name', ro_number_column='RO Number')
+                            ro_counts = parsed_result(parsed, "RO Count")
                             update_google_sheet(
                                 sheet,
                                 ro_counts,
                                 date_col_index=date_col_index,
                                 start_row_offset=data_row_offsets['RO Count'] - 1,
-                                advisor_mapping=advisor_mapping
+                                advisor_mapping=advisor_mapping,
+                                plan=plan
                             )
                             updated_sections.append("RO Count")
-                            st.success("RO Count data updated successfully.")
+                            st.success("RO Count data queued.")
                         except Exception as e:
                             st.error(f"Error updating RO Count data: {e}")
-                        time.sleep(delay_seconds)
 
-                # ---------- Menu Sales ----------
-                if menu_sales_files:
+                    # ---------- Menu Sales ----------
+                    if menu_sales_files:
                         try:
-                            df_menu_sales = read_many_excels(menu_sales_files)
-                            df_menu_sales = normalize_columns(df_menu_sales)
-                            if menu_sales_dedupe:
-                                df_menu_sales = dedupe_rows(df_menu_sales)
-                            menu_name_counts, menu_labor_gross_sums, menu_parts_gross_sums = process_menu_sales_data(df_menu_sales, "Advisor Name", "RO Number")
+                            menu_name_counts, menu_labor_gross_sums, menu_parts_gross_sums = parsed_result(parsed, "Menu Sales")
                             update_google_sheet(
                                 sheet,
                                 menu_name_counts,
@@ -1167,19 +855,18 @@ def main():
                                 menu_parts_gross_sums,
                                 date_col_index=date_col_index,
                                 start_row_offset=data_row_offsets['Menu Sales'] - 1,
-                                advisor_mapping=advisor_mapping
+                                advisor_mapping=advisor_mapping,
+                                plan=plan
                             )
                             updated_sections.append("Menu Sales")
-                            st.success("Menu Sales data updated successfully.")
+                            st.success("Menu Sales data queued.")
                         except Exception as e:
                             st.error(f"Error updating Menu Sales data: {e}")
-                        time.sleep(delay_seconds)
 
-                # ---------- A-La-Carte ----------
-                if alacarte_file:
+                    # ---------- A-La-Carte ----------
+                    if alacarte_file:
                         try:
-                            df_alacarte = pd.read_excel(alacarte_file)
-                            alacarte_name_counts, alacarte_labor_gross_sums, alacarte_parts_gross_sums = process_alacarte_data(df_alacarte, "Advisor Name")
+                            alacarte_name_counts, alacarte_labor_gross_sums, alacarte_parts_gross_sums = parsed_result(parsed, "A-La-Carte")
                             update_google_sheet(
                                 sheet,
                                 alacarte_name_counts,
@@ -1187,48 +874,37 @@ def main():
                                 alacarte_parts_gross_sums,
                                 date_col_index=date_col_index,
                                 start_row_offset=data_row_offsets['A-la-carte Count'] - 1,
-                                advisor_mapping=advisor_mapping
+                                advisor_mapping=advisor_mapping,
+                                plan=plan
                             )
                             updated_sections.append("A-La-Carte")
-                            st.success("A-La-Carte data updated successfully.")
+                            st.success("A-La-Carte data queued.")
                         except Exception as e:
                             st.error(f"Error updating A-La-Carte data: {e}")
-                        time.sleep(delay_seconds)
 
-                # ---------- Commodities & Alignments ----------
-                commodities_data = {}
-                # Normal Commodities
-                for commodity in commodities_list:
+                    # ---------- Commodities & Alignments ----------
+                    commodities_data = {}
+                    # Normal Commodities
+                    for commodity in commodities_list:
                         if commodities_files[commodity] is not None:
                             if commodity == 'Tires':
                                 try:
-                                    df = pd.read_excel(commodities_files[commodity], header=0)
-                                    actual_quantity_sums, gross_sums = process_tires_data(df)
+                                    actual_quantity_sums, gross_sums, tires_format = parsed_result(parsed, commodity)
                                     commodities_data['Tires'] = {
                                         'actual_quantity_sums': actual_quantity_sums,
                                         'gross_sums': gross_sums
                                     }
-                                    updated_sections.append("Tires")
-                                    st.success(f"{commodity} data (Original Format) processed successfully.")
-                                except Exception:
-                                    try:
-                                        actual_quantity_sums, gross_sums = process_tires_gm_format(commodities_files[commodity])
-                                        commodities_data['Tires'] = {
-                                            'actual_quantity_sums': actual_quantity_sums,
-                                            'gross_sums': gross_sums
-                                        }
-                                        updated_sections.append("Tires (GM Format)")
-                                        st.success(f"{commodity} data (GM Format) processed successfully.")
-                                    except Exception as e2:
-                                        st.error(f"Error processing {commodity} Excel file in both formats: {e2}")
-                                        commodities_data['Tires'] = {
-                                            'actual_quantity_sums': {},
-                                            'gross_sums': {}
-                                        }
+                                    updated_sections.append("Tires" if tires_format == "Original Format" else f"Tires ({tires_format})")
+                                    st.success(f"{commodity} data ({tires_format}) processed successfully.")
+                                except Exception as e2:
+                                    st.error(f"Error processing {commodity} Excel file in both formats: {e2}")
+                                    commodities_data['Tires'] = {
+                                        'actual_quantity_sums': {},
+                                        'gross_sums': {}
+                                    }
                             else:
                                 try:
-                                    df = pd.read_excel(commodities_files[commodity], header=0)
-                                    name_counts, parts_gross_sums = process_commodity_file(df)
+                                    name_counts, parts_gross_sums = parsed_result(parsed, commodity)
                                     commodities_data[commodity] = {
                                         'name_counts': name_counts,
                                         'parts_gross_sums': parts_gross_sums
@@ -1242,56 +918,40 @@ def main():
                                         'parts_gross_sums': {}
                                     }
 
-                # Alignments with new logic for both
-                alignment_counts_menus = {}
-                alignment_counts_alacarte = {}
+                    # Alignments with new logic for both
+                    alignment_counts_menus = {}
+                    alignment_counts_alacarte = {}
 
-                # Menus => new
-                if alignment_menus_files:
+                    # Menus => new
+                    if alignment_menus_files:
                         try:
-                            df_menus_new = read_many_excels(alignment_menus_files)
-                            df_menus_new = normalize_columns(df_menus_new)
-                            if alignment_dedupe:
-                                df_menus_new = dedupe_rows(df_menus_new)
-                            alignment_counts_menus = process_alignment_new_format(
-                                df_menus_new,
-                                advisor_col="Advisor Name",
-                                story_col="Operation Tech Story"
-                            )
+                            alignment_counts_menus = parsed_result(parsed, "Alignment Menus")
                             st.success("Alignment Menus (New Wheel Alignment Logic) processed successfully.")
                         except Exception as e:
                             st.error(f"Error processing new-format Alignment Menus: {e}")
 
-                # A-La-Carte => new
-                if alignment_alacarte_files:
+                    # A-La-Carte => new
+                    if alignment_alacarte_files:
                         try:
-                            df_alacarte_align = read_many_excels(alignment_alacarte_files)
-                            df_alacarte_align = normalize_columns(df_alacarte_align)
-                            if alignment_dedupe:
-                                df_alacarte_align = dedupe_rows(df_alacarte_align)
-                            alignment_counts_alacarte = process_alignment_new_format(
-                                df_alacarte_align,
-                                advisor_col="Advisor Name",
-                                story_col="Operation Tech Story"
-                            )
+                            alignment_counts_alacarte = parsed_result(parsed, "Alignment A-La-Carte")
                             st.success("Alignment A-La-Carte (New Wheel Alignment Logic) processed successfully.")
                         except Exception as e:
                             st.error(f"Error processing new-format Alignment A-La-Carte: {e}")
 
-                final_align_counts = {}
-                for adv, c in alignment_counts_menus.items():
+                    final_align_counts = {}
+                    for adv, c in alignment_counts_menus.items():
                         final_align_counts[adv] = final_align_counts.get(adv, 0) + c
-                for adv, c in alignment_counts_alacarte.items():
+                    for adv, c in alignment_counts_alacarte.items():
                         final_align_counts[adv] = final_align_counts.get(adv, 0) + c
 
-                commodities_data['Alignments'] = {
-                        'name_counts': final_align_counts,
-                        'parts_gross_sums': {},
-                        'labor_gross_sums': {}
-                }
+                    commodities_data['Alignments'] = {
+                            'name_counts': final_align_counts,
+                            'parts_gross_sums': {},
+                            'labor_gross_sums': {}
+                    }
 
-                # Update once we have all
-                if any(commodities_data.values()):
+                    # Update once we have all
+                    if any(commodities_data.values()):
                         try:
                             update_commodities_in_sheet(
                                 sheet,
@@ -1299,19 +959,18 @@ def main():
                                 commodities_data=commodities_data,
                                 commodities_list=commodities_list + ['Alignments'],
                                 advisor_mapping=advisor_mapping,
-                                data_row_offsets=data_row_offsets
+                                data_row_offsets=data_row_offsets,
+                                plan=plan
                             )
                             updated_sections.append("Commodities")
-                            st.success("Commodities data updated successfully.")
+                            st.success("Commodities data queued.")
                         except Exception as e:
                             st.error(f"Error updating Commodities data: {e}")
-                        time.sleep(delay_seconds)
 
-                # ---------- Recommendations ----------
-                if recommendations_file:
+                    # ---------- Recommendations ----------
+                    if recommendations_file:
                         try:
-                            df_recommendations = pd.read_excel(recommendations_file)
-                            rec_count, rec_sold_count, rec_amount, rec_sold_amount = process_recommendations_data(df_recommendations, "Name")
+                            rec_count, rec_sold_count, rec_amount, rec_sold_amount = parsed_result(parsed, "Recommendations")
                             update_google_sheet(
                                 sheet,
                                 rec_count,
@@ -1320,103 +979,133 @@ def main():
                                 rec_sold_amount,
                                 date_col_index=date_col_index,
                                 start_row_offset=data_row_offsets['Rec Count'] - 1,
-                                advisor_mapping=advisor_mapping
+                                advisor_mapping=advisor_mapping,
+                                plan=plan
                             )
                             updated_sections.append("Recommendations")
-                            st.success("Recommendations data updated successfully.")
+                            st.success("Recommendations data queued.")
                         except Exception as e:
                             st.error(f"Error updating Recommendations data: {e}")
-                        time.sleep(delay_seconds)
 
-                # ---------- Daily Data ----------
-                if daily_file:
+                    # ---------- Daily Data ----------
+                    if daily_file:
                         try:
-                            df_daily = pd.read_excel(daily_file)
-                            daily_labor_gross, daily_parts_gross = process_daily_data(df_daily)
+                            daily_labor_gross, daily_parts_gross = parsed_result(parsed, "Daily Data")
                             update_google_sheet(
                                 sheet,
                                 daily_labor_gross,
                                 daily_parts_gross,
                                 date_col_index=date_col_index,
                                 start_row_offset=data_row_offsets['Daily Labor Gross'] - 1,
-                                advisor_mapping=advisor_mapping
+                                advisor_mapping=advisor_mapping,
+                                plan=plan
                             )
                             updated_sections.append("Daily Data")
-                            st.success("Daily data updated successfully.")
+                            st.success("Daily data queued.")
                         except Exception as e:
                             st.error(f"Error updating Daily data: {e}")
-                        time.sleep(delay_seconds)
 
-                if updated_sections:
-                        st.success(f"Updated the following sections successfully: {', '.join(updated_sections)}")
-                else:
+                    if updated_sections:
+                        try:
+                            duplicates = plan.added - len(plan)
+                            write_result = plan.flush(sheet, diff=diff_writes_enabled())
+                            if key_index is not None:
+                                key_index.commit()
+                            st.info(f"{describe_write(*write_result)} {duplicates} duplicate cell(s) merged.")
+                            st.caption(get_sheets_rate_limiter().status())
+                            st.success(f"Updated the following sections successfully: {', '.join(updated_sections)}")
+                        except Exception as e:
+                            st.error(f"Failed to update Google Sheet cells: {e}")
+                    else:
                         st.warning("No data sections were updated. Please ensure you've uploaded the necessary Excel files.")
 
+            # -------------- Backfill Button --------------
+            st.caption(f"Backfill splits the uploads by the date on each row ({' / '.join(DATE_COLUMNS)}) "
+                       f"and writes every day of {selected_day.strftime('%B %Y')} that has data in one go.")
+            if advisor_jobs and st.button("Backfill Month", key="advisor_backfill"):
+                with instrumented_action("Backfill Month", archive=advisor_archive):
+                    dates = {f"{selected_day.year}-{selected_day.month:02d}-{int(day):02d}": day
+                             for day in layout.day_to_col if day.isdigit() and 1 <= int(day) <= 31}
+                    # Each day's rows are checked against, and recorded for, that day
+                    key_indexes = None if key_index is None else {iso_date: KeyIndex(key_index.path, day)
+                                                                  for iso_date, day in dates.items()}
+                    with st.spinner(f"Parsing {len(advisor_jobs)} report(s) by date..."):
+                        by_date = aggregate_sections_by_date(advisor_jobs, list(dates), key_indexes)
+
+                    for label, outcomes in by_date.items():
+                        if not any(rows for _, _, rows in outcomes.values()):
+                            errors = [error for _, error, _ in outcomes.values() if error]
+                            st.warning(f"{label} was not backfilled: {errors[0] if errors else 'no rows in this month'}")
+
+                    plan = SheetWritePlan()
+                    days_written = []
+                    for iso_date, day in dates.items():
+                        results = {}
+                        for label, outcomes in by_date.items():
+                            result, error, rows = outcomes[iso_date]
+                            if rows and error is None:
+                                results[label] = result
+                            elif rows:
+                                st.error(f"Error processing {label} for {iso_date}: {error}")
+                        if plan_advisor_sections(plan, results, layout.day_to_col[day], advisor_mapping):
+                            days_written.append(day)
+
+                    if days_written:
+                        try:
+                            write_result = plan.flush(sheet, diff=diff_writes_enabled())
+                            for day_index in (key_indexes or {}).values():
+                                day_index.commit()
+                            st.info(describe_write(*write_result))
+                            st.caption(get_sheets_rate_limiter().status())
+                            st.success(f"Backfilled {len(days_written)} day(s): {', '.join(days_written)}")
+                        except Exception as e:
+                            st.error(f"Failed to update Google Sheet cells: {e}")
+                    else:
+                        st.warning(f"No dated rows for {selected_day.strftime('%B %Y')} were found in the uploads.")
+
     
     # ==================== RTH TAB ====================
     with tab2:
         st.markdown("### RTH Data Processing")
-        rth_sheet_name = st.text_input("Enter the Google Sheet name:", "SHEET NAME HERE", key="rth_sheet_name")
-        rth_worksheet_name = st.text_input("Enter the Worksheet (tab) name:", "Input", key="rth_worksheet_name")
+        with st.form("rth_inputs", border=False):
+            rth_sheet_name = st.text_input("Enter the Google Sheet name:", "SHEET NAME HERE", key="rth_sheet_name")
+            rth_worksheet_name = st.text_input("Enter the Worksheet (tab) name:", "Input", key="rth_worksheet_name")
         
-        st.subheader("Upload Excel Files")
+            st.subheader("Upload Excel Files")
         
-        # ---- Technician Report
-        st.markdown("#### **Upload Technician Report Excel**")
-        technician_report_file = st.file_uploader("Select Technician Report Excel file", type=["xlsx"], key="rth_technician_report", label_visibility="hidden")
+            # ---- Technician Report
+            st.markdown("#### **Upload Technician Report Excel**")
+            technician_report_file = st.file_uploader("Select Technician Report Excel file", type=["xlsx"], key="rth_technician_report", label_visibility="hidden")
         
-        # ---- Employee TimeCard Report
-        st.markdown("#### **Upload Employee TimeCard Report Excel**")
-        timecard_report_file = st.file_uploader("Select Employee TimeCard Report Excel file", type=["xlsx"], key="rth_timecard_report", label_visibility="hidden")
+            # ---- Employee TimeCard Report
+            st.markdown("#### **Upload Employee TimeCard Report Excel**")
+            timecard_report_file = st.file_uploader("Select Employee TimeCard Report Excel file", type=["xlsx"], key="rth_timecard_report", label_visibility="hidden")
         
-        # -------------- Date Selection --------------
-        rth_selected_date = st.date_input("Select the date:", datetime.now(), key="rth_selected_date").strftime('%d').lstrip('0')
+            # -------------- Date Selection --------------
+            rth_selected_day = st.date_input("Select the date:", datetime.now(), key="rth_selected_date")
+            rth_selected_date = rth_selected_day.strftime('%d').lstrip('0')
+            st.form_submit_button("Apply", help="Uploads and settings take effect when applied.")
+        rth_archive = report_archive.ArchiveScope(rth_sheet_name, rth_selected_day)
         
         # -------------- Connect to RTH Google Sheet --------------
-        rth_sheet = connect_to_google_sheet(rth_sheet_name, rth_worksheet_name)
-        if rth_sheet is None:
-            st.error("Failed to connect to the RTH Google Sheet. Please check the inputs and try again.")
-        else:
-            # Get date column from row 2 (dates start at column E, which is index 5)
-            date_row = rth_sheet.row_values(2)[4:]  # Skip first 4 columns (A, B, C, D)
+        # Dates start at column E; technicians are in column A starting at row 4,
+        # every 4 rows (Attendance Hours, Actual Hours, Assigned Billed Hours,
+        # Daily Objective). Column B contains employee numbers.
+        rth_sheet, rth_layout = tab_sheet("rth", rth_sheet_name, rth_worksheet_name, first_date_col=5, block_stride=4,
+                                          used=bool(technician_report_file or timecard_report_file), day=rth_selected_date)
+        if rth_sheet is not None:
             date = rth_selected_date
-            if date in date_row:
-                rth_date_col_index = date_row.index(date) + 5  # +5 because we skipped 4 columns and index starts at 1
+            if date in rth_layout.day_to_col:
+                rth_date_col_index = rth_layout.day_to_col[date]
             else:
                 st.error(f"Date {date} not found in the RTH sheet.")
                 rth_sheet = None
         
         if rth_sheet is not None:
             # -------------- Get Technicians from Google Sheet --------------
-            # Technicians are in column A, starting at row 4, every 4 rows
-            # Each tech occupies 4 rows: Attendance Hours, Actual Hours, Assigned Billed Hours, Daily Objective
-            # Column B contains employee numbers
-            col_a_values = rth_sheet.col_values(1)[3:]  # Tech names, start from row 4 (index 3)
-            col_b_values = rth_sheet.col_values(2)[3:]  # Employee IDs, start from row 4 (index 3)
-            
-            tech_names = []
-            tech_employee_ids = []
-            tech_start_rows = []
-            row = 4
-            idx = 0
-            
-            while idx < len(col_a_values):
-                tech_name = col_a_values[idx]
-                if not tech_name or tech_name.strip() == "":
-                    break
-                tech_name = tech_name.strip().upper()
-                tech_names.append(tech_name)
-                tech_start_rows.append(row + idx)
-                
-                # Get employee ID if available
-                employee_id = col_b_values[idx].strip() if idx < len(col_b_values) and col_b_values[idx] else ""
-                tech_employee_ids.append(employee_id)
-                
-                idx += 4  # Each tech occupies 4 rows
-            
             # Create two mappings: by name and by employee ID
-            tech_mapping = dict(zip(tech_names, tech_start_rows))
-            tech_mapping_by_id = {emp_id: tech_start_rows[i] for i, emp_id in enumerate(tech_employee_ids) if emp_id}
+            tech_mapping = rth_layout.name_mapping()
+            tech_mapping_by_id = rth_layout.employee_id_mapping()
             
             # Combined mapping for flexibility
             tech_mapping_combined = {**tech_mapping_by_id, **tech_mapping}
@@ -1427,91 +1116,76 @@ def main():
             with col1:
                 if technician_report_file is not None:
                     if st.button("Update Technician Report Data in Google Sheet", key="rth_update_technician"):
-                        try:
-                            df_tech_report = pd.read_excel(technician_report_file, header=1)  # Header is in row 2 (index 1)
-                            actual_hours, assigned_billed_hours = process_technician_report_data(df_tech_report)
-                            update_rth_technician_data(
-                                rth_sheet,
-                                actual_hours,
-                                assigned_billed_hours,
-                                date_col_index=rth_date_col_index,
-                                tech_mapping=tech_mapping
-                            )
-                            st.success("Technician Report data updated successfully!")
-                        except Exception as e:
-                            st.error(f"Error updating Technician Report data: {e}")
-                        time.sleep(delay_seconds)
+                        with instrumented_action("Update Technician Report Data", archive=rth_archive):
+                            try:
+                                actual_hours, assigned_billed_hours = aggregate_technician_report(technician_report_file)
+                                update_rth_technician_data(
+                                    rth_sheet,
+                                    actual_hours,
+                                    assigned_billed_hours,
+                                    date_col_index=rth_date_col_index,
+                                    tech_mapping=tech_mapping
+                                )
+                                st.success("Technician Report data updated successfully!")
+                            except Exception as e:
+                                st.error(f"Error updating Technician Report data: {e}")
             
             with col2:
                 if timecard_report_file is not None:
                     if st.button("Update Employee Timecard Data in Google Sheet", key="rth_update_timecard"):
-                        try:
-                            # Read Employee Timecard - no header row since structure is vertical
-                            df_timecard = pd.read_excel(timecard_report_file, header=None)
-                            date_range, timecard_data = process_employee_timecard_data(df_timecard)
+                        with instrumented_action("Update Employee Timecard Data", archive=rth_archive):
+                            try:
+                                date_range, timecard_data = aggregate_timecard(timecard_report_file)
                             
-                            if date_range:
-                                start_date, end_date = date_range
-                                st.info(f"Processing timecard data for date range: {start_date.strftime('%m/%d/%Y')} - {end_date.strftime('%m/%d/%Y')}")
+                                if date_range:
+                                    start_date, end_date = date_range
+                                    st.info(f"Processing timecard data for date range: {start_date.strftime('%m/%d/%Y')} - {end_date.strftime('%m/%d/%Y')}")
                             
-                            update_rth_timecard_data(
-                                rth_sheet,
-                                date_range,
-                                timecard_data,
-                                tech_mapping_combined
-                            )
-                            st.success(f"Employee Timecard data updated successfully for {len(timecard_data)} technicians!")
-                        except Exception as e:
-                            st.error(f"Error updating Employee Timecard data: {e}")
-                        time.sleep(delay_seconds)
+                                update_rth_timecard_data(
+                                    rth_sheet,
+                                    date_range,
+                                    timecard_data,
+                                    tech_mapping_combined,
+                                    day_to_col=rth_layout.day_to_col
+                                )
+                                st.success(f"Employee Timecard data updated successfully for {len(timecard_data)} technicians!")
+                            except Exception as e:
+                                st.error(f"Error updating Employee Timecard data: {e}")
     
     # ==================== APPOINTMENTS TAB ====================
     with tab3:
         st.markdown("### Appointments Data Processing")
-        appt_sheet_name = st.text_input("Enter the Google Sheet name:", "SHEET NAME HERE", key="appt_sheet_name")
-        appt_worksheet_name = st.text_input("Enter the Worksheet (tab) name:", "Input", key="appt_worksheet_name")
+        with st.form("appt_inputs", border=False):
+            appt_sheet_name = st.text_input("Enter the Google Sheet name:", "SHEET NAME HERE", key="appt_sheet_name")
+            appt_worksheet_name = st.text_input("Enter the Worksheet (tab) name:", "Input", key="appt_worksheet_name")
         
-        st.subheader("Upload Excel Files")
+            st.subheader("Upload Excel Files")
         
-        # ---- Volkswagen Appointments
-        st.markdown("#### **Upload Volkswagen Appointments Excel**")
-        vw_appointments_file = st.file_uploader("Select Volkswagen Appointments Excel file", type=["xlsx"], key="appt_vw", label_visibility="hidden")
+            # ---- Volkswagen Appointments
+            st.markdown("#### **Upload Volkswagen Appointments Excel**")
+            vw_appointments_file = st.file_uploader("Select Volkswagen Appointments Excel file", type=["xlsx"], key="appt_vw", label_visibility="hidden")
         
-        # ---- Toyota Appointments
-        st.markdown("#### **Upload Toyota Appointments Excel**")
-        toyota_appointments_file = st.file_uploader("Select Toyota Appointments Excel file", type=["xlsx"], key="appt_toyota", label_visibility="hidden")
+            # ---- Toyota Appointments
+            st.markdown("#### **Upload Toyota Appointments Excel**")
+            toyota_appointments_file = st.file_uploader("Select Toyota Appointments Excel file", type=["xlsx"], key="appt_toyota", label_visibility="hidden")
         
-        # ---- Alfa Appointments
-        st.markdown("#### **Upload Alfa Appointments Excel**")
-        alfa_appointments_file = st.file_uploader("Select Alfa Appointments Excel file", type=["xlsx"], key="appt_alfa", label_visibility="hidden")
+            # ---- Alfa Appointments
+            st.markdown("#### **Upload Alfa Appointments Excel**")
+            alfa_appointments_file = st.file_uploader("Select Alfa Appointments Excel file", type=["xlsx"], key="appt_alfa", label_visibility="hidden")
+            st.form_submit_button("Apply", help="Uploads and settings take effect when applied.")
+        # Appointment exports span many days; they are archived under the day they were uploaded
+        appt_archive = report_archive.ArchiveScope(appt_sheet_name, datetime.now().date())
         
         # -------------- Connect to Appointments Google Sheet --------------
-        appt_sheet = connect_to_google_sheet(appt_sheet_name, appt_worksheet_name)
-        if appt_sheet is None:
-            st.error("Failed to connect to the Appointments Google Sheet. Please check the inputs and try again.")
+        # Dates start at column D; advisors are in column A starting at row 4,
+        # every 4 rows (Volkswagen, Toyota, Alfa, Daily Objective)
+        appt_sheet, appt_layout = tab_sheet("appt", appt_sheet_name, appt_worksheet_name, first_date_col=4, block_stride=4,
+                                            used=bool(vw_appointments_file or toyota_appointments_file or alfa_appointments_file))
         
         if appt_sheet is not None:
             # -------------- Get Advisors from Google Sheet --------------
-            # Advisors are in column A, starting at row 4, every 4 rows
-            # Each advisor occupies 4 rows: Volkswagen, Toyota, Alfa, Daily Objective
-            col_a_values = appt_sheet.col_values(1)[3:]  # Advisor first names, start from row 4 (index 3)
-            
-            advisor_names = []
-            advisor_start_rows = []
-            row = 4
-            idx = 0
-            
-            while idx < len(col_a_values):
-                advisor_name = col_a_values[idx]
-                if not advisor_name or advisor_name.strip() == "":
-                    break
-                # Extract first name and normalize
-                advisor_first_name = advisor_name.strip().split()[0].upper()
-                advisor_names.append(advisor_first_name)
-                advisor_start_rows.append(row + idx)
-                idx += 4  # Each advisor occupies 4 rows
-            
-            appt_advisor_mapping = dict(zip(advisor_names, advisor_start_rows))
+            # Advisors are matched on their normalized first name
+            appt_advisor_mapping = appt_layout.first_name_mapping()
             
             st.write(f"Found {len(appt_advisor_mapping)} advisors in the Google Sheet.")
             
@@ -1521,117 +1195,115 @@ def main():
             with col1:
                 if vw_appointments_file is not None:
                     if st.button("Update Volkswagen in Google Sheet", key="appt_update_vw"):
-                        try:
-                            df_vw = pd.read_excel(vw_appointments_file, header=1)  # Headers at row 2 (index 1)
-                            vw_data = process_appointments_data(df_vw, is_volkswagen=True)
-                            # Update only VW row
-                            update_appointments_in_sheet(
-                                appt_sheet,
-                                vw_data=vw_data,
-                                toyota_data={},
-                                alfa_data={},
-                                advisor_mapping=appt_advisor_mapping,
-                                update_vw=True,
-                                update_toyota=False,
-                                update_alfa=False
-                            )
-                            st.success("Volkswagen Appointments data updated successfully!")
-                        except Exception as e:
-                            st.error(f"Error updating Volkswagen Appointments data: {e}")
-                        time.sleep(delay_seconds)
+                        with instrumented_action("Update Volkswagen", archive=appt_archive):
+                            try:
+                                vw_data = aggregate_appointments(vw_appointments_file, is_volkswagen=True)
+                                # Update only VW row
+                                update_appointments_in_sheet(
+                                    appt_sheet,
+                                    vw_data=vw_data,
+                                    toyota_data={},
+                                    alfa_data={},
+                                    advisor_mapping=appt_advisor_mapping,
+                                    day_to_col=appt_layout.day_to_col,
+                                    update_vw=True,
+                                    update_toyota=False,
+                                    update_alfa=False
+                                )
+                                st.success("Volkswagen Appointments data updated successfully!")
+                            except Exception as e:
+                                st.error(f"Error updating Volkswagen Appointments data: {e}")
             
             with col2:
                 if toyota_appointments_file is not None:
                     if st.button("Update Toyota in Google Sheet", key="appt_update_toyota"):
-                        try:
-                            df_toyota = pd.read_excel(toyota_appointments_file, header=1)
-                            toyota_data = process_appointments_data(df_toyota, is_volkswagen=False)
-                            # Update only Toyota row
-                            update_appointments_in_sheet(
-                                appt_sheet,
-                                vw_data={},
-                                toyota_data=toyota_data,
-                                alfa_data={},
-                                advisor_mapping=appt_advisor_mapping,
-                                update_vw=False,
-                                update_toyota=True,
-                                update_alfa=False
-                            )
-                            st.success("Toyota Appointments data updated successfully!")
-                        except Exception as e:
-                            st.error(f"Error updating Toyota Appointments data: {e}")
-                        time.sleep(delay_seconds)
+                        with instrumented_action("Update Toyota", archive=appt_archive):
+                            try:
+                                toyota_data = aggregate_appointments(toyota_appointments_file, is_volkswagen=False)
+                                # Update only Toyota row
+                                update_appointments_in_sheet(
+                                    appt_sheet,
+                                    vw_data={},
+                                    toyota_data=toyota_data,
+                                    alfa_data={},
+                                    advisor_mapping=appt_advisor_mapping,
+                                    day_to_col=appt_layout.day_to_col,
+                                    update_vw=False,
+                                    update_toyota=True,
+                                    update_alfa=False
+                                )
+                                st.success("Toyota Appointments data updated successfully!")
+                            except Exception as e:
+                                st.error(f"Error updating Toyota Appointments data: {e}")
             
             with col3:
                 if alfa_appointments_file is not None:
                     if st.button("Update Alfa in Google Sheet", key="appt_update_alfa"):
-                        try:
-                            df_alfa = pd.read_excel(alfa_appointments_file, header=1)
-                            alfa_data = process_appointments_data(df_alfa, is_volkswagen=False)
-                            # Update only Alfa row
-                            update_appointments_in_sheet(
-                                appt_sheet,
-                                vw_data={},
-                                toyota_data={},
-                                alfa_data=alfa_data,
-                                advisor_mapping=appt_advisor_mapping,
-                                update_vw=False,
-                                update_toyota=False,
-                                update_alfa=True
-                            )
-                            st.success("Alfa Appointments data updated successfully!")
-                        except Exception as e:
-                            st.error(f"Error updating Alfa Appointments data: {e}")
-                        time.sleep(delay_seconds)
+                        with instrumented_action("Update Alfa", archive=appt_archive):
+                            try:
+                                alfa_data = aggregate_appointments(alfa_appointments_file, is_volkswagen=False)
+                                # Update only Alfa row
+                                update_appointments_in_sheet(
+                                    appt_sheet,
+                                    vw_data={},
+                                    toyota_data={},
+                                    alfa_data=alfa_data,
+                                    advisor_mapping=appt_advisor_mapping,
+                                    day_to_col=appt_layout.day_to_col,
+                                    update_vw=False,
+                                    update_toyota=False,
+                                    update_alfa=True
+                                )
+                                st.success("Alfa Appointments data updated successfully!")
+                            except Exception as e:
+                                st.error(f"Error updating Alfa Appointments data: {e}")
             
             with col4:
                 # Update All button
                 if vw_appointments_file or toyota_appointments_file or alfa_appointments_file:
                     if st.button("Update All Appointments", key="appt_update_all"):
-                        vw_data = {}
-                        toyota_data = {}
-                        alfa_data = {}
+                        with instrumented_action("Update All Appointments", archive=appt_archive):
+                            vw_data = {}
+                            toyota_data = {}
+                            alfa_data = {}
                         
-                        # Process VW
-                        if vw_appointments_file:
-                            try:
-                                df_vw = pd.read_excel(vw_appointments_file, header=1)
-                                vw_data = process_appointments_data(df_vw, is_volkswagen=True)
-                                st.success("Volkswagen data processed successfully.")
-                            except Exception as e:
-                                st.error(f"Error processing Volkswagen data: {e}")
+                            # Process VW
+                            if vw_appointments_file:
+                                try:
+                                    vw_data = aggregate_appointments(vw_appointments_file, is_volkswagen=True)
+                                    st.success("Volkswagen data processed successfully.")
+                                except Exception as e:
+                                    st.error(f"Error processing Volkswagen data: {e}")
                         
-                        # Process Toyota
-                        if toyota_appointments_file:
-                            try:
-                                df_toyota = pd.read_excel(toyota_appointments_file, header=1)
-                                toyota_data = process_appointments_data(df_toyota, is_volkswagen=False)
-                                st.success("Toyota data processed successfully.")
-                            except Exception as e:
-                                st.error(f"Error processing Toyota data: {e}")
+                            # Process Toyota
+                            if toyota_appointments_file:
+                                try:
+                                    toyota_data = aggregate_appointments(toyota_appointments_file, is_volkswagen=False)
+                                    st.success("Toyota data processed successfully.")
+                                except Exception as e:
+                                    st.error(f"Error processing Toyota data: {e}")
                         
-                        # Process Alfa
-                        if alfa_appointments_file:
+                            # Process Alfa
+                            if alfa_appointments_file:
+                                try:
+                                    alfa_data = aggregate_appointments(alfa_appointments_file, is_volkswagen=False)
+                                    st.success("Alfa data processed successfully.")
+                                except Exception as e:
+                                    st.error(f"Error processing Alfa data: {e}")
+                        
+                            # Update all at once
                             try:
-                                df_alfa = pd.read_excel(alfa_appointments_file, header=1)
-                                alfa_data = process_appointments_data(df_alfa, is_volkswagen=False)
-                                st.success("Alfa data processed successfully.")
+                                update_appointments_in_sheet(
+                                    appt_sheet,
+                                    vw_data=vw_data,
+                                    toyota_data=toyota_data,
+                                    alfa_data=alfa_data,
+                                    advisor_mapping=appt_advisor_mapping,
+                                    day_to_col=appt_layout.day_to_col
+                                )
+                                st.success("All Appointments data updated successfully!")
                             except Exception as e:
-                                st.error(f"Error processing Alfa data: {e}")
-                        
-                        # Update all at once
-                        try:
-                            update_appointments_in_sheet(
-                                appt_sheet,
-                                vw_data=vw_data,
-                                toyota_data=toyota_data,
-                                alfa_data=alfa_data,
-                                advisor_mapping=appt_advisor_mapping
-                            )
-                            st.success("All Appointments data updated successfully!")
-                        except Exception as e:
-                            st.error(f"Error updating Appointments data: {e}")
-                        time.sleep(delay_seconds)
+                                st.error(f"Error updating Appointments data: {e}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,226 @@
+"""Synthetic DMS exports for benchmarking and offline runs.
+
+Every report type the app accepts can be generated with a chosen number of
+data rows and advisors. The files follow the layouts the processors expect
+(header rows, title rows, TOTAL rows, money as "$1,234.56" text, the
+vertical Employee Timecard) and carry a few extra columns so the column
+projection has something to skip.
+
+    python synthetic_reports.py menu_sales --rows 100000 --advisors 25 -o menu.xlsx
+"""
+import argparse
+import datetime as dt
+
+import numpy as np
+import openpyxl
+
+_FIRST_NAMES = ["JAMES", "MARY", "ROBERT", "PATRICIA", "JOHN", "JENNIFER", "MICHAEL", "LINDA",
+                "DAVID", "ELIZABETH", "WILLIAM", "BARBARA", "RICHARD", "SUSAN", "JOSEPH", "JESSICA",
+                "THOMAS", "SARAH", "CHRIS", "KAREN", "DANIEL", "LISA", "MATTHEW", "NANCY", "ANTHONY"]
+_LAST_NAMES = ["SMITH", "JOHNSON", "WILLIAMS", "BROWN", "JONES", "GARCIA", "MILLER", "DAVIS",
+               "RODRIGUEZ", "MARTINEZ", "HERNANDEZ", "LOPEZ", "GONZALEZ", "WILSON", "ANDERSON"]
+_OP_TEXTS = ["OIL CHANGE", "TIRE ROTATION", "BRAKE INSPECTION", "CABIN FILTER", "WIPER BLADES",
+             "BATTERY TEST", "FLUID FLUSH", "MULTI-POINT INSPECTION"]
+_TECH_STORIES = ["PERFORMED FOUR WHEEL ALIGNMENT, SET TOE TO SPEC", "CHECKED TIRE PRESSURE",
+                 "REPLACED FRONT PADS AND ROTORS", "Performed wheel alignment per customer request",
+                 "ROAD TESTED VEHICLE, NO ISSUES FOUND"]
+
+def advisor_names(count):
+    """`count` distinct "FIRST LAST" names."""
+    return [f"{_FIRST_NAMES[i % len(_FIRST_NAMES)]} {_LAST_NAMES[(i // len(_FIRST_NAMES)) % len(_LAST_NAMES)]}"
+            + (f" {i // (len(_FIRST_NAMES) * len(_LAST_NAMES))}" if i >= len(_FIRST_NAMES) * len(_LAST_NAMES) else "")
+            for i in range(count)]
+
+def _money_text(values):
+    return [f"${v:,.2f}" for v in values]
+
+def _padded(names, rng):
+    """Names with the stray whitespace and mixed case DMS exports have."""
+    styles = rng.integers(0, 3, len(names))
+    return [n if s == 0 else f" {n.title()} " if s == 1 else f"{n} " for n, s in zip(names, styles)]
+
+def _pick(rng, values, rows):
+    return [values[i] for i in rng.integers(0, len(values), rows)]
+
+def _save(path, header, columns, title_rows=(), footer_rows=()):
+    """Write a single-sheet workbook in openpyxl's streaming mode."""
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    for row in title_rows:
+        sheet.append(list(row))
+    if header is not None:
+        sheet.append(list(header))
+    for row in zip(*columns):
+        sheet.append(row)
+    for row in footer_rows:
+        sheet.append(list(row))
+    workbook.save(path)
+
+# ── REPORTS ─────────────────────────────────────────────────────────────────
+
+def _repair_order_lines(rows, advisors, rng):
+    """RO number, line number and advisor per row; two to four lines per RO,
+    each RO belonging to one advisor."""
+    lines_per_ro = rng.integers(2, 5, max(rows // 2, 1))
+    ro_numbers = np.repeat(np.arange(500000, 500000 + len(lines_per_ro)), lines_per_ro)[:rows]
+    ro_numbers = np.pad(ro_numbers, (0, rows - len(ro_numbers)), mode="edge")
+    _, first = np.unique(ro_numbers, return_index=True)
+    line = np.arange(rows) - np.repeat(first, np.diff(np.append(first, rows))) + 1
+    ro_advisor = rng.integers(0, len(advisors), ro_numbers.max() - 500000 + 1)
+    names = [advisors[i] for i in ro_advisor[ro_numbers - 500000]]
+    return ro_numbers.tolist(), line.tolist(), names
+
+def write_ro_count(path, rows, advisors, rng):
+    ro_numbers, _, names = _repair_order_lines(rows, advisors, rng)
+    open_dates = _pick(rng, [dt.date(2025, 11, d) for d in range(1, 29)], rows)
+    _save(path, ["RO Number", "Open Date", "Advisor Name", "Customer", "Total"],
+          [ro_numbers, open_dates, _padded(names, rng), _pick(rng, _LAST_NAMES, rows),
+           _money_text(rng.uniform(20, 2500, rows))])
+
+def _opcode_lines(path, rows, advisors, rng, extra=()):
+    ro_numbers, line, names = _repair_order_lines(rows, advisors, rng)
+    labor = rng.uniform(0, 400, rows).round(2)
+    parts = rng.uniform(0, 300, rows).round(2)
+    # Half the money cells are text, the rest numbers, as in real exports
+    as_text = rng.random(rows) < 0.5
+    labor = [f"${v:,.2f}" if t else float(v) for v, t in zip(labor, as_text)]
+    parts = [f"${v:,.2f}" if t else float(v) for v, t in zip(parts, as_text)]
+    header = ["RO Number", "Line", "Op Code", "Op Text", "Advisor Name", "Opcode Labor Gross", "Opcode Parts Gross"]
+    columns = [ro_numbers, line, _pick(rng, ["01OIL", "02ROT", "03BRK", "04ALN"], rows),
+               _pick(rng, _OP_TEXTS, rows), _padded(names, rng), labor, parts]
+    for name, values in extra:
+        header.append(name)
+        columns.append(values)
+    _save(path, header, columns)
+
+def write_menu_sales(path, rows, advisors, rng):
+    _opcode_lines(path, rows, advisors, rng)
+
+def write_alacarte(path, rows, advisors, rng):
+    _opcode_lines(path, rows, advisors, rng)
+
+def write_alignment(path, rows, advisors, rng):
+    _opcode_lines(path, rows, advisors, rng, extra=[("Operation Tech Story", _pick(rng, _TECH_STORIES, rows))])
+
+def write_commodity(path, rows, advisors, rng):
+    _save(path, ["RO Number", "Part Number", "Description", "Primary Advisor Name", "Quantity", "Gross"],
+          [rng.integers(500000, 600000, rows).tolist(), _pick(rng, ["AF-100", "CF-220", "BAT-35"], rows),
+           _pick(rng, ["AIR FILTER", "CABIN FILTER", "BATTERY"], rows), _padded(_pick(rng, advisors, rows), rng),
+           rng.integers(1, 3, rows).tolist(), _money_text(rng.uniform(5, 250, rows))])
+
+def write_tires(path, rows, advisors, rng):
+    _save(path, ["RO Number", "Advisor Name", "Part Count", "Opcode Parts Gross"],
+          [rng.integers(500000, 600000, rows).tolist(), _padded(_pick(rng, advisors, rows), rng),
+           rng.integers(1, 5, rows).tolist(), _money_text(rng.uniform(80, 1200, rows))])
+
+def write_tires_gm(path, rows, advisors, rng):
+    # Two title rows, header on the third row
+    _save(path, ["Advisor Name Group", "RO Number", "Actual Quantity", "Gross"],
+          [_padded(_pick(rng, advisors, rows), rng), rng.integers(500000, 600000, rows).tolist(),
+           rng.integers(1, 5, rows).tolist(), rng.uniform(80, 1200, rows).round(2).tolist()],
+          title_rows=[["Tire Sales by Advisor"], ["Date Range: 11/01/2025 - 11/30/2025"]])
+
+def write_recommendations(path, rows, advisors, rng):
+    recs = rng.integers(0, 20, rows)
+    sold = (recs * rng.uniform(0, 1, rows)).astype(int)
+    _save(path, ["Name", "Recommendations", "Recommendations Sold", "Recommendations $ amount",
+                 "Recommendations Sold $ amount", "Close %"],
+          [_padded(_pick(rng, advisors, rows), rng), recs.tolist(), sold.tolist(),
+           _money_text(recs * 85.5), _money_text(sold * 85.5), (sold / np.maximum(recs, 1)).round(2).tolist()],
+          footer_rows=[["TOTAL", int(recs.sum()), int(sold.sum()), "", "", ""]])
+
+def write_daily(path, rows, advisors, rng):
+    """Old layout: one row per advisor and pay type; only "ALL" rows count."""
+    _save(path, ["Name", "Pay Type", "ROs", "Labor Gross", "Parts Gross"],
+          [_padded(_pick(rng, advisors, rows), rng), _pick(rng, ["ALL", "CP", "WP", "IP"], rows),
+           rng.integers(0, 30, rows).tolist(), _money_text(rng.uniform(0, 5000, rows)),
+           _money_text(rng.uniform(0, 4000, rows))],
+          footer_rows=[["TOTAL", "ALL", 0, "$0.00", "$0.00"]])
+
+def write_daily_new(path, rows, advisors, rng):
+    """Advisor Performance 3.0 layout."""
+    _save(path, ["Service Advisor", "ROs", "Hours", "Labor Gross", "Parts Gross"],
+          [_padded(_pick(rng, advisors, rows), rng), rng.integers(0, 30, rows).tolist(),
+           rng.uniform(0, 60, rows).round(1).tolist(), rng.uniform(0, 5000, rows).round(2).tolist(),
+           _money_text(rng.uniform(0, 4000, rows))],
+          footer_rows=[["TOTAL", 0, 0, 0, "$0.00"]])
+
+def write_technician_report(path, rows, advisors, rng):
+    _save(path, ["Technician Name", "Technician #", "Actual Hours", "Assigned Billed Hours", "Efficiency"],
+          [_padded(_pick(rng, advisors, rows), rng), rng.integers(100, 999, rows).tolist(),
+           rng.uniform(0, 10, rows).round(2).tolist(), [f"{v:.2f}" for v in rng.uniform(0, 12, rows)],
+           rng.uniform(0.5, 1.5, rows).round(2).tolist()],
+          title_rows=[["Technician Hours Report"]])
+
+def write_timecard(path, rows, advisors, rng):
+    """Vertical layout: a name row and a header row per technician, then
+    three rows per day (date and Paid hours on the first)."""
+    start = dt.date(2025, 11, 16)
+    days = 15
+    techs = max(rows // (2 + 3 * days), 1)
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([None] * 7 + [f"{start:%m/%d/%Y} - {start + dt.timedelta(days=days - 1):%m/%d/%Y}"])
+    for _ in range(4):
+        sheet.append([])
+    names = advisors * (techs // len(advisors) + 1)
+    for t in range(techs):
+        first, last = names[t].split(" ", 1)
+        sheet.append([f"{1000 + t}", None, f"{last.title()}, {first.title()}"])
+        sheet.append(["Date", "In", "Out", None, None, None, None, None, None, None, "Paid"])
+        for d in range(days):
+            paid = 0 if rng.random() < 0.2 else round(float(rng.uniform(6, 10)), 2)
+            sheet.append([f"{start + dt.timedelta(days=d):%m/%d/%Y}", "8:00 AM", "4:30 PM"] + [None] * 7 + [paid])
+            sheet.append([None, "Lunch", None])
+            sheet.append([])
+    workbook.save(path)
+
+def _appointments(path, rows, users, rng):
+    days = [dt.datetime(2025, 11, d) for d in range(1, 29)]
+    _save(path, ["Date", "User", "Role", "Appointments", "Cancelled"],
+          [_pick(rng, days, rows), _pick(rng, users, rows), _pick(rng, ["Advisor", "BDC"], rows),
+           rng.integers(0, 12, rows).tolist(), rng.integers(0, 3, rows).tolist()],
+          title_rows=[["Appointments by User"]])
+
+def write_appointments(path, rows, advisors, rng):
+    _appointments(path, rows, [n.title() for n in advisors], rng)
+
+def write_appointments_vw(path, rows, advisors, rng):
+    _appointments(path, rows, [n.title() for n in advisors] + ["Pinnacle BDC", "Pinnacal Team", "PINNACLE Agent 2"], rng)
+
+# Report type -> (writer, app section, section options)
+REPORTS = {
+    "ro_count": (write_ro_count, "ro_count", {}),
+    "menu_sales": (write_menu_sales, "menu_sales", {"dedupe": True}),
+    "alacarte": (write_alacarte, "alacarte", {}),
+    "commodity": (write_commodity, "commodity", {}),
+    "tires": (write_tires, "tires", {}),
+    "tires_gm": (write_tires_gm, "tires", {}),
+    "alignment": (write_alignment, "alignment", {"dedupe": True}),
+    "recommendations": (write_recommendations, "recommendations", {}),
+    "daily": (write_daily, "daily", {}),
+    "daily_new": (write_daily_new, "daily", {}),
+    "technician_report": (write_technician_report, "technician_report", {}),
+    "timecard": (write_timecard, "timecard", {}),
+    "appointments": (write_appointments, "appointments", {"is_volkswagen": False}),
+    "appointments_vw": (write_appointments_vw, "appointments", {"is_volkswagen": True}),
+}
+
+def generate(report, path, rows, advisors=25, seed=0):
+    """Write a synthetic `report` export with about `rows` data rows."""
+    writer = REPORTS[report][0]
+    writer(path, rows, advisor_names(advisors), np.random.default_rng(seed))
+    return path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic DMS export.")
+    parser.add_argument("report", choices=sorted(REPORTS))
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--advisors", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", required=True)
+    args = parser.parse_args(argv)
+    generate(args.report, args.output, args.rows, args.advisors, args.seed)
+
+if __name__ == "__main__":
+    main()
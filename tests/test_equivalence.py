@@ -0,0 +1,60 @@
+"""The rewritten processors against the implementations they replaced
+(kept in benchmark.py), on the micro-benchmark inputs and on synthetic
+report files."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import benchmark
+import report_processing
+import synthetic_reports
+
+
+def _assert_same(old, new):
+    if isinstance(old, pd.Series):
+        np.testing.assert_array_equal(old.to_numpy(dtype=float), new.to_numpy(dtype=float))
+    else:
+        assert new == old
+
+
+@pytest.fixture(autouse=True)
+def quiet_ui():
+    previous = report_processing.set_ui(report_processing.MessageRecorder())
+    yield
+    report_processing.set_ui(previous)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+@pytest.mark.parametrize("rows", [200, 3000])
+@pytest.mark.parametrize("name", list(benchmark.MICRO))
+def test_micro_inputs_match_the_old_implementation(name, rows, seed):
+    make_inputs, old, new = benchmark.MICRO[name]
+    for case, value in make_inputs(rows, np.random.default_rng(seed)):
+        _assert_same(old(value.copy()), new(value.copy()))
+
+
+def test_timecard_file_matches_the_old_implementation(tmp_path):
+    path = str(tmp_path / "timecard.xlsx")
+    synthetic_reports.generate("timecard", path, 2000)
+    old = benchmark._old_process_employee_timecard_data(pd.read_excel(path, header=None))
+    assert report_processing.compute_timecard([path]) == old
+
+
+def test_alignment_file_matches_the_old_implementation(tmp_path):
+    path = str(tmp_path / "alignment.xlsx")
+    synthetic_reports.generate("alignment", path, 2000)
+    old = benchmark._old_process_alignment_new_format(pd.read_excel(path))
+    new = report_processing.process_alignment_new_format(report_processing.read_excel_projected(path))
+    assert new == old
+
+
+@pytest.mark.parametrize("values", [["$1,234.50", "12"], ["$1", "abc"], [None, "$3"]])
+def test_clean_column_data_raises_where_the_old_function_did(values):
+    column = pd.Series(values, dtype=object)
+    try:
+        expected = benchmark._old_clean_column_data(column.copy())
+    except ValueError:
+        with pytest.raises(ValueError):
+            report_processing.clean_column_data(column.copy())
+    else:
+        _assert_same(expected, report_processing.clean_column_data(column.copy()))
@@ -0,0 +1,28 @@
+import multiprocessing
+
+import numpy as np
+
+from key_index import KeyIndex, day_counts
+
+
+def _commit_keys(path, day, start, commits, per_commit):
+    for i in range(commits):
+        index = KeyIndex(path, day)
+        first = start + i * per_commit
+        hashes = np.arange(first, first + per_commit, dtype=np.uint64)
+        index.add_updates({"keys": {"menu_sales:RO Number|Line": hashes}, "files": [f"menu_sales:{day}-{i}"]})
+        index.commit()
+
+
+def test_commits_from_several_processes_keep_every_key(tmp_path):
+    path = str(tmp_path / "Store" / "2025-11.npz")
+    workers, commits, per_commit = 4, 10, 100
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_commit_keys, args=(path, day, day * 1_000_000, commits, per_commit))
+                 for day in range(1, workers + 1)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    assert day_counts(path) == {day: (commits * per_commit, commits) for day in range(1, workers + 1)}
@@ -0,0 +1,49 @@
+import openpyxl
+import pandas as pd
+import pytest
+
+import report_processing
+
+
+def _xlsx(path, header, rows):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return str(path)
+
+
+def test_reader_reads_numbers_stored_as_text_like_read_excel(tmp_path):
+    path = _xlsx(tmp_path / "mixed.xlsx", ["text", "mixed", "not numbers", "padded"], [
+        ["5", 5, "5", " 7 "],
+        ["3", "3", "abc", "8"],
+        ["N/A", None, "2", "9"],
+    ])
+    df = report_processing.read_excel_projected(path)
+    pd.testing.assert_frame_equal(df, pd.read_excel(path))
+    assert df["text"].tolist()[:2] == [5.0, 3.0]
+    assert df["not numbers"].tolist() == ["5", "abc", "2"]
+
+
+def test_recommendations_sum_counts_stored_as_text(tmp_path):
+    header = ["Name", "Recommendations", "Recommendations Sold",
+              "Recommendations $ amount", "Recommendations Sold $ amount"]
+    path = _xlsx(tmp_path / "recommendations.xlsx", header, [
+        ["Bob", "5", "2", "$100.00", "$40.00"],
+        ["Al", "4", "1", "$80.00", "$20.00"],
+        ["Bob", "3", "1", "$60.00", "$20.00"],
+        ["TOTAL", "12", "4", "$240.00", "$80.00"],
+    ])
+    rec_count, rec_sold_count, rec_amount, rec_sold_amount = report_processing.compute_recommendations([path])
+    assert rec_count == {"BOB": 8, "AL": 4}
+    assert rec_sold_count == {"BOB": 3, "AL": 1}
+    assert rec_amount == {"BOB": 160.0, "AL": 80.0}
+    assert rec_sold_amount == {"BOB": 60.0, "AL": 20.0}
+
+
+def test_group_metrics_refuses_to_sum_text():
+    df = pd.DataFrame({"Name": ["BOB", "AL", "BOB"], "Count": ["5", "4", "3"]})
+    with pytest.raises(TypeError, match="Count"):
+        report_processing.group_metrics(df, "Name", {"total": ("Count", "sum")})